@@ -0,0 +1,126 @@
+# 按内容寻址的图表缓存
+# filename: analysis/chart_cache.py
+
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Callable, Optional
+
+
+def chart_digest(kind: str, data: Any) -> str:
+    """图表类型和输入数据的哈希值，相同的数据得到相同的文件名"""
+    payload = json.dumps([kind, data], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class ChartCache:
+    """图表文件缓存，文件名由图表类型和数据序列的哈希值决定
+
+    数据不变时直接返回已有的文件，不再调用 matplotlib 渲染；
+    目录中的图表按最近使用时间 (文件修改时间) 排序，超过文件数或总大小上限时删除最久未使用的文件。
+    是否命中和目录大小都以磁盘上的文件为准，多个工作进程共用同一个目录时，
+    其他进程已经生成的图表同样会被复用，上限也按整个目录计算。
+    """
+
+    def __init__(self, charts_folder: str, url_prefix: str = 'images/charts',
+                 max_files: Optional[int] = 500, max_bytes: Optional[int] = 200 * 1024 * 1024):
+        """初始化缓存
+
+        Args:
+            charts_folder: 图表保存目录
+            url_prefix: 图表相对于 static 目录的路径前缀
+            max_files: 最多保留的图表文件数，None 表示不限制
+            max_bytes: 图表目录的总大小上限 (字节)，None 表示不限制
+        """
+        self.charts_folder = charts_folder
+        self.url_prefix = url_prefix
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # 正在渲染的文件名 -> 锁：同一张图表只渲染一次，不同图表可以并行渲染 (绘图不使用 pyplot 的全局状态)
+        self._render_locks = {}
+        os.makedirs(charts_folder, exist_ok=True)
+
+    def _scan(self):
+        """扫描目录中的图表文件，返回按修改时间从旧到新排列的 (文件名, 大小) 列表 (不含渲染中的临时文件)"""
+        files = []
+        for entry in os.scandir(self.charts_folder):
+            if entry.name.endswith('.png') and not entry.name.endswith('.tmp.png'):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, entry.name, stat.st_size))
+        files.sort()
+        return [(name, size) for _, name, size in files]
+
+    def filename(self, kind: str, data: Any) -> str:
+        """图表的文件名"""
+        return f'{kind}_{chart_digest(kind, data)[:20]}.png'
+
+    def url_for(self, filename: str) -> str:
+        """图表相对于 static 目录的路径"""
+        return os.path.join(self.url_prefix, filename)
+
+    def lookup(self, filename: str) -> bool:
+        """图表文件是否已存在 (包括其他进程生成的)，存在时将其标记为最近使用"""
+        try:
+            os.utime(os.path.join(self.charts_folder, filename))
+        except OSError:
+            return False
+        return True
+
+    def add(self, filename: str):
+        """登记一个新写入的图表文件，并按上限淘汰最久未使用的文件"""
+        if self.max_files is None and self.max_bytes is None:
+            return
+        with self._lock:
+            files = self._scan()
+            n_files, total_bytes = len(files), sum(size for _, size in files)
+            for name, size in files:
+                if not ((self.max_files is not None and n_files > self.max_files)
+                        or (self.max_bytes is not None and total_bytes > self.max_bytes)):
+                    break
+                if name == filename:
+                    continue
+                try:
+                    os.remove(os.path.join(self.charts_folder, name))
+                except OSError:
+                    # 其他进程可能已经删除了该文件
+                    pass
+                n_files -= 1
+                total_bytes -= size
+
+    def get_or_render(self, kind: str, data: Any, render: Callable[[str], None]) -> str:
+        """返回图表路径，缓存中没有时调用 render 生成
+
+        Args:
+            kind: 图表类型，作为文件名前缀
+            data: 决定图表内容的全部输入 (可JSON序列化)
+            render: 渲染函数，参数为要写入的文件路径
+
+        Returns:
+            图表相对于 static 目录的路径
+        """
+        filename = self.filename(kind, data)
+        if self.lookup(filename):
+            return self.url_for(filename)
+
+        with self._lock:
+            render_lock = self._render_locks.setdefault(filename, threading.Lock())
+        with render_lock:
+            # 等待锁期间其他请求可能已经生成了同一张图表
+            if not self.lookup(filename):
+                path = os.path.join(self.charts_folder, filename)
+                tmp_path = f'{path}.{os.getpid()}.tmp.png'
+                try:
+                    render(tmp_path)
+                    os.replace(tmp_path, path)
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                self.add(filename)
+            with self._lock:
+                self._render_locks.pop(filename, None)
+        return self.url_for(filename)
@@ -0,0 +1,386 @@
+# 后台图表渲染进程池
+# filename: analysis/chart_renderer.py
+
+import atexit
+import multiprocessing
+import os
+import platform
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from analysis.chart_cache import ChartCache
+
+# 图表生成前显示的占位图 (相对于 static 目录)
+PLACEHOLDER_URL = 'images/chart_placeholder.svg'
+
+
+# 根据操作系统选择合适的中文字体 (每个进程只设置一次)
+@lru_cache(maxsize=None)
+def set_chinese_fonts():
+    import matplotlib
+
+    system = platform.system().lower()
+
+    if system == 'darwin':  # macOS
+        matplotlib.rcParams['font.family'] = 'Arial Unicode MS'
+        matplotlib.rcParams['font.sans-serif'] = ['Arial Unicode MS']
+    elif system == 'windows':
+        matplotlib.rcParams['font.family'] = 'Microsoft YaHei'
+        matplotlib.rcParams['font.sans-serif'] = ['Microsoft YaHei']
+    elif system == 'linux':
+        matplotlib.rcParams['font.family'] = 'WenQuanYi Micro Hei'
+        matplotlib.rcParams['font.sans-serif'] = ['WenQuanYi Micro Hei']
+    else:
+        # 备选方案
+        matplotlib.rcParams['font.family'] = 'sans-serif'
+        matplotlib.rcParams['font.sans-serif'] = ['SimHei', 'Arial']
+
+    # 解决负号显示问题
+    matplotlib.rcParams['axes.unicode_minus'] = False
+
+
+def _new_figure(figsize):
+    """创建一个不依赖 pyplot 的图形对象
+
+    matplotlib 在第一次绘图时才导入 (渲染进程或同步渲染时)，不影响Web进程的启动时间。
+    """
+    from matplotlib.figure import Figure
+
+    set_chinese_fonts()
+    return Figure(figsize=figsize)
+
+
+def _label_bars(ax, bars, fmt: str, offset: float = 0):
+    """在柱状图上添加数值标签"""
+    for bar in bars:
+        height = bar.get_height()
+        ax.text(bar.get_x() + bar.get_width() / 2., height + offset,
+                fmt.format(height), ha='center', va='bottom')
+
+
+def draw_price_trend(data: Dict[str, Any]) -> 'Figure':
+    """产品价格趋势折线图"""
+    fig = _new_figure((10, 6))
+    ax = fig.subplots()
+    ax.plot(data['dates'], data['prices'], 'b-', label='原价')
+    ax.plot(data['dates'], data['discount_prices'], 'r-', label='优惠价')
+    ax.set_xlabel('日期')
+    ax.set_ylabel('价格 (元)')
+    ax.set_title('产品价格趋势')
+    ax.tick_params(axis='x', labelrotation=45)
+    ax.legend()
+    fig.tight_layout()
+    return fig
+
+
+def draw_platform_compare(data: Dict[str, Any]) -> 'Figure':
+    """各平台平均价格柱状图"""
+    fig = _new_figure((10, 6))
+    ax = fig.subplots()
+    bars = ax.bar(data['platforms'], data['prices'], color=['#3498db', '#e74c3c', '#2ecc71'])
+    ax.set_xlabel('平台')
+    ax.set_ylabel('平均价格 (元)')
+    ax.set_title(f"{data['product_name']} 各平台价格对比")
+    _label_bars(ax, bars, '¥{:.2f}', offset=50)
+    return fig
+
+
+def draw_discount_effect(data: Dict[str, Any]) -> 'Figure':
+    """不同优惠类型的平均销量柱状图"""
+    fig = _new_figure((12, 7))
+    ax = fig.subplots()
+    bars = ax.bar(data['types'], data['avg_sales'], color=['#3498db', '#e74c3c', '#2ecc71', '#f39c12', '#9b59b6'])
+    ax.set_xlabel('优惠类型')
+    ax.set_ylabel('平均销量')
+    ax.set_title('不同优惠类型对销量的影响')
+    _label_bars(ax, bars, '{:.0f}', offset=5)
+    return fig
+
+
+def draw_stackable_effect(data: Dict[str, Any]) -> 'Figure':
+    """可叠加与不可叠加优惠的平均销量柱状图"""
+    fig = _new_figure((10, 6))
+    ax = fig.subplots()
+    bars = ax.bar(data['types'], data['avg_sales'], color=['#3498db', '#e74c3c', '#2ecc71'])
+    ax.set_xlabel('优惠叠加类型')
+    ax.set_ylabel('平均销量')
+    ax.set_title('优惠叠加类型对销量的影响')
+    _label_bars(ax, bars, '{:.0f}', offset=5)
+    return fig
+
+
+def draw_shop_discount_relation(data: Dict[str, Any]) -> 'Figure':
+    """店铺优惠券数量与销量的散点图和趋势线"""
+    discount_counts, sales_volumes = data['discount_counts'], data['sales_volumes']
+    fig = _new_figure((12, 8))
+    ax = fig.subplots()
+    ax.scatter(discount_counts, sales_volumes, alpha=0.7)
+
+    # 添加趋势线
+    trend = np.poly1d(np.polyfit(discount_counts, sales_volumes, 1))
+    ax.plot(discount_counts, trend(discount_counts), 'r--')
+
+    # 添加标签
+    for i, txt in enumerate(data['shop_names']):
+        ax.annotate(txt, (discount_counts[i], sales_volumes[i]), fontsize=8)
+
+    ax.set_xlabel('优惠券数量')
+    ax.set_ylabel('销售量')
+    ax.set_title('店铺优惠券数量与销量的关系 (相关系数: {:.2f})'.format(data['correlation']))
+    ax.grid(True, linestyle='--', alpha=0.7)
+    return fig
+
+
+def draw_optimal_plan(data: Dict[str, Any]) -> 'Figure':
+    """各平台原价与优惠后价格对比柱状图"""
+    platforms = data['platforms']
+    fig = _new_figure((12, 7))
+    ax = fig.subplots()
+    x = np.arange(len(platforms))
+    width = 0.35
+
+    ax.bar(x - width / 2, data['original_prices'], width, label='原价', color='#3498db')
+    ax.bar(x + width / 2, data['final_prices'], width, label='优惠后价格', color='#e74c3c')
+    ax.set_xlabel('平台')
+    ax.set_ylabel('价格 (元)')
+    ax.set_title('各平台最终价格对比')
+    ax.set_xticks(x)
+    ax.set_xticklabels(platforms)
+    ax.legend()
+
+    # 添加价格标签
+    for i, v in enumerate(data['original_prices']):
+        ax.text(i - width / 2, v + 50, f'¥{v:.2f}', ha='center')
+    for i, v in enumerate(data['final_prices']):
+        ax.text(i + width / 2, v + 50, f'¥{v:.2f}', ha='center')
+    return fig
+
+
+def draw_platform_sales(data: Dict[str, Any]) -> 'Figure':
+    """各平台销量和平均价格对比"""
+    fig = _new_figure((15, 6))
+    ax1, ax2 = fig.subplots(1, 2)
+
+    # 销量柱状图
+    bars1 = ax1.bar(data['platforms'], data['sales_volumes'], color='#3498db')
+    ax1.set_title('各平台销量对比')
+    ax1.set_xlabel('平台')
+    ax1.set_ylabel('总销量')
+    _label_bars(ax1, bars1, '{:.0f}')
+
+    # 平均价格柱状图
+    bars2 = ax2.bar(data['platforms'], data['avg_prices'], color='#e74c3c')
+    ax2.set_title('各平台平均价格对比')
+    ax2.set_xlabel('平台')
+    ax2.set_ylabel('平均价格 (元)')
+    _label_bars(ax2, bars2, '¥{:.2f}')
+
+    fig.tight_layout()
+    return fig
+
+
+def draw_user_behavior(data: Dict[str, Any]) -> 'Figure':
+    """用户行为分布饼图"""
+    fig = _new_figure((10, 6))
+    ax = fig.subplots()
+    ax.pie(data['counts'], labels=data['behavior_types'], autopct='%1.1f%%',
+           colors=['#3498db', '#e74c3c', '#2ecc71', '#f1c40f'])
+    ax.set_title('用户行为分布')
+    return fig
+
+
+def draw_category_analysis(data: Dict[str, Any]) -> 'Figure':
+    """各分类产品数量、销量和平均价格对比"""
+    categories = data['categories']
+    fig = _new_figure((18, 6))
+    ax1, ax2, ax3 = fig.subplots(1, 3)
+
+    # 产品数量分布饼图
+    ax1.pie(data['product_counts'], labels=categories, autopct='%1.1f%%',
+            colors=['#3498db', '#e74c3c', '#2ecc71', '#f1c40f'])
+    ax1.set_title('各分类产品数量分布')
+
+    # 销量柱状图
+    bars2 = ax2.bar(categories, data['sales_volumes'], color='#3498db')
+    ax2.set_title('各分类总销量对比')
+    ax2.set_xlabel('分类')
+    ax2.set_ylabel('总销量')
+    ax2.tick_params(axis='x', labelrotation=45)
+    _label_bars(ax2, bars2, '{:.0f}')
+
+    # 平均价格柱状图
+    bars3 = ax3.bar(categories, data['avg_prices'], color='#e74c3c')
+    ax3.set_title('各分类平均价格对比')
+    ax3.set_xlabel('分类')
+    ax3.set_ylabel('平均价格 (元)')
+    ax3.tick_params(axis='x', labelrotation=45)
+    _label_bars(ax3, bars3, '¥{:.2f}')
+
+    fig.tight_layout()
+    return fig
+
+
+def draw_emotion_radar(data: Dict[str, Any]) -> 'Figure':
+    """产品评价情感雷达图"""
+    fig = _new_figure((8, 8))
+    ax = fig.add_subplot(111, projection='polar')
+
+    # 雷达图的角度
+    categories = ['积极情感', '消极情感', '客观程度', '评价详细度']
+    angles = [n / float(len(categories)) * 2 * np.pi for n in range(len(categories))]
+    angles += angles[:1]
+
+    values = [
+        data.get('positive_emotion', 0),
+        data.get('negative_emotion', 0),
+        data.get('objectivity', 0),
+        data.get('length_factor', 0)
+    ]
+    values += values[:1]
+
+    ax.plot(angles, values, 'o-', linewidth=2, label='情感得分')
+    ax.fill(angles, values, alpha=0.25)
+    ax.set_xticks(angles[:-1])
+    ax.set_xticklabels(categories)
+    ax.set_title('产品评价情感分析雷达图', pad=20)
+    return fig
+
+
+# 图表类型到绘图函数的映射
+CHART_DRAWERS = {
+    'price_trend': draw_price_trend,
+    'platform_compare': draw_platform_compare,
+    'discount_effect': draw_discount_effect,
+    'stackable_effect': draw_stackable_effect,
+    'shop_discount_relation': draw_shop_discount_relation,
+    'optimal_plan': draw_optimal_plan,
+    'platform_sales': draw_platform_sales,
+    'user_behavior': draw_user_behavior,
+    'category_analysis': draw_category_analysis,
+    'emotion_radar': draw_emotion_radar,
+}
+
+
+def render_chart(kind: str, data: Dict[str, Any], path: str):
+    """绘制图表并保存为图片 (只使用面向对象的 Figure API，不依赖 pyplot 的全局状态)"""
+    CHART_DRAWERS[kind](data).savefig(path)
+
+
+def _init_worker():
+    """渲染进程启动时初始化 matplotlib (非交互后端和中文字体)，第一张图表不再承担导入开销"""
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.backends import backend_agg  # noqa: F401
+    set_chinese_fonts()
+
+
+def _pool_context():
+    """渲染进程池的启动方式
+
+    Web进程中有行为写入线程、数据库连接池和可能被其他线程持有的锁，
+    fork 出的子进程会继承这些状态，因此使用 forkserver (不支持时使用 spawn) 启动干净的进程。
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+
+def _render_job(kind: str, data: Dict[str, Any], path: str):
+    """工作进程中执行的渲染任务：先写入临时文件再原子替换，轮询方不会读到不完整的图片"""
+    tmp_path = f'{path}.{os.getpid()}.tmp.png'
+    try:
+        render_chart(kind, data, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class ChartRenderer:
+    """图表渲染调度器
+
+    请求线程只计算图表文件名并提交任务，立即返回图表路径；渲染在进程池中执行，
+    每个工作进程独立绘图，吞吐量随进程数增加。同一张图表同时只会提交一次。
+    max_workers 为0时在当前线程中同步渲染。进程池以 forkserver/spawn 方式启动，
+    进程退出时关闭；Web进程 fork 后在子进程中重新创建。
+    """
+
+    def __init__(self, max_workers: int = 2):
+        """初始化
+
+        Args:
+            max_workers: 渲染进程数，0 表示同步渲染
+        """
+        self.max_workers = max_workers
+        self._executor = None
+        self._pid = None
+        self._pending = {}
+        self._lock = threading.Lock()
+        atexit.register(self.shutdown)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None or self._pid != os.getpid():
+            # fork 继承的进程池属于父进程，子进程中重新创建
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=_pool_context(),
+                                                 initializer=_init_worker)
+            self._pid = os.getpid()
+            self._pending = {}
+        return self._executor
+
+    def submit(self, chart_cache: ChartCache, kind: str, data: Dict[str, Any]) -> Tuple[str, bool]:
+        """提交图表渲染任务
+
+        Args:
+            chart_cache: 保存图表的缓存目录
+            kind: 图表类型
+            data: 绘图所需的全部数据
+
+        Returns:
+            (图表路径, 是否已经生成)，未生成时前端应先显示占位图并轮询图表路径
+        """
+        filename = chart_cache.filename(kind, data)
+        chart_url = chart_cache.url_for(filename)
+        if chart_cache.lookup(filename):
+            return chart_url, True
+
+        if not self.max_workers:
+            chart_cache.get_or_render(kind, data, lambda path: render_chart(kind, data, path))
+            return chart_url, True
+
+        path = os.path.join(chart_cache.charts_folder, filename)
+        with self._lock:
+            if path not in self._pending:
+                future = self._get_executor().submit(_render_job, kind, data, path)
+                self._pending[path] = future
+                future.add_done_callback(lambda f: self._finished(chart_cache, filename, path, f))
+        return chart_url, False
+
+    def _finished(self, chart_cache: ChartCache, filename: str, path: str, future):
+        """渲染完成后登记到缓存"""
+        with self._lock:
+            self._pending.pop(path, None)
+        error = future.exception()
+        if error is not None:
+            print(f"渲染图表 {filename} 时出错: {str(error)}")
+            return
+        chart_cache.add(filename)
+
+    def wait(self, timeout: Optional[float] = None):
+        """等待当前所有渲染任务完成"""
+        with self._lock:
+            futures = list(self._pending.values())
+        for future in futures:
+            try:
+                future.result(timeout)
+            except Exception:
+                pass
+
+    def shutdown(self, wait: bool = True):
+        """关闭渲染进程池 (只关闭本进程创建的进程池)"""
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=wait)
+        self._executor = None
@@ -1,76 +1,60 @@
 # 数据分析与可视化模块
 # filename: analysis/data_analysis.py
 
-import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from sqlalchemy import func
+from sqlalchemy import func, case
 import json
 from typing import List, Dict, Any, Tuple, Optional
 import os
 from datetime import datetime, timedelta
-from textblob import TextBlob
-# import matplotlib
-# matplotlib.use('Agg')  # 设置非交互式后端
-#
-# # 设置matplotlib中文字体
-# matplotlib.rcParams['font.sans-serif'] = ['Arial Unicode MS']  # macOS中文字体
-# matplotlib.rcParams['axes.unicode_minus'] = False  # 解决负号显示问题
 
-import platform
-import matplotlib
-matplotlib.use('Agg')  # 设置非交互式后端
-import matplotlib.pyplot as plt
-
-
-# 根据操作系统选择合适的中文字体
-def set_chinese_fonts():
-    system = platform.system().lower()
-
-    if system == 'darwin':  # macOS
-        matplotlib.rcParams['font.family'] = 'Arial Unicode MS'
-        matplotlib.rcParams['font.sans-serif'] = ['Arial Unicode MS']
-    elif system == 'windows':
-        matplotlib.rcParams['font.family'] = 'Microsoft YaHei'
-        matplotlib.rcParams['font.sans-serif'] = ['Microsoft YaHei']
-    elif system == 'linux':
-        matplotlib.rcParams['font.family'] = 'WenQuanYi Micro Hei'
-        matplotlib.rcParams['font.sans-serif'] = ['WenQuanYi Micro Hei']
-    else:
-        # 备选方案
-        matplotlib.rcParams['font.family'] = 'sans-serif'
-        matplotlib.rcParams['font.sans-serif'] = ['SimHei', 'Arial']
-
-    # 解决负号显示问题
-    matplotlib.rcParams['axes.unicode_minus'] = False
-
-
-# 在导入 matplotlib 后立即调用
-set_chinese_fonts()
+# 图表由 analysis.chart_renderer 使用面向对象的 Figure API 绘制，中文字体在其中设置
+from analysis.chart_renderer import ChartRenderer, render_chart
 
 # 导入数据库模型
 from models.models import db, Product, ProductSale, UserReview, PlatformDiscount, ShopInfo
+from analysis.chart_cache import ChartCache
+from analysis.purchase_plan import PurchasePlanner
+from search.product_index import ProductSearchIndex
+
+def get_default_emotions() -> Dict[str, float]:
+    """返回默认的情感维度数据 (没有评价或评价缺少某个维度时使用)"""
+    return {
+        'positive_emotion': 0.0,
+        'negative_emotion': 0.0,
+        'objectivity': 0.5,
+        'length_factor': 0.0
+    }
 
 class DataAnalysis:
     """数据分析类，提供各种数据分析和可视化功能"""
     
-    def __init__(self, static_folder='static'):
+    def __init__(self, static_folder='static', chart_workers: int = 2,
+                 search_index: Optional[ProductSearchIndex] = None):
         """初始化数据分析类
         
         Args:
             static_folder: 静态文件夹路径，用于保存生成的图表
+            chart_workers: 后台渲染图表的进程数，0 表示在请求中同步渲染
+            search_index: 产品搜索索引，用于查找各平台的同名产品
         """
         self.static_folder = static_folder
         self.charts_folder = os.path.join(static_folder, 'images', 'charts')
         os.makedirs(self.charts_folder, exist_ok=True)
+        self.chart_cache = ChartCache(self.charts_folder)
+        self.emotion_chart_cache = ChartCache(os.path.join(static_folder, 'images', 'emotion_charts'),
+                                              url_prefix='images/emotion_charts')
+        self.chart_renderer = ChartRenderer(max_workers=chart_workers)
+        self.purchase_planner = PurchasePlanner()
+        self.search_index = search_index or ProductSearchIndex()
     
-    def get_price_trend(self, product_id: int, days: int = 30) -> Dict[str, Any]:
+    def get_price_trend(self, product_id: int, days: int = 30, render_chart: bool = True) -> Dict[str, Any]:
         """获取产品价格趋势数据
         
         Args:
             product_id: 产品ID
             days: 天数，默认30天
+            render_chart: 是否在服务端生成图表，由前端绘图时传入False
             
         Returns:
             包含日期和价格数据的字典
@@ -91,43 +75,33 @@ class DataAnalysis:
         prices = [sale.price for sale in sales_data]
         discount_prices = [sale.discount_price for sale in sales_data]
         
-        # 生成图表
-        plt.figure(figsize=(10, 6))
-        plt.plot(dates, prices, 'b-', label='原价')
-        plt.plot(dates, discount_prices, 'r-', label='优惠价')
-        plt.xlabel('日期')
-        plt.ylabel('价格 (元)')
-        plt.title('产品价格趋势')
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        plt.legend()
-        
-        # 保存图表
-        chart_filename = f'price_trend_{product_id}_{datetime.now().strftime("%Y%m%d%H%M%S")}.png'
-        chart_path = os.path.join(self.charts_folder, chart_filename)
-        plt.savefig(chart_path)
-        plt.close()
+        # 提交后台渲染，图表生成前前端显示占位图 (数据不变时复用已有的图表文件)
+        chart_url, chart_ready = None, False
+        if render_chart:
+            chart_url, chart_ready = self.chart_renderer.submit(
+                self.chart_cache, 'price_trend', {'dates': dates, 'prices': prices, 'discount_prices': discount_prices}
+            )
         
         return {
             'dates': dates,
             'prices': prices,
             'discount_prices': discount_prices,
-            'chart_url': os.path.join('images', 'charts', chart_filename)
+            'chart_url': chart_url,
+            'chart_ready': chart_ready
         }
     
-    def compare_platform_prices(self, product_name: str) -> Dict[str, Any]:
+    def compare_platform_prices(self, product_name: str, render_chart: bool = True) -> Dict[str, Any]:
         """比较不同平台的产品价格
         
         Args:
             product_name: 产品名称
+            render_chart: 是否在服务端生成图表，由前端绘图时传入False
             
         Returns:
             包含平台和价格数据的字典
         """
-        # 查询不同平台的产品价格
-        products = Product.query.filter(
-            Product.name.like(f'%{product_name}%')
-        ).all()
+        # 查询不同平台的产品价格 (通过搜索索引查找名称包含该名称的产品)
+        products = self.search_index.containing(product_name)
         
         # 按平台分组
         platforms = {}
@@ -140,40 +114,65 @@ class DataAnalysis:
         platform_names = list(platforms.keys())
         avg_prices = [sum(prices) / len(prices) for prices in platforms.values()]
         
-        # 生成图表
-        plt.figure(figsize=(10, 6))
-        bars = plt.bar(platform_names, avg_prices, color=['#3498db', '#e74c3c', '#2ecc71'])
-        plt.xlabel('平台')
-        plt.ylabel('平均价格 (元)')
-        plt.title(f'{product_name} 各平台价格对比')
-        
-        # 在柱状图上添加价格标签
-        for bar in bars:
-            height = bar.get_height()
-            plt.text(bar.get_x() + bar.get_width()/2., height + 50,
-                    f'¥{height:.2f}',
-                    ha='center', va='bottom')
-        
-        # 保存图表
-        chart_filename = f'platform_compare_{datetime.now().strftime("%Y%m%d%H%M%S")}.png'
-        chart_path = os.path.join(self.charts_folder, chart_filename)
-        plt.savefig(chart_path)
-        plt.close()
+        # 提交后台渲染，图表生成前前端显示占位图 (数据不变时复用已有的图表文件)
+        chart_url, chart_ready = None, False
+        if render_chart:
+            chart_url, chart_ready = self.chart_renderer.submit(
+                self.chart_cache, 'platform_compare', {'product_name': product_name, 'platforms': platform_names, 'prices': avg_prices}
+            )
         
         return {
             'platforms': platform_names,
             'prices': avg_prices,
-            'chart_url': os.path.join('images', 'charts', chart_filename)
+            'chart_url': chart_url,
+            'chart_ready': chart_ready
         }
     
-    def analyze_discount_effect(self) -> Dict[str, Any]:
+    def discount_sales_summary(self) -> List[Tuple[int, float, int, Optional[str], bool]]:
+        """一次分组查询取得每个产品的总销量和优惠概况
+        
+        销量和优惠分别按产品聚合成子查询，再与产品表左连接，避免两者相乘。
+        
+        Returns:
+            (产品ID, 总销量, 优惠数量, 优惠类型, 是否有可叠加优惠) 列表，
+            优惠类型在只有一条优惠时有意义
+        """
+        sales = db.session.query(
+            ProductSale.product_id.label('product_id'),
+            func.sum(ProductSale.sales_volume).label('sales')
+        ).group_by(ProductSale.product_id).subquery()
+        
+        discounts = db.session.query(
+            PlatformDiscount.product_id.label('product_id'),
+            func.count(PlatformDiscount.id).label('discount_count'),
+            func.min(PlatformDiscount.discount_type).label('discount_type'),
+            func.max(case((PlatformDiscount.stackable == True, 1), else_=0)).label('any_stackable')
+        ).group_by(PlatformDiscount.product_id).subquery()
+        
+        rows = db.session.query(
+            Product.id,
+            func.coalesce(sales.c.sales, 0),
+            func.coalesce(discounts.c.discount_count, 0),
+            discounts.c.discount_type,
+            func.coalesce(discounts.c.any_stackable, 0)
+        ).outerjoin(sales, sales.c.product_id == Product.id
+        ).outerjoin(discounts, discounts.c.product_id == Product.id).all()
+        
+        return [(product_id, total_sales, count, discount_type, bool(any_stackable))
+                for product_id, total_sales, count, discount_type, any_stackable in rows]
+    
+    def analyze_discount_effect(self, summary: Optional[List[tuple]] = None) -> Dict[str, Any]:
         """分析优惠券效果
         
+        Args:
+            summary: discount_sales_summary 的结果，同一请求内多个分析可以共用
+        
         Returns:
             包含优惠类型和销量数据的字典
         """
         # 获取所有产品的销量和优惠信息
-        products = Product.query.all()
+        if summary is None:
+            summary = self.discount_sales_summary()
         
         # 按优惠类型分组
         discount_types = {
@@ -184,30 +183,19 @@ class DataAnalysis:
             '多重优惠': {'count': 0, 'sales': 0}
         }
         
-        for product in products:
-            # 获取产品的优惠信息
-            discounts = PlatformDiscount.query.filter_by(product_id=product.id).all()
-            
-            # 获取产品的总销量
-            sales = db.session.query(func.sum(ProductSale.sales_volume)).filter(
-                ProductSale.product_id == product.id
-            ).scalar() or 0
-            
+        for _, sales, discount_count, discount_type, _ in summary:
             # 根据优惠类型分类
-            if not discounts:
-                discount_types['无优惠']['count'] += 1
-                discount_types['无优惠']['sales'] += sales
-            elif len(discounts) > 1:
-                discount_types['多重优惠']['count'] += 1
-                discount_types['多重优惠']['sales'] += sales
+            if not discount_count:
+                group = '无优惠'
+            elif discount_count > 1:
+                group = '多重优惠'
+            elif discount_type in discount_types:
+                group = discount_type
             else:
-                discount_type = discounts[0].discount_type
-                if discount_type in discount_types:
-                    discount_types[discount_type]['count'] += 1
-                    discount_types[discount_type]['sales'] += sales
-                else:
-                    discount_types['其他']['count'] += 1
-                    discount_types['其他']['sales'] += sales
+                group = '其他'
+            stats = discount_types.setdefault(group, {'count': 0, 'sales': 0})
+            stats['count'] += 1
+            stats['sales'] += sales
         
         # 计算每种优惠类型的平均销量
         for discount_type in discount_types:
@@ -220,40 +208,30 @@ class DataAnalysis:
         types = list(discount_types.keys())
         avg_sales = [discount_types[t]['avg_sales'] for t in types]
         
-        # 生成图表
-        plt.figure(figsize=(12, 7))
-        bars = plt.bar(types, avg_sales, color=['#3498db', '#e74c3c', '#2ecc71', '#f39c12', '#9b59b6'])
-        plt.xlabel('优惠类型')
-        plt.ylabel('平均销量')
-        plt.title('不同优惠类型对销量的影响')
-        
-        # 在柱状图上添加销量标签
-        for bar in bars:
-            height = bar.get_height()
-            plt.text(bar.get_x() + bar.get_width()/2., height + 5,
-                    f'{height:.0f}',
-                    ha='center', va='bottom')
-        
-        # 保存图表
-        chart_filename = f'discount_effect_{datetime.now().strftime("%Y%m%d%H%M%S")}.png'
-        chart_path = os.path.join(self.charts_folder, chart_filename)
-        plt.savefig(chart_path)
-        plt.close()
+        # 提交后台渲染，图表生成前前端显示占位图 (数据不变时复用已有的图表文件)
+        chart_url, chart_ready = self.chart_renderer.submit(
+            self.chart_cache, 'discount_effect', {'types': types, 'avg_sales': avg_sales}
+        )
         
         return {
             'discount_types': types,
             'avg_sales': avg_sales,
-            'chart_url': os.path.join('images', 'charts', chart_filename)
+            'chart_url': chart_url,
+            'chart_ready': chart_ready
         }
     
-    def analyze_stackable_discounts(self) -> Dict[str, Any]:
+    def analyze_stackable_discounts(self, summary: Optional[List[tuple]] = None) -> Dict[str, Any]:
         """分析可叠加与不可叠加优惠的效果
         
+        Args:
+            summary: discount_sales_summary 的结果，同一请求内多个分析可以共用
+        
         Returns:
             包含叠加类型和销量数据的字典
         """
         # 获取所有产品的销量和优惠信息
-        products = Product.query.all()
+        if summary is None:
+            summary = self.discount_sales_summary()
         
         # 按叠加类型分组
         stackable_types = {
@@ -262,25 +240,16 @@ class DataAnalysis:
             '可叠加优惠': {'count': 0, 'sales': 0}
         }
         
-        for product in products:
-            # 获取产品的优惠信息
-            discounts = PlatformDiscount.query.filter_by(product_id=product.id).all()
-            
-            # 获取产品的总销量
-            sales = db.session.query(func.sum(ProductSale.sales_volume)).filter(
-                ProductSale.product_id == product.id
-            ).scalar() or 0
-            
+        for _, sales, discount_count, _, any_stackable in summary:
             # 根据叠加类型分类
-            if not discounts:
-                stackable_types['无优惠']['count'] += 1
-                stackable_types['无优惠']['sales'] += sales
-            elif any(discount.stackable for discount in discounts):
-                stackable_types['可叠加优惠']['count'] += 1
-                stackable_types['可叠加优惠']['sales'] += sales
+            if not discount_count:
+                group = '无优惠'
+            elif any_stackable:
+                group = '可叠加优惠'
             else:
-                stackable_types['不可叠加优惠']['count'] += 1
-                stackable_types['不可叠加优惠']['sales'] += sales
+                group = '不可叠加优惠'
+            stackable_types[group]['count'] += 1
+            stackable_types[group]['sales'] += sales
         
         # 计算每种叠加类型的平均销量
         for stackable_type in stackable_types:
@@ -293,30 +262,16 @@ class DataAnalysis:
         types = list(stackable_types.keys())
         avg_sales = [stackable_types[t]['avg_sales'] for t in types]
         
-        # 生成图表
-        plt.figure(figsize=(10, 6))
-        bars = plt.bar(types, avg_sales, color=['#3498db', '#e74c3c', '#2ecc71'])
-        plt.xlabel('优惠叠加类型')
-        plt.ylabel('平均销量')
-        plt.title('优惠叠加类型对销量的影响')
-        
-        # 在柱状图上添加销量标签
-        for bar in bars:
-            height = bar.get_height()
-            plt.text(bar.get_x() + bar.get_width()/2., height + 5,
-                    f'{height:.0f}',
-                    ha='center', va='bottom')
-        
-        # 保存图表
-        chart_filename = f'stackable_effect_{datetime.now().strftime("%Y%m%d%H%M%S")}.png'
-        chart_path = os.path.join(self.charts_folder, chart_filename)
-        plt.savefig(chart_path)
-        plt.close()
+        # 提交后台渲染，图表生成前前端显示占位图 (数据不变时复用已有的图表文件)
+        chart_url, chart_ready = self.chart_renderer.submit(
+            self.chart_cache, 'stackable_effect', {'types': types, 'avg_sales': avg_sales}
+        )
         
         return {
             'stackable_types': types,
             'avg_sales': avg_sales,
-            'chart_url': os.path.join('images', 'charts', chart_filename)
+            'chart_url': chart_url,
+            'chart_ready': chart_ready
         }
     
     def analyze_shop_discount_relation(self) -> Dict[str, Any]:
@@ -336,37 +291,24 @@ class DataAnalysis:
         # 计算相关系数
         correlation = np.corrcoef(discount_counts, sales_volumes)[0, 1]
         
-        # 生成散点图
-        plt.figure(figsize=(12, 8))
-        plt.scatter(discount_counts, sales_volumes, alpha=0.7)
-        
-        # 添加趋势线
-        z = np.polyfit(discount_counts, sales_volumes, 1)
-        p = np.poly1d(z)
-        plt.plot(discount_counts, p(discount_counts), "r--")
-        
-        # 添加标签
-        for i, txt in enumerate(shop_names):
-            plt.annotate(txt, (discount_counts[i], sales_volumes[i]), fontsize=8)
-        
-        plt.xlabel('优惠券数量')
-        plt.ylabel('销售量')
-        plt.title('店铺优惠券数量与销量的关系 (相关系数: {:.2f})'.format(correlation))
-        plt.grid(True, linestyle='--', alpha=0.7)
-        
-        # 保存图表
-        chart_filename = f'shop_discount_relation_{datetime.now().strftime("%Y%m%d%H%M%S")}.png'
-        chart_path = os.path.join(self.charts_folder, chart_filename)
-        plt.savefig(chart_path)
-        plt.close()
+        # 提交后台渲染，图表生成前前端显示占位图 (数据不变时复用已有的图表文件)
+        chart_url, chart_ready = self.chart_renderer.submit(
+            self.chart_cache, 'shop_discount_relation', {'shop_names': shop_names, 'discount_counts': discount_counts, 'sales_volumes': sales_volumes, 'correlation': correlation}
+        )
         
         return {
             'correlation': correlation,
-            'chart_url': os.path.join('images', 'charts', chart_filename)
+            'chart_url': chart_url,
+            'chart_ready': chart_ready
         }
     
-    def analyze_user_reviews(self, product_id):
-        """分析产品评论"""
+    def analyze_user_reviews(self, product_id, render_chart: bool = True):
+        """分析产品评论
+        
+        Args:
+            product_id: 产品ID
+            render_chart: 是否在服务端生成情感雷达图，由前端绘图时传入False
+        """
         reviews = UserReview.query.filter_by(product_id=product_id).all()
         
         if not reviews:
@@ -374,7 +316,9 @@ class DataAnalysis:
                 'review_count': 0,
                 'average_rating': 0,
                 'average_sentiment': 0,
-                'emotion_dimensions': get_default_emotions()
+                'emotion_dimensions': get_default_emotions(),
+                'emotion_chart_url': None,
+                'emotion_chart_ready': False
             }
 
         # 初始化统计数据
@@ -416,22 +360,28 @@ class DataAnalysis:
             average_rating = 0
             average_sentiment = 0
         
-        # 生成并保存雷达图
-        chart_url = generate_emotion_radar_chart(total_emotions, product_id)
+        # 生成并保存雷达图 (数据不变时复用已有的图表文件)
+        chart_url, chart_ready = None, False
+        if render_chart:
+            chart_url, chart_ready = self.chart_renderer.submit(
+                self.emotion_chart_cache, 'emotion_radar', total_emotions
+            )
         
         return {
             'review_count': valid_reviews,
             'average_rating': round(average_rating, 2),
             'average_sentiment': round(average_sentiment, 2),
             'emotion_dimensions': total_emotions,
-            'emotion_chart_url': chart_url
+            'emotion_chart_url': chart_url,
+            'emotion_chart_ready': chart_ready
         }
     
-    def get_optimal_purchase_plan(self, product_id: int) -> Dict[str, Any]:
+    def get_optimal_purchase_plan(self, product_id: int, render_chart: bool = True) -> Dict[str, Any]:
         """获取最优购买方案
         
         Args:
             product_id: 产品ID
+            render_chart: 是否在服务端生成图表，由前端绘图时传入False
             
         Returns:
             包含最优购买方案的字典
@@ -441,56 +391,12 @@ class DataAnalysis:
         if not product:
             return {'error': '产品不存在'}
         
-        # 获取产品在各平台的价格和优惠信息
-        similar_products = Product.query.filter(
-            Product.name.like(f'%{product.name}%'),
-            Product.id != product_id
-        ).all()
+        # 获取产品在各平台的同名产品 (与平台比价相同，通过搜索索引查找名称包含该名称的产品)
+        similar_products = [p for p in self.search_index.containing(product.name) if p.id != product_id]
         
-        # 合并当前产品和类似产品
+        # 合并当前产品和类似产品，批量计算各自的最优方案 (已按最终价格排序)
         all_products = [product] + similar_products
-        
-        # 计算每个产品的最终价格
-        best_plans = []
-        for p in all_products:
-            # 获取产品的优惠信息
-            discounts = PlatformDiscount.query.filter_by(product_id=p.id).all()
-            
-            # 计算最终价格
-            final_price = p.price
-            discount_desc = []
-            
-            for discount in discounts:
-                if discount.discount_type == '满减' and p.price >= discount.min_purchase:
-                    final_price -= discount.discount_value
-                    discount_desc.append(f'满{discount.min_purchase}减{discount.discount_value}')
-                elif discount.discount_type == '折扣':
-                    discount_amount = p.price * (1 - discount.discount_value / 10)
-                    final_price -= discount_amount
-                    discount_desc.append(f'{discount.discount_value}折')
-                elif discount.discount_type == '消费券':
-                    final_price -= discount.discount_value
-                    discount_desc.append(f'消费券减{discount.discount_value}')
-            
-            # 添加到方案列表
-            best_plans.append({
-                'product_id': p.id,
-                'product_name': p.name,
-                'platform': p.platform,
-                # 'original_price': p.price,
-                # 'final_price': final_price,
-                'original_price': round(p.price, 2),  # 保留两位小数
-                'final_price': round(final_price, 2),  # 保留两位小数
-                'discount_desc': '、'.join(discount_desc) if discount_desc else '无优惠',
-                # 'discount_amount': p.price - final_price,
-                # 'discount_percentage': (p.price - final_price) / p.price * 100 if p.price > 0 else 0
-
-                'discount_amount': round(p.price - final_price, 2),  # 保留两位小数
-                'discount_percentage': round((p.price - final_price) / p.price * 100, 2) if p.price > 0 else 0
-            })
-        
-        # 按最终价格排序
-        best_plans.sort(key=lambda x: x['final_price'])
+        best_plans = self.purchase_planner.plans_for(all_products)
         
         # 生成对比图表
         # platforms = [plan['platform'] for plan in best_plans[:5]]
@@ -502,35 +408,17 @@ class DataAnalysis:
         final_prices = [round(plan['final_price'], 2) for plan in best_plans[:5]]
         original_prices = [round(plan['original_price'], 2) for plan in best_plans[:5]]
         
-        plt.figure(figsize=(12, 7))
-        x = np.arange(len(platforms))
-        width = 0.35
-        
-        plt.bar(x - width/2, original_prices, width, label='原价', color='#3498db')
-        plt.bar(x + width/2, final_prices, width, label='优惠后价格', color='#e74c3c')
-        
-        plt.xlabel('平台')
-        plt.ylabel('价格 (元)')
-        plt.title('各平台最终价格对比')
-        plt.xticks(x, platforms)
-        plt.legend()
-        
-        # 添加价格标签
-        for i, v in enumerate(original_prices):
-            plt.text(i - width/2, v + 50, f'¥{v:.2f}', ha='center')
-        
-        for i, v in enumerate(final_prices):
-            plt.text(i + width/2, v + 50, f'¥{v:.2f}', ha='center')
-        
-        # 保存图表
-        chart_filename = f'optimal_plan_{product_id}_{datetime.now().strftime("%Y%m%d%H%M%S")}.png'
-        chart_path = os.path.join(self.charts_folder, chart_filename)
-        plt.savefig(chart_path)
-        plt.close()
+        # 提交后台渲染，图表生成前前端显示占位图 (数据不变时复用已有的图表文件)
+        chart_url, chart_ready = None, False
+        if render_chart:
+            chart_url, chart_ready = self.chart_renderer.submit(
+                self.chart_cache, 'optimal_plan', {'platforms': platforms, 'final_prices': final_prices, 'original_prices': original_prices}
+            )
         
         return {
             'best_plans': best_plans,
-            'chart_url': os.path.join('images', 'charts', chart_filename)
+            'chart_url': chart_url,
+            'chart_ready': chart_ready
         }
 
     def analyze_platform_sales(self) -> Dict[str, Any]:
@@ -564,47 +452,18 @@ class DataAnalysis:
                 sales_volumes.append(int(sales or 0))
                 avg_prices.append(round(float(price or 0), 2))
 
-            # 创建图表
-            fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
-
-            # 销量柱状图
-            bars1 = ax1.bar(platforms, sales_volumes, color='#3498db')
-            ax1.set_title('各平台销量对比')
-            ax1.set_xlabel('平台')
-            ax1.set_ylabel('总销量')
-            # 添加数据标签
-            for bar in bars1:
-                height = bar.get_height()
-                ax1.text(bar.get_x() + bar.get_width()/2., height,
-                        f'{int(height)}',
-                        ha='center', va='bottom')
-
-            # 平均价格柱状图
-            bars2 = ax2.bar(platforms, avg_prices, color='#e74c3c')
-            ax2.set_title('各平台平均价格对比')
-            ax2.set_xlabel('平台')
-            ax2.set_ylabel('平均价格 (元)')
-            # 添加数据标签
-            for bar in bars2:
-                height = bar.get_height()
-                ax2.text(bar.get_x() + bar.get_width()/2., height,
-                        f'¥{height:.2f}',
-                        ha='center', va='bottom')
-
-            plt.tight_layout()
-
-            # 保存图表
-            chart_filename = f'platform_sales_{datetime.now().strftime("%Y%m%d%H%M%S")}.png'
-            chart_path = os.path.join(self.charts_folder, chart_filename)
-            plt.savefig(chart_path)
-            plt.close()
+            # 提交后台渲染，图表生成前前端显示占位图 (数据不变时复用已有的图表文件)
+            chart_url, chart_ready = self.chart_renderer.submit(
+                self.chart_cache, 'platform_sales', {'platforms': platforms, 'sales_volumes': sales_volumes, 'avg_prices': avg_prices}
+            )
 
             return {
                 'platforms': platforms,
                 'sales_volumes': sales_volumes,
                 'avg_prices': avg_prices,
                 'product_counts': product_counts,
-                'chart_url': os.path.join('images', 'charts', chart_filename),
+                'chart_url': chart_url,
+                'chart_ready': chart_ready,
                 'total_products': sum(product_counts),
                 'total_sales': sum(sales_volumes),
                 'avg_total_price': round(sum(avg_prices) / len(avg_prices), 2) if avg_prices else 0
@@ -647,19 +506,10 @@ class DataAnalysis:
                 behavior_types.append(behavior_type)
                 counts.append(count)
 
-            # 创建图表
-            plt.figure(figsize=(10, 6))
-            
-            # 创建饼图
-            plt.pie(counts, labels=behavior_types, autopct='%1.1f%%',
-                    colors=['#3498db', '#e74c3c', '#2ecc71', '#f1c40f'])
-            plt.title('用户行为分布')
-            
-            # 保存图表
-            chart_filename = f'user_behavior_{datetime.now().strftime("%Y%m%d%H%M%S")}.png'
-            chart_path = os.path.join(self.charts_folder, chart_filename)
-            plt.savefig(chart_path)
-            plt.close()
+            # 提交后台渲染，图表生成前前端显示占位图 (数据不变时复用已有的图表文件)
+            chart_url, chart_ready = self.chart_renderer.submit(
+                self.chart_cache, 'user_behavior', {'behavior_types': behavior_types, 'counts': counts}
+            )
 
             # 计算转化率
             conversion_rates = {}
@@ -674,7 +524,8 @@ class DataAnalysis:
                 'counts': counts,
                 'total_behaviors': sum(counts),
                 'conversion_rates': conversion_rates,
-                'chart_url': os.path.join('images', 'charts', chart_filename),
+                'chart_url': chart_url,
+                'chart_ready': chart_ready,
                 'total_users': total_users,
                 'behavior_distribution': dict(zip(behavior_types, counts))
             }
@@ -725,54 +576,18 @@ class DataAnalysis:
                 sales_volumes.append(int(sales or 0))
                 avg_prices.append(round(float(price or 0), 2))
 
-            # 创建多子图
-            fig, (ax1, ax2, ax3) = plt.subplots(1, 3, figsize=(18, 6))
-
-            # 产品数量分布饼图
-            ax1.pie(product_counts, labels=categories, autopct='%1.1f%%',
-                    colors=['#3498db', '#e74c3c', '#2ecc71', '#f1c40f'])
-            ax1.set_title('各分类产品数量分布')
-
-            # 销量柱状图
-            bars2 = ax2.bar(categories, sales_volumes, color='#3498db')
-            ax2.set_title('各分类总销量对比')
-            ax2.set_xlabel('分类')
-            ax2.set_ylabel('总销量')
-            plt.setp(ax2.xaxis.get_majorticklabels(), rotation=45)
-            # 添加数据标签
-            for bar in bars2:
-                height = bar.get_height()
-                ax2.text(bar.get_x() + bar.get_width()/2., height,
-                        f'{int(height)}',
-                        ha='center', va='bottom')
-
-            # 平均价格柱状图
-            bars3 = ax3.bar(categories, avg_prices, color='#e74c3c')
-            ax3.set_title('各分类平均价格对比')
-            ax3.set_xlabel('分类')
-            ax3.set_ylabel('平均价格 (元)')
-            plt.setp(ax3.xaxis.get_majorticklabels(), rotation=45)
-            # 添加数据标签
-            for bar in bars3:
-                height = bar.get_height()
-                ax3.text(bar.get_x() + bar.get_width()/2., height,
-                        f'¥{height:.2f}',
-                        ha='center', va='bottom')
-
-            plt.tight_layout()
-
-            # 保存图表
-            chart_filename = f'category_analysis_{datetime.now().strftime("%Y%m%d%H%M%S")}.png'
-            chart_path = os.path.join(self.charts_folder, chart_filename)
-            plt.savefig(chart_path)
-            plt.close()
+            # 提交后台渲染，图表生成前前端显示占位图 (数据不变时复用已有的图表文件)
+            chart_url, chart_ready = self.chart_renderer.submit(
+                self.chart_cache, 'category_analysis', {'categories': categories, 'product_counts': product_counts, 'sales_volumes': sales_volumes, 'avg_prices': avg_prices}
+            )
 
             return {
                 'categories': categories,
                 'product_counts': product_counts,
                 'sales_volumes': sales_volumes,
                 'avg_prices': avg_prices,
-                'chart_url': os.path.join('images', 'charts', chart_filename),
+                'chart_url': chart_url,
+                'chart_ready': chart_ready,
                 'total_products': sum(product_counts),
                 'total_sales': sum(sales_volumes),
                 'avg_total_price': round(sum(avg_prices) / len(avg_prices), 2) if avg_prices else 0,
@@ -798,6 +613,9 @@ class DataAnalysis:
 def analyze_review_emotions(review_text):
     """分析评论文本的情感"""
     try:
+        # textblob (及其依赖的 nltk) 导入较慢，只在需要情感分析时导入
+        from textblob import TextBlob
+
         blob = TextBlob(review_text)
         # 获取情感极性（-1到1之间）
         polarity = blob.sentiment.polarity
@@ -823,46 +641,15 @@ def analyze_review_emotions(review_text):
 
 def generate_emotion_radar_chart(emotion_dimensions, product_id):
     """生成情感雷达图"""
-    # 创建图形
-    plt.figure(figsize=(8, 8))
-    
-    # 雷达图的角度
-    categories = ['积极情感', '消极情感', '客观程度', '评价详细度']
-    num_vars = len(categories)
-    
-    # 计算角度
-    angles = [n / float(num_vars) * 2 * np.pi for n in range(num_vars)]
-    angles += angles[:1]
-    
-    # 初始化雷达图
-    ax = plt.subplot(111, projection='polar')
-    
-    # 获取数值
-    values = [
-        emotion_dimensions.get('positive_emotion', 0),
-        emotion_dimensions.get('negative_emotion', 0),
-        emotion_dimensions.get('objectivity', 0),
-        emotion_dimensions.get('length_factor', 0)
-    ]
-    values += values[:1]
-    
-    # 绘制图形
-    ax.plot(angles, values, 'o-', linewidth=2, label='情感得分')
-    ax.fill(angles, values, alpha=0.25)
-    
-    # 设置角度标签
-    ax.set_xticks(angles[:-1])
-    ax.set_xticklabels(categories)
-    
-    # 设置标题
-    plt.title('产品评价情感分析雷达图', pad=20)
-    
     # 确保static/images目录存在
     os.makedirs('static/images/emotion_charts', exist_ok=True)
     
     # 保存图片
     chart_path = f'images/emotion_charts/emotion_radar_{product_id}.png'
-    plt.savefig(f'static/{chart_path}')
-    plt.close()
+    draw_emotion_radar_chart(emotion_dimensions, f'static/{chart_path}')
     
     return chart_path
+
+def draw_emotion_radar_chart(emotion_dimensions, chart_path):
+    """绘制情感雷达图并保存到 chart_path"""
+    render_chart('emotion_radar', emotion_dimensions, chart_path)
@@ -0,0 +1,204 @@
+# 最优购买方案求解
+# filename: analysis/purchase_plan.py
+
+from bisect import bisect_right
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import or_
+
+from models.models import PlatformDiscount
+from recommendation.cache import LRUCache
+
+# 叠加时的计算顺序：先打折，再按打折后的价格判断满减门槛，最后使用消费券
+STACKING_ORDER = ('折扣', '满减', '消费券')
+
+
+def format_plan_discount(discount_type: str, value, min_purchase) -> str:
+    """格式化购买方案中的单条优惠描述"""
+    if discount_type == '满减':
+        return f'满{min_purchase}减{value}'
+    if discount_type == '折扣':
+        return f'{value}折'
+    if discount_type == '消费券':
+        return f'消费券减{value}'
+    return ''
+
+
+def apply_discount(price: float, discount) -> Optional[float]:
+    """在当前价格上使用一条优惠，不满足使用条件时返回None
+
+    Args:
+        price: 当前价格
+        discount: 优惠记录 (需要 discount_type / discount_value / min_purchase 属性)
+
+    Returns:
+        使用优惠后的价格 (不低于0)
+    """
+    value = discount.discount_value or 0
+    if discount.discount_type == '满减':
+        if price < (discount.min_purchase or 0):
+            return None
+        return max(price - value, 0.0)
+    if discount.discount_type == '折扣':
+        return price * value / 10
+    if discount.discount_type == '消费券':
+        return max(price - value, 0.0)
+    return None
+
+
+def best_discount_combination(price: float, discounts: Sequence) -> Tuple[float, List]:
+    """在可叠加规则下求最低的最终价格
+
+    合法的组合有两种：单独使用任意一条优惠；或者组合多条可叠加 (stackable) 的优惠，
+    每种类型最多一条，按 折扣 → 满减 → 消费券 的顺序计算，满减门槛按打折后的价格判断。
+    枚举时只遍历折扣的选择：消费券与门槛无关，直接取面额最大的一条；
+    满减按门槛排序并预先计算前缀最大值，给定打折后的价格二分查找可用的最大减额。
+
+    Args:
+        price: 原价
+        discounts: 产品的有效优惠列表
+
+    Returns:
+        (最终价格, 使用的优惠列表)，优惠列表按计算顺序排列
+    """
+    best_price, best_used = price, []
+
+    def consider(final_price, used):
+        nonlocal best_price, best_used
+        # 价格相同时优先使用优惠数量更少的方案
+        if final_price < best_price - 1e-9 or (
+            abs(final_price - best_price) <= 1e-9 and len(used) < len(best_used)
+        ):
+            best_price, best_used = final_price, used
+
+    # 单独使用一条优惠
+    for discount in discounts:
+        final_price = apply_discount(price, discount)
+        if final_price is not None:
+            consider(final_price, [discount])
+
+    by_type = {discount_type: [] for discount_type in STACKING_ORDER}
+    for discount in discounts:
+        if discount.stackable and discount.discount_type in by_type:
+            by_type[discount.discount_type].append(discount)
+    if sum(1 for group in by_type.values() if group) < 2:
+        return best_price, best_used
+
+    # 满减按门槛升序，prefix_best[i] 为前 i+1 条中减额最大的一条
+    full_reductions = sorted(by_type['满减'], key=lambda d: d.min_purchase or 0)
+    thresholds = [d.min_purchase or 0 for d in full_reductions]
+    prefix_best = []
+    for discount in full_reductions:
+        if not prefix_best or (discount.discount_value or 0) > (prefix_best[-1].discount_value or 0):
+            prefix_best.append(discount)
+        else:
+            prefix_best.append(prefix_best[-1])
+    coupon = max(by_type['消费券'], key=lambda d: d.discount_value or 0, default=None)
+
+    for rebate in [None] + by_type['折扣']:
+        current, used = price, []
+        if rebate is not None:
+            current, used = apply_discount(current, rebate), [rebate]
+        position = bisect_right(thresholds, current)
+        if position:
+            reduction = prefix_best[position - 1]
+            current, used = apply_discount(current, reduction), used + [reduction]
+        if coupon is not None:
+            current, used = apply_discount(current, coupon), used + [coupon]
+        if len(used) >= 2:
+            consider(current, used)
+
+    return best_price, best_used
+
+
+def load_active_discounts(product_ids: Iterable[int], now: Optional[datetime] = None) -> Dict[int, List]:
+    """一次查询加载多个产品当前生效的优惠
+
+    Args:
+        product_ids: 产品ID列表
+        now: 查询时间，默认为当前时间
+
+    Returns:
+        产品ID到优惠列表的映射
+    """
+    product_ids = list(product_ids)
+    result = {product_id: [] for product_id in product_ids}
+    if not product_ids:
+        return result
+
+    now = now or datetime.now()
+    discounts = PlatformDiscount.query.filter(
+        PlatformDiscount.product_id.in_(product_ids),
+        or_(PlatformDiscount.start_date.is_(None), PlatformDiscount.start_date <= now),
+        or_(PlatformDiscount.end_date.is_(None), PlatformDiscount.end_date >= now)
+    ).order_by(PlatformDiscount.id).all()
+    for discount in discounts:
+        result[discount.product_id].append(discount)
+    return result
+
+
+class PurchasePlanner:
+    """计算各平台产品的最优购买方案，按产品缓存结果
+
+    未命中缓存的产品在一次查询中批量加载优惠；产品或优惠变化时调用 invalidate
+    清除对应产品的方案，ttl 用于让优惠的生效时间和其他进程的写入最终生效。
+    """
+
+    def __init__(self, max_size: int = 4096, ttl: Optional[float] = 300):
+        """初始化
+
+        Args:
+            max_size: 最多缓存的产品方案数
+            ttl: 方案的缓存时间 (秒)
+        """
+        self._plans = LRUCache(max_size=max_size, ttl=ttl)
+
+    def invalidate(self, product_id: Optional[int] = None):
+        """清除某个产品的方案缓存，不传产品ID时清除全部"""
+        if product_id is None:
+            self._plans.clear()
+        else:
+            self._plans.delete(product_id)
+
+    @staticmethod
+    def build_plan(product, discounts: Sequence) -> Dict[str, Any]:
+        """计算单个产品的最优方案"""
+        final_price, used = best_discount_combination(product.price, discounts)
+        discount_desc = [format_plan_discount(d.discount_type, d.discount_value, d.min_purchase) for d in used]
+        return {
+            'product_id': product.id,
+            'product_name': product.name,
+            'platform': product.platform,
+            'original_price': round(product.price, 2),  # 保留两位小数
+            'final_price': round(final_price, 2),
+            'discount_desc': '、'.join(discount_desc) if discount_desc else '无优惠',
+            'discount_amount': round(product.price - final_price, 2),
+            'discount_percentage': round((product.price - final_price) / product.price * 100, 2) if product.price > 0 else 0
+        }
+
+    def plans_for(self, products: Sequence) -> List[Dict[str, Any]]:
+        """计算多个产品的最优方案，按最终价格升序排列
+
+        Args:
+            products: 产品列表
+
+        Returns:
+            方案列表
+        """
+        plans, missing = {}, []
+        for product in products:
+            plan = self._plans.get(product.id)
+            if plan is None:
+                missing.append(product)
+            else:
+                plans[product.id] = plan
+
+        if missing:
+            discounts = load_active_discounts(p.id for p in missing)
+            for product in missing:
+                plan = self.build_plan(product, discounts[product.id])
+                self._plans.set(product.id, plan)
+                plans[product.id] = plan
+
+        return sorted((dict(plans[p.id]) for p in products), key=lambda plan: plan['final_price'])
@@ -8,15 +8,18 @@ from werkzeug.utils import secure_filename
 import os
 from functools import wraps
 import json
-import pandas as pd
+import hashlib
 from datetime import datetime, timedelta
-from sqlalchemy import or_
+from sqlalchemy import or_, func
 
 # 导入自定义模块
 # from models.models import db, init_db, User, Product, ProductCategory, UserBehavior, UserReview
 # from .models.models import db, init_db, User, Product, ProductCategory, UserBehavior, UserReview
 from models.models import db, init_db, User, Product, ProductCategory, UserBehavior, UserReview
+from models.behavior_events import BehaviorEventWriter
+from models.reference_data import ReferenceData
 from analysis.data_analysis import DataAnalysis
+from search.product_index import ProductSearchIndex
 from recommendation.recommender import ProductRecommender
 from config import Config
 
@@ -33,8 +36,6 @@ os.makedirs(os.path.join(app.static_folder, 'images/emotion_charts'), exist_ok=T
 
 # 配置
 app.config['SECRET_KEY'] = os.urandom(24)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///product_recommendation.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB最大上传限制
 
@@ -44,11 +45,40 @@ os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 # 初始化数据库
 init_db(app)
 
-# 初始化推荐系统
-recommender = ProductRecommender()
+# 浏览行为由后台线程批量写入，不占用页面请求的时间
+with app.app_context():
+    behavior_writer = BehaviorEventWriter(db.engine,
+                                          batch_size=app.config['BEHAVIOR_BATCH_SIZE'],
+                                          flush_interval=app.config['BEHAVIOR_FLUSH_INTERVAL'],
+                                          max_queue=app.config['BEHAVIOR_QUEUE_SIZE'])
+
+# 初始化推荐系统 (加载已训练的模型，内存映射方式在多个进程间共享)
+recommender = ProductRecommender(similarity_backend=app.config['RECOMMENDER_SIMILARITY_BACKEND'],
+                                 mode=app.config['RECOMMENDER_MODE'])
+recommender.load_model(app.config['MODEL_ARTIFACT_DIR'])
+recommender.load_precomputed(app.config['PRECOMPUTED_DIR'], app.config['PRECOMPUTED_MAX_AGE'])
+# 新行为的轮询和近邻更新在后台线程中执行，不占用推荐请求的时间
+recommender.online.start(app)
+
+# 初始化产品搜索索引 (索引与产品表不一致时重建)
+product_search = ProductSearchIndex()
+with app.app_context():
+    product_search.ensure()
 
 # 初始化数据分析
-data_analysis = DataAnalysis(static_folder='static')
+data_analysis = DataAnalysis(static_folder='static', chart_workers=app.config['CHART_RENDER_WORKERS'],
+                             search_index=product_search)
+
+# 导航栏的分类和筛选用的平台列表，所有模板共用
+reference_data = ReferenceData(ttl=app.config['REFERENCE_DATA_TTL'])
+
+@app.context_processor
+def inject_reference_data():
+    """向模板注入分类和平台列表 (模板参数中同名的变量优先)"""
+    return {
+        'categories': reference_data.categories(),
+        'platforms': reference_data.platforms(),
+    }
 
 # 登录所需的装饰器
 def login_required(f):
@@ -80,9 +110,6 @@ def admin_required(f):
 @app.route('/')
 def index():
     """首页"""
-    # 获取产品类别
-    categories = ProductCategory.query.all()
-    
     # 获取热门产品
     popular_products = recommender.get_popular_products(8)
     
@@ -95,7 +122,6 @@ def index():
         personalized_products = recommender.get_user_recommendations(session['user_id'], 4)
     
     return render_template('index.html', 
-                          categories=categories,
                           popular_products=popular_products,
                           discount_products=discount_products,
                           personalized_products=personalized_products)
@@ -103,9 +129,6 @@ def index():
 @app.route('/register', methods=['GET', 'POST'])
 def register():
     """用户注册"""
-    # 获取所有分类用于导航
-    categories = ProductCategory.query.all()
-    
     if request.method == 'POST':
         username = request.form.get('username')
         password = request.form.get('password')
@@ -148,13 +171,10 @@ def register():
         flash('注册成功，请登录', 'success')
         return redirect(url_for('login'))
     
-    return render_template('register.html', categories=categories)  # 传递分类数据
+    return render_template('register.html')
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
-    # 获取所有分类用于导航
-    categories = ProductCategory.query.all()
-    
     if request.method == 'POST':
         username = request.form.get('username')
         password = request.form.get('password')
@@ -174,7 +194,7 @@ def login():
         else:
             flash('用户名或密码错误', 'danger')
 
-    return render_template('login.html', categories=categories)  # 传递分类数据
+    return render_template('login.html')
 
 @app.route('/logout')
 def logout():
@@ -225,16 +245,9 @@ def products():
     pagination = query.paginate(page=page, per_page=per_page, error_out=False)
     products = pagination.items
     
-    # 获取类别和平台列表（用于筛选）
-    categories = ProductCategory.query.all()
-    platforms = db.session.query(Product.platform).distinct().all()
-    platforms = [p[0] for p in platforms]
-    
     return render_template('products.html',
                           products=products,
                           pagination=pagination,
-                          categories=categories,
-                          platforms=platforms,
                           selected_category=category_id,
                           selected_platform=platform,
                           min_price=min_price,
@@ -247,9 +260,6 @@ def product_detail(product_id):
         # 获取产品信息
         product = Product.query.get_or_404(product_id)
         
-        # 获取所有分类，用于导航栏
-        categories = ProductCategory.query.all()
-        
         # 获取产品规格
         specs = {}
         if (product.spec_json):
@@ -264,38 +274,17 @@ def product_detail(product_id):
         # 获取相似产品推荐
         similar_products = recommender.get_similar_products(product_id, 4)
         
-        # 获取价格趋势
-        price_trend = data_analysis.get_price_trend(product_id)
-        
-        # 获取平台价格对比
-        platform_compare = data_analysis.compare_platform_prices(product.name)
-        
-        # 获取评价分析
-        review_analysis = data_analysis.analyze_user_reviews(product_id)
-        
-        # 获取最优购买方案
-        optimal_plans = data_analysis.get_optimal_purchase_plan(product_id)
+        # 价格趋势、平台对比、评价分析和最优购买方案由页面从 /api/product/<id>/* 接口获取并绘制，
+        # 不在页面请求中计算
         
         # 记录用户浏览行为（如果已登录）
         if 'user_id' in session:
-            user_behavior = UserBehavior(
-                user_id=session['user_id'],
-                product_id=product_id,
-                behavior_type='浏览',
-                created_at=datetime.now()
-            )
-            db.session.add(user_behavior)
-            db.session.commit()
+            behavior_writer.record(session['user_id'], product_id, '浏览')
         
         return render_template('product_detail.html',
                              product=product,
-                             categories=categories,  # 添加分类数据
                              reviews=reviews,
                              specs=specs,
-                             price_trend=price_trend,
-                             platform_compare=platform_compare,
-                             optimal_plans=optimal_plans,
-                             review_analysis=review_analysis,
                              similar_products=similar_products)
     except Exception as e:
         print(f"获取产品详情时出错: {str(e)}")
@@ -307,15 +296,11 @@ def category_products(category_id):
         # 获取当前分类
         current_category = ProductCategory.query.get_or_404(category_id)
         
-        # 获取所有分类用于导航
-        categories = ProductCategory.query.all()
-        
         # 获取该分类下的产品
         products = Product.query.filter_by(category_id=category_id).all()
         
         return render_template('category.html',
                              current_category=current_category,
-                             categories=categories,  # 添加分类数据
                              products=products)
     except Exception as e:
         print(f"获取分类产品时出错: {str(e)}")
@@ -326,21 +311,17 @@ def category_products(category_id):
 def user_profile():
     """用户个人中心"""
     user = User.query.get(session['user_id'])
-    categories = ProductCategory.query.all()  # 添加分类数据获取
     behaviors = UserBehavior.query.filter_by(user_id=user.id).order_by(UserBehavior.created_at.desc()).limit(20).all()
     
     return render_template('user_profile.html',
                          user=user,
-                         behaviors=behaviors,
-                         categories=categories)  # 传递分类数据
+                         behaviors=behaviors)
 
 @app.route('/user/favorites')
 @login_required
 def user_favorites():
     """用户收藏"""
     user_id = session['user_id']
-    categories = ProductCategory.query.all()  # 添加分类数据获取
-    
     favorites = UserBehavior.query.filter_by(
         user_id=user_id,
         behavior_type='收藏'
@@ -356,8 +337,7 @@ def user_favorites():
             })
     
     return render_template('user_favorites.html',
-                         favorite_products=favorite_products,
-                         categories=categories)  # 传递分类数据
+                         favorite_products=favorite_products)
 
 @app.route('/api/favorite/<int:product_id>', methods=['POST'])
 @login_required
@@ -377,6 +357,7 @@ def toggle_favorite(product_id):
         # 取消收藏
         db.session.delete(existing_favorite)
         db.session.commit()
+        recommender.record_behavior_removal(session['user_id'], product_id, '收藏')
         return jsonify({'status': 'success', 'action': 'remove'})
     else:
         # 添加收藏
@@ -390,6 +371,52 @@ def toggle_favorite(product_id):
         db.session.commit()
         return jsonify({'status': 'success', 'action': 'add'})
 
+def conditional_json(payload, last_modified=None):
+    """返回带 ETag / Last-Modified 的JSON响应，客户端数据未变化时返回304
+    
+    Args:
+        payload: 响应数据
+        last_modified: 数据的最后修改时间，未知时只使用 ETag
+    """
+    body = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(hashlib.sha1(body.encode('utf-8')).hexdigest())
+    if last_modified:
+        response.last_modified = last_modified
+    # 允许浏览器缓存，但每次使用前都要向服务器验证
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+@app.route('/api/product/<int:product_id>/price_trend')
+def api_price_trend(product_id):
+    """产品价格趋势数据"""
+    Product.query.get_or_404(product_id)
+    days = request.args.get('days', 30, type=int)
+    return conditional_json(data_analysis.get_price_trend(product_id, days, render_chart=False))
+
+@app.route('/api/product/<int:product_id>/platform_compare')
+def api_platform_compare(product_id):
+    """产品各平台价格对比数据"""
+    product = Product.query.get_or_404(product_id)
+    last_modified = max((p.updated_at for p in product_search.containing(product.name) if p.updated_at), default=None)
+    return conditional_json(data_analysis.compare_platform_prices(product.name, render_chart=False), last_modified)
+
+@app.route('/api/product/<int:product_id>/review_analysis')
+def api_review_analysis(product_id):
+    """产品评价分析数据"""
+    Product.query.get_or_404(product_id)
+    last_modified = db.session.query(func.max(UserReview.created_at)).filter(
+        UserReview.product_id == product_id
+    ).scalar()
+    return conditional_json(data_analysis.analyze_user_reviews(product_id, render_chart=False), last_modified)
+
+@app.route('/api/product/<int:product_id>/optimal_plan')
+def api_optimal_plan(product_id):
+    """产品最优购买方案数据"""
+    Product.query.get_or_404(product_id)
+    return conditional_json(data_analysis.get_optimal_purchase_plan(product_id, render_chart=False))
+
 @app.route('/about')
 def about():
     """关于页面"""
@@ -410,9 +437,6 @@ def admin_dashboard():
         recent_users = User.query.order_by(User.register_time.desc()).limit(5).all()
         recent_products = Product.query.order_by(Product.created_at.desc()).limit(5).all()
         
-        # 获取所有分类
-        categories = ProductCategory.query.all()
-        
         # 返回模板
         return render_template('admin/dashboard.html',
                              user_count=user_count,
@@ -420,8 +444,7 @@ def admin_dashboard():
                              category_count=category_count,
                              review_count=review_count,
                              recent_users=recent_users,
-                             recent_products=recent_products,
-                             categories=categories)
+                             recent_products=recent_products)
     except Exception as e:
         flash(f'获取仪表盘数据失败: {str(e)}', 'error')
         return redirect(url_for('index'))
@@ -443,7 +466,7 @@ def admin_products():
         query = query.filter_by(category_id=category_id)
     
     if keyword:
-        query = query.filter(Product.name.like(f'%{keyword}%'))
+        query = product_search.filter(query, keyword)
     
     if min_price:
         query = query.filter(Product.price >= min_price)
@@ -457,12 +480,8 @@ def admin_products():
     pagination = query.order_by(Product.id.desc()).paginate(page=page, per_page=per_page, error_out=False)
     products = pagination.items
     
-    # 获取所有分类
-    categories = ProductCategory.query.all()
-    
     return render_template('admin/products.html', 
                           products=products, 
-                          categories=categories,
                           pagination=pagination)
 
 @app.route('/admin/product/<int:product_id>/json')
@@ -536,7 +555,10 @@ def admin_add_product():
         )
         
         db.session.add(new_product)
+        db.session.flush()
+        product_search.index_product(new_product)
         db.session.commit()
+        reference_data.invalidate('platforms')
         
         flash('产品添加成功', 'success')
     except Exception as e:
@@ -596,7 +618,11 @@ def admin_edit_product():
                 file.save(file_path)
                 product.image_url = f"/static/uploads/{unique_filename}"
         
+        product_search.index_product(product)
         db.session.commit()
+        reference_data.invalidate('platforms')
+        recommender.invalidate_product(product_id)
+        data_analysis.purchase_planner.invalidate(product_id)
         
         flash('产品更新成功', 'success')
     except Exception as e:
@@ -619,13 +645,18 @@ def admin_delete_product():
         # 获取产品
         product = Product.query.get_or_404(product_id)
         
-        # 删除相关记录
+        # 删除相关记录 (先写入队列中的行为，避免删除后又写入)
+        behavior_writer.flush()
         UserBehavior.query.filter_by(product_id=product_id).delete()
         UserReview.query.filter_by(product_id=product_id).delete()
         
         # 删除产品
         db.session.delete(product)
+        product_search.remove_product(product_id)
         db.session.commit()
+        reference_data.invalidate('platforms')
+        recommender.remove_product(product_id)
+        data_analysis.purchase_planner.invalidate(product_id)
         
         flash('产品删除成功', 'success')
     except Exception as e:
@@ -638,8 +669,6 @@ def admin_delete_product():
 @admin_required
 def admin_users():
     """管理员用户管理"""
-    categories = ProductCategory.query.all()  # 添加分类数据获取
-    
     username = request.args.get('username')
     email = request.args.get('email')
     query = User.query
@@ -656,8 +685,7 @@ def admin_users():
     
     return render_template('admin/users.html',
                          users=users,
-                         pagination=pagination,
-                         categories=categories)  # 传递分类数据
+                         pagination=pagination)
 
 @app.route('/admin/user/<int:user_id>/json')
 @admin_required
@@ -794,7 +822,8 @@ def admin_delete_user():
             flash('不能删除管理员账户', 'danger')
             return redirect(url_for('admin_users'))
         
-        # 删除相关记录
+        # 删除相关记录 (先写入队列中的行为，避免删除后又写入)
+        behavior_writer.flush()
         UserBehavior.query.filter_by(user_id=user_id).delete()
         UserReview.query.filter_by(user_id=user_id).delete()
         
@@ -813,6 +842,7 @@ def admin_delete_user():
 @admin_required
 def admin_categories():
     """管理员类别管理"""
+    # 管理页面需要每个分类的产品数量，使用ORM对象而不是导航栏的缓存数据
     categories = ProductCategory.query.all()
     return render_template('admin/categories.html', categories=categories)
 
@@ -856,6 +886,7 @@ def admin_add_category():
         
         db.session.add(new_category)
         db.session.commit()
+        reference_data.invalidate('categories')
         
         flash('分类添加成功', 'success')
     except Exception as e:
@@ -895,6 +926,7 @@ def admin_edit_category():
         category.description = description
         
         db.session.commit()
+        reference_data.invalidate('categories')
         
         flash('分类更新成功', 'success')
     except Exception as e:
@@ -920,6 +952,7 @@ def admin_delete_category():
         # 删除分类
         db.session.delete(category)
         db.session.commit()
+        reference_data.invalidate('categories')
         
         flash('分类删除成功', 'success')
     except Exception as e:
@@ -932,10 +965,10 @@ def admin_delete_category():
 @admin_required
 def admin_analysis():
     """管理员数据分析"""
-    categories = ProductCategory.query.all()  # 添加分类数据获取
-    
-    discount_effect = data_analysis.analyze_discount_effect()
-    stackable_effect = data_analysis.analyze_stackable_discounts()
+    # 两项优惠分析共用同一次分组查询的结果
+    discount_summary = data_analysis.discount_sales_summary()
+    discount_effect = data_analysis.analyze_discount_effect(discount_summary)
+    stackable_effect = data_analysis.analyze_stackable_discounts(discount_summary)
     platform_sales = data_analysis.analyze_platform_sales()
     user_behavior = data_analysis.analyze_user_behavior()
     category_analysis = data_analysis.analyze_product_categories()
@@ -945,8 +978,7 @@ def admin_analysis():
                          stackable_effect=stackable_effect,
                          platform_sales=platform_sales,
                          user_behavior=user_behavior,
-                         category_analysis=category_analysis,
-                         categories=categories)  # 传递分类数据
+                         category_analysis=category_analysis)
 
 @app.route('/submit_review', methods=['POST'])
 @login_required
@@ -980,6 +1012,7 @@ def submit_review():
 
     db.session.add(review)
     db.session.commit()
+    recommender.record_review(product_id, rating)
 
     flash('评价提交成功，感谢您的反馈！', 'success')
     return redirect(url_for('product_detail', product_id=product_id))
@@ -988,18 +1021,16 @@ def submit_review():
 def search():
     query = request.args.get('q', '')
     
-    # 获取所有分类用于导航
-    categories = ProductCategory.query.all()
-    
-    # 构建查询
-    products = Product.query.filter(
-        Product.name.ilike(f'%{query}%')
-    ).all()
+    # 按相关度排序的分页搜索
+    page = request.args.get('page', 1, type=int)
+    pagination = product_search.search(query, page=page, per_page=20,
+                                       category_id=request.args.get('category', type=int),
+                                       platform=request.args.get('platform'))
     
     return render_template('search_results.html',
                          query=query,
-                         products=products,
-                         categories=categories)  # 添加分类数据
+                         products=pagination.items,
+                         pagination=pagination)
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=True)
\ No newline at end of file
@@ -0,0 +1,93 @@
+# 近似最近邻基准测试：随机投影LSH与精确余弦相似度的召回率和查询延迟对比
+# filename: benchmarks/bench_ann.py
+#
+# 用法: python benchmarks/bench_ann.py --items 10000 100000 1000000 --tables 32 --bits 10 --probes 4
+
+import argparse
+import time
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+import common  # noqa: F401  (将项目根目录加入导入路径)
+from recommendation.ann import RandomProjectionLSH
+from recommendation.neighbors import l2_normalize_rows
+
+
+def synthetic_item_vectors(n_items, cluster_size=20, pool_size=25, per_item=15, noise=3, seed=42):
+    """生成带有簇结构的稀疏物品向量 (物品数 × 用户数)
+
+    同一簇内的物品从同一个用户池中抽取交互用户，另外加入少量随机用户作为噪声。
+    """
+    rng = np.random.default_rng(seed)
+    n_clusters = max(1, n_items // cluster_size)
+    n_users = n_clusters * pool_size
+    clusters = rng.integers(0, n_clusters, n_items)
+
+    in_pool = clusters[:, None] * pool_size + rng.integers(0, pool_size, (n_items, per_item))
+    random_users = rng.integers(0, n_users, (n_items, noise))
+    cols = np.concatenate([in_pool, random_users], axis=1).ravel()
+    rows = np.repeat(np.arange(n_items), per_item + noise)
+    weights = rng.choice(np.array([1.0, 2.0, 3.0, 5.0], dtype=np.float32), len(cols))
+    matrix = csr_matrix((weights, (rows, cols)), shape=(n_items, n_users))
+    matrix.sum_duplicates()
+    return matrix
+
+
+def exact_query(normed, row, k):
+    """精确计算与第row个物品最相似的k个物品"""
+    sims = (normed @ normed[row].T).toarray().ravel()
+    sims[row] = 0
+    top = np.argpartition(-sims, k - 1)[:k]
+    top = top[np.argsort(-sims[top], kind='stable')]
+    return top[sims[top] > 0]
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(np.array(samples) * 1000, q))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='近似最近邻召回率与延迟基准测试')
+    parser.add_argument('--items', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--tables', type=int, default=32)
+    parser.add_argument('--bits', type=int, default=10)
+    parser.add_argument('--probes', type=int, default=4)
+    parser.add_argument('--max-candidates', type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f'{"物品数":>10} {"建索引(s)":>10} {"recall@K":>9} {"精确p50(ms)":>12} {"精确p99(ms)":>12} '
+          f'{"LSH p50(ms)":>12} {"LSH p99(ms)":>12}')
+    for n_items in args.items:
+        vectors = synthetic_item_vectors(n_items)
+        normed = l2_normalize_rows(vectors)
+
+        start = time.perf_counter()
+        index = RandomProjectionLSH(n_tables=args.tables, n_bits=args.bits, n_probes=args.probes,
+                                    max_candidates=args.max_candidates).fit(vectors)
+        build_time = time.perf_counter() - start
+
+        rng = np.random.default_rng(0)
+        queries = rng.choice(n_items, min(args.queries, n_items), replace=False)
+        exact_times, ann_times, recalls = [], [], []
+        for row in queries.tolist():
+            start = time.perf_counter()
+            expected = exact_query(normed, row, args.k)
+            exact_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            found, _ = index.query_item(row, args.k)
+            ann_times.append(time.perf_counter() - start)
+
+            if len(expected):
+                recalls.append(len(np.intersect1d(expected, found)) / len(expected))
+
+        print(f'{n_items:>10} {build_time:10.2f} {np.mean(recalls):9.3f} '
+              f'{percentile_ms(exact_times, 50):12.2f} {percentile_ms(exact_times, 99):12.2f} '
+              f'{percentile_ms(ann_times, 50):12.2f} {percentile_ms(ann_times, 99):12.2f}')
+
+
+if __name__ == '__main__':
+    main()
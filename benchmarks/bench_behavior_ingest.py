@@ -0,0 +1,96 @@
+# 用户行为写入基准测试：每次请求单独提交与后台批量写入的请求延迟和写入速率对比
+# filename: benchmarks/bench_behavior_ingest.py
+#
+# 用法: python benchmarks/bench_behavior_ingest.py --events 20000 --threads 8
+
+import argparse
+import random
+import threading
+import time
+from datetime import datetime
+
+from common import create_benchmark_app, seed_products, timed
+
+from models.models import db, UserBehavior
+from models.behavior_events import BehaviorEventWriter
+from models.sqlite_tuning import install_sqlite_pragmas
+
+
+def run_producers(record, n_events, n_threads, n_products, seed=1):
+    """多个线程并发记录行为，返回每次记录的耗时列表"""
+    per_thread = n_events // n_threads
+    latencies = []
+    lock = threading.Lock()
+
+    def producer(worker_seed):
+        rng = random.Random(worker_seed)
+        local = []
+        for _ in range(per_thread):
+            start = time.perf_counter()
+            record(rng.randint(1, 1000), rng.randint(1, n_products))
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=producer, args=(seed + i,)) for i in range(n_threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='用户行为同步写入与批量写入的对比')
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--flush-interval', type=int, default=200, help='毫秒')
+    args = parser.parse_args()
+
+    app = create_benchmark_app()
+    with app.app_context():
+        # 基准应用的引擎不复用连接，之后建立的连接都会应用这些设置
+        install_sqlite_pragmas(db.engine)
+        seed_products(args.products)
+        engine = db.engine
+
+        def record_sync(user_id, product_id):
+            # 与原来的 product_detail 相同：每条行为单独提交
+            with engine.begin() as conn:
+                conn.execute(UserBehavior.__table__.insert(), {'user_id': user_id, 'product_id': product_id,
+                                                               'behavior_type': '浏览', 'created_at': datetime.now()})
+
+        writer = BehaviorEventWriter(engine, batch_size=args.batch_size, flush_interval=args.flush_interval)
+
+        def record_async(user_id, product_id):
+            writer.record(user_id, product_id, '浏览')
+
+        def run_async():
+            latencies = run_producers(record_async, args.events, args.threads, args.products)
+            writer.flush()
+            return latencies
+
+        sync_elapsed, sync_latencies = timed(run_producers, record_sync, args.events, args.threads, args.products)
+        async_elapsed, async_latencies = timed(run_async)
+        writer.close()
+        total = db.session.query(UserBehavior).count()
+
+    n = len(sync_latencies)
+    print(f'{args.threads} 个线程各记录 {n // args.threads} 条行为，数据库共 {total} 条')
+    print(f'{"方式":<8} {"写入/秒":>10} {"请求p50(ms)":>12} {"请求p99(ms)":>12}')
+    for label, elapsed, latencies in [('同步提交', sync_elapsed, sync_latencies),
+                                      ('批量写入', async_elapsed, async_latencies)]:
+        print(f'{label:<8} {n / elapsed:10.0f} {percentile(latencies, 0.5) * 1000:12.3f} '
+              f'{percentile(latencies, 0.99) * 1000:12.3f}')
+    print(f'批量写入统计: {writer.stats}')
+
+
+if __name__ == '__main__':
+    main()
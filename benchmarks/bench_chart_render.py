@@ -0,0 +1,67 @@
+# 图表渲染基准测试：后台进程池的渲染吞吐量随进程数的变化
+# filename: benchmarks/bench_chart_render.py
+#
+# 用法: python benchmarks/bench_chart_render.py --charts 40 --workers 1 2 4
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from common import timed
+from analysis.chart_cache import ChartCache
+from analysis.chart_renderer import ChartRenderer
+
+
+def synthetic_price_trends(n_charts, days=30, seed=42):
+    """生成互不相同的价格趋势数据，保证每张图表都需要实际渲染"""
+    rng = random.Random(seed)
+    charts = []
+    for i in range(n_charts):
+        base = rng.uniform(1000, 10000)
+        prices = [round(base + rng.uniform(-200, 200), 2) for _ in range(days)]
+        charts.append({
+            'dates': [f'2025-03-{d + 1:02d}' for d in range(days)],
+            'prices': prices,
+            'discount_prices': [round(p * 0.9, 2) for p in prices],
+        })
+    return charts
+
+
+def render_all(renderer, charts_folder, charts):
+    """提交全部图表并等待渲染完成，返回请求线程中提交所用的最长时间 (秒)"""
+    cache = ChartCache(charts_folder, max_files=None, max_bytes=None)
+    slowest_submit = 0.0
+    for data in charts:
+        start = time.perf_counter()
+        renderer.submit(cache, 'price_trend', data)
+        slowest_submit = max(slowest_submit, time.perf_counter() - start)
+    renderer.wait()
+    return slowest_submit
+
+
+def main():
+    parser = argparse.ArgumentParser(description='图表渲染吞吐量基准测试')
+    parser.add_argument('--charts', type=int, default=40)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    charts = synthetic_price_trends(args.charts)
+    print(f'CPU核数: {os.cpu_count()}, 图表数: {args.charts}')
+    print(f'{"进程数":>6} {"耗时(s)":>10} {"图表/秒":>10} {"最长提交(ms)":>14}')
+
+    for workers in [0] + sorted(set(args.workers)):
+        renderer = ChartRenderer(max_workers=workers)
+        if workers:
+            # 预先启动进程池，不把进程创建时间计入吞吐量
+            renderer.submit(ChartCache(tempfile.mkdtemp(prefix='bench_charts_')), 'price_trend', charts[0])
+            renderer.wait()
+        elapsed, slowest_submit = timed(render_all, renderer, tempfile.mkdtemp(prefix='bench_charts_'), charts)
+        renderer.shutdown()
+        label = '同步' if workers == 0 else str(workers)
+        print(f'{label:>6} {elapsed:10.2f} {args.charts / elapsed:10.1f} {slowest_submit * 1000:14.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+# 并行训练基准测试：物品近邻索引的构建耗时随进程数的变化
+# filename: benchmarks/bench_parallel_train.py
+#
+# 用法: python benchmarks/bench_parallel_train.py --items 50000 --users 200000 --jobs 1 2 4 8
+
+import argparse
+import os
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from common import timed
+from recommendation.neighbors import build_topk_neighbors
+from recommendation.parallel import build_topk_neighbors_parallel
+
+
+def synthetic_item_vectors(n_items, n_users, nnz_per_item, seed=42):
+    """生成随机的稀疏物品向量 (物品数 × 用户数)"""
+    rng = np.random.default_rng(seed)
+    rows = np.repeat(np.arange(n_items), nnz_per_item)
+    cols = rng.integers(0, n_users, n_items * nnz_per_item)
+    weights = rng.choice(np.array([1.0, 2.0, 3.0, 5.0], dtype=np.float32), len(cols))
+    return csr_matrix((weights, (rows, cols)), shape=(n_items, n_users))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多进程近邻索引构建耗时基准测试')
+    parser.add_argument('--items', type=int, default=50000)
+    parser.add_argument('--users', type=int, default=200000)
+    parser.add_argument('--nnz-per-item', type=int, default=40)
+    parser.add_argument('--k', type=int, default=50)
+    parser.add_argument('--jobs', type=int, nargs='+', default=[1, 2, 4, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    vectors = synthetic_item_vectors(args.items, args.users, args.nnz_per_item)
+    serial_time, expected = timed(build_topk_neighbors, vectors, args.k)
+    print(f'CPU核数: {os.cpu_count()}, 物品数: {args.items}, 非零元素: {vectors.nnz}')
+    print(f'{"进程数":>6} {"耗时(s)":>10} {"加速比":>8}')
+    print(f'{"串行":>6} {serial_time:10.2f} {1.0:8.2f}')
+
+    for n_jobs in sorted(set(args.jobs)):
+        elapsed, neighbors = timed(build_topk_neighbors_parallel, vectors, args.k, n_jobs=n_jobs)
+        assert abs(neighbors - expected).sum() < 1e-3, '并行结果与串行结果不一致'
+        print(f'{n_jobs:>6} {elapsed:10.2f} {serial_time / elapsed:8.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+# 查询计划基准测试：热点查询在添加组合索引前后的执行计划和耗时
+# filename: benchmarks/bench_query_plans.py
+#
+# 用法: python benchmarks/bench_query_plans.py --products 20000 --behaviors 1000000
+
+import argparse
+import random
+from datetime import date, datetime, timedelta
+
+from common import create_benchmark_app, seed_products, seed_behaviors, timed, PLATFORMS
+
+from models.models import db
+from models.migrations import migrate
+
+# 与应用中ORM生成的SQL形状一致的热点查询
+HOT_QUERIES = [
+    ('价格趋势', 'SELECT date, price, discount_price FROM product_sales '
+                 'WHERE product_id = :product_id AND date >= :start AND date <= :end ORDER BY date'),
+    ('收藏列表', "SELECT id, product_id, created_at FROM user_behaviors "
+                 "WHERE user_id = :user_id AND behavior_type = '收藏' ORDER BY created_at DESC"),
+    ('最近行为', 'SELECT id, product_id, behavior_type FROM user_behaviors '
+                 'WHERE user_id = :user_id ORDER BY created_at DESC LIMIT 20'),
+    ('最新评价', 'SELECT id, rating, content FROM user_reviews '
+                 'WHERE product_id = :product_id ORDER BY created_at DESC LIMIT 10'),
+    ('分类列表', 'SELECT id, name, price FROM products '
+                 'WHERE category_id = :category_id AND platform = :platform ORDER BY price LIMIT 20'),
+    ('平台价格', 'SELECT id, name, price FROM products '
+                 'WHERE platform = :platform AND price >= :min_price AND price <= :max_price ORDER BY price LIMIT 20'),
+    ('产品优惠', 'SELECT id, discount_type, discount_value FROM platform_discounts '
+                 'WHERE product_id IN (:p1, :p2, :p3, :p4, :p5)'),
+]
+
+
+def seed_sales_reviews_discounts(n_products, days, reviews_per_product, seed=42):
+    """批量写入销售记录、评价和优惠（需要在应用上下文中调用）"""
+    rng = random.Random(seed)
+    today = date.today()
+    now = datetime.now()
+    sales, reviews, discounts = [], [], []
+    for product_id in range(1, n_products + 1):
+        price = round(rng.uniform(500, 20000), 2)
+        for d in range(days):
+            sales.append({'product_id': product_id, 'platform': rng.choice(PLATFORMS), 'price': price,
+                          'discount_price': round(price * 0.9, 2), 'sales_volume': rng.randint(0, 200),
+                          'date': today - timedelta(days=d)})
+        for _ in range(reviews_per_product):
+            reviews.append({'product_id': product_id, 'user_id': rng.randint(1, 1000), 'rating': rng.randint(1, 5),
+                            'content': '不错', 'created_at': now - timedelta(minutes=rng.randint(0, 100000))})
+        discounts.append({'product_id': product_id, 'platform': rng.choice(PLATFORMS), 'discount_type': '折扣',
+                          'discount_value': 9.0, 'end_date': now + timedelta(days=rng.randint(-30, 30))})
+
+    db.session.execute(db.text(
+        'INSERT INTO product_sales (product_id, platform, price, discount_price, sales_volume, date) '
+        'VALUES (:product_id, :platform, :price, :discount_price, :sales_volume, :date)'), sales)
+    db.session.execute(db.text(
+        'INSERT INTO user_reviews (product_id, user_id, rating, content, created_at) '
+        'VALUES (:product_id, :user_id, :rating, :content, :created_at)'), reviews)
+    db.session.execute(db.text(
+        'INSERT INTO platform_discounts (product_id, platform, discount_type, discount_value, end_date) '
+        'VALUES (:product_id, :platform, :discount_type, :discount_value, :end_date)'), discounts)
+    db.session.commit()
+
+
+def drop_model_indexes():
+    """删除模型声明的索引并重置迁移版本，模拟旧数据库"""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            db.session.execute(db.text(f'DROP INDEX IF EXISTS {index.name}'))
+    db.session.execute(db.text('PRAGMA user_version = 0'))
+    db.session.commit()
+
+
+def reset_connections():
+    """结构变更后丢弃已有连接，避免复用旧连接中缓存的预编译语句"""
+    db.session.remove()
+    db.engine.dispose()
+
+
+def random_params(rng, n_users, n_products):
+    product_ids = [rng.randint(1, n_products) for _ in range(5)]
+    min_price = rng.uniform(500, 19000)
+    return {
+        'product_id': product_ids[0], 'user_id': rng.randint(1, n_users), 'category_id': rng.randint(1, 3),
+        'platform': rng.choice(PLATFORMS), 'min_price': min_price, 'max_price': min_price + 200,
+        'start': date.today() - timedelta(days=30), 'end': date.today(),
+        **{f'p{i + 1}': pid for i, pid in enumerate(product_ids)},
+    }
+
+
+def measure(n_users, n_products, samples):
+    """每个查询的平均耗时 (ms) 和执行计划"""
+    results = {}
+    for name, sql in HOT_QUERIES:
+        rng = random.Random(7)
+        params = [random_params(rng, n_users, n_products) for _ in range(samples)]
+
+        def run():
+            for p in params:
+                db.session.execute(db.text(sql), p).fetchall()
+
+        elapsed, _ = timed(run, repeat=3)
+        plan = db.session.execute(db.text('EXPLAIN QUERY PLAN ' + sql), params[0]).fetchall()
+        results[name] = (elapsed / samples * 1000, '; '.join(row[-1] for row in plan))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='热点查询在添加索引前后的耗时对比')
+    parser.add_argument('--products', type=int, default=20000)
+    parser.add_argument('--users', type=int, default=50000)
+    parser.add_argument('--behaviors', type=int, default=1000000)
+    parser.add_argument('--sales-days', type=int, default=30)
+    parser.add_argument('--reviews', type=int, default=5, help='每个产品的评价数')
+    parser.add_argument('--samples', type=int, default=50, help='每个查询执行的次数')
+    parser.add_argument('--show-plans', action='store_true')
+    args = parser.parse_args()
+
+    app = create_benchmark_app()
+    with app.app_context():
+        seed_products(args.products)
+        seed_behaviors(args.behaviors, args.users, args.products)
+        seed_sales_reviews_discounts(args.products, args.sales_days, args.reviews)
+
+        drop_model_indexes()
+        reset_connections()
+        before = measure(args.users, args.products, args.samples)
+        migrate(db.engine)
+        reset_connections()
+        after = measure(args.users, args.products, args.samples)
+
+    print(f'{"查询":<8} {"无索引(ms)":>12} {"有索引(ms)":>12} {"加速比":>8}')
+    for name, _ in HOT_QUERIES:
+        before_ms, after_ms = before[name][0], after[name][0]
+        print(f'{name:<8} {before_ms:12.3f} {after_ms:12.3f} {before_ms / after_ms:8.1f}')
+        if args.show_plans:
+            print(f'    之前: {before[name][1]}')
+            print(f'    之后: {after[name][1]}')
+
+
+if __name__ == '__main__':
+    main()
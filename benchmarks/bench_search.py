@@ -0,0 +1,48 @@
+# 产品搜索基准测试：LIKE 全表扫描与 FTS5 搜索索引的查询延迟对比
+# filename: benchmarks/bench_search.py
+#
+# 用法: python benchmarks/bench_search.py --products 1000000
+
+import argparse
+
+from common import create_benchmark_app, seed_products, timed
+
+from models.models import db, Product
+from search.product_index import ProductSearchIndex
+
+# 合成产品名称为 "<品牌> 产品<编号>"，覆盖高频词、低频词和精确编号
+QUERIES = ['华为', 'apple', '产品', '产品123456', '小米 产品99', 'M4242', '16GB', '不存在的词']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='LIKE 查询与 FTS5 搜索索引的延迟对比')
+    parser.add_argument('--products', type=int, default=1000000)
+    parser.add_argument('--per-page', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_benchmark_app()
+    with app.app_context():
+        seed_products(args.products)
+        index = ProductSearchIndex()
+        build_seconds, _ = timed(index.ensure)
+        print(f'{args.products} 个产品，建立索引耗时 {build_seconds:.1f} 秒')
+
+        print(f'{"搜索词":<12} {"结果数":>8} {"LIKE全部(ms)":>14} {"LIKE分页(ms)":>14} {"索引分页(ms)":>14} {"索引筛选(ms)":>14}')
+        for q in QUERIES:
+            like = Product.query.filter(Product.name.like(f'%{q}%'))
+            # 原来的 /search: 返回全部匹配结果
+            like_all, _ = timed(lambda: like.all(), repeat=args.repeat)
+            # 原来的后台关键词筛选: LIKE 条件加分页
+            like_page, _ = timed(lambda: like.order_by(Product.id.desc()).paginate(
+                page=1, per_page=args.per_page, error_out=False).items, repeat=args.repeat)
+            fts_page, pagination = timed(lambda: index.search(q, per_page=args.per_page), repeat=args.repeat)
+            fts_filter, _ = timed(lambda: index.filter(Product.query, q).order_by(Product.id.desc()).paginate(
+                page=1, per_page=args.per_page, error_out=False).items, repeat=args.repeat)
+            print(f'{q:<12} {pagination.total:8d} {like_all * 1000:14.1f} {like_page * 1000:14.1f} '
+                  f'{fts_page * 1000:14.1f} {fts_filter * 1000:14.1f}')
+            db.session.expunge_all()
+
+
+if __name__ == '__main__':
+    main()
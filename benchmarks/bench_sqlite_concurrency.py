@@ -0,0 +1,132 @@
+# SQLite 并发读写基准测试：默认连接设置与 WAL/连接池调优后的吞吐量和延迟对比
+# filename: benchmarks/bench_sqlite_concurrency.py
+#
+# 用法: python benchmarks/bench_sqlite_concurrency.py --readers 8 --writers 2 --duration 10
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from common import create_benchmark_app, seed_products, seed_behaviors, PLATFORMS
+
+from sqlalchemy import create_engine, text
+
+from models.models import db
+from models.sqlite_tuning import install_sqlite_pragmas, sqlite_engine_options
+
+# 产品列表页和详情页的读查询
+READ_SQL = text('SELECT id, name, price FROM products WHERE platform = :platform '
+                'AND price >= :min_price ORDER BY price LIMIT 20')
+# 浏览产品详情时写入的行为记录，每条单独提交
+WRITE_SQL = text('INSERT INTO user_behaviors (user_id, product_id, behavior_type, created_at) '
+                 'VALUES (:user_id, :product_id, :behavior_type, :created_at)')
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+def run_load(engine, readers, writers, duration, n_products, seed=1):
+    """并发执行读写，返回每类操作的延迟列表和加锁失败次数"""
+    stop = threading.Event()
+    latencies = {'read': [], 'write': []}
+    errors = {'read': 0, 'write': 0}
+    lock = threading.Lock()
+
+    def worker(kind, worker_seed):
+        rng = random.Random(worker_seed)
+        local, failed = [], 0
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                if kind == 'read':
+                    with engine.connect() as conn:
+                        conn.execute(READ_SQL, {'platform': rng.choice(PLATFORMS),
+                                                'min_price': rng.uniform(500, 19000)}).fetchall()
+                else:
+                    with engine.begin() as conn:
+                        conn.execute(WRITE_SQL, {'user_id': rng.randint(1, 1000),
+                                                 'product_id': rng.randint(1, n_products),
+                                                 'behavior_type': '浏览', 'created_at': datetime.now()})
+            except Exception as e:
+                if 'locked' not in str(e):
+                    raise
+                failed += 1
+                continue
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies[kind].extend(local)
+            errors[kind] += failed
+
+    threads = [threading.Thread(target=worker, args=('read', seed + i)) for i in range(readers)]
+    threads += [threading.Thread(target=worker, args=('write', seed + 1000 + i)) for i in range(writers)]
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+    return latencies, errors
+
+
+def prepare_database(path, n_products, n_behaviors):
+    """生成基准数据库 (回滚日志模式)"""
+    app = create_benchmark_app(path)
+    with app.app_context():
+        seed_products(n_products)
+        seed_behaviors(n_behaviors, 1000, n_products)
+        db.session.remove()
+        db.engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite 默认设置与调优设置的并发读写对比')
+    parser.add_argument('--products', type=int, default=20000)
+    parser.add_argument('--behaviors', type=int, default=200000)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=10.0, help='每种设置的运行秒数')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_sqlite_')
+    template = os.path.join(workdir, 'template.db')
+    prepare_database(template, args.products, args.behaviors)
+
+    results = []
+    for label, tuned in [('默认', False), ('调优', True)]:
+        path = os.path.join(workdir, f'{"tuned" if tuned else "default"}.db')
+        shutil.copy(template, path)
+        uri = 'sqlite:///' + path
+        engine = create_engine(uri, **(sqlite_engine_options(uri, pool_size=args.readers + args.writers)
+                                       if tuned else {}))
+        if tuned:
+            install_sqlite_pragmas(engine)
+        with engine.connect() as conn:
+            mode = conn.execute(text('PRAGMA journal_mode')).scalar()
+        latencies, errors = run_load(engine, args.readers, args.writers, args.duration, args.products)
+        engine.dispose()
+        results.append((f'{label}({mode})', latencies, errors))
+
+    print(f'SQLite {sqlite3.sqlite_version}，{args.readers} 个读线程，{args.writers} 个写线程，每种设置 {args.duration:.0f} 秒')
+    print(f'{"设置":<14} {"读/秒":>10} {"写/秒":>10} {"读p95(ms)":>10} {"写p95(ms)":>10} {"锁失败":>8}')
+    for label, latencies, errors in results:
+        print(f'{label:<14} {len(latencies["read"]) / args.duration:10.1f} '
+              f'{len(latencies["write"]) / args.duration:10.1f} '
+              f'{percentile(latencies["read"], 0.95) * 1000:10.2f} '
+              f'{percentile(latencies["write"], 0.95) * 1000:10.2f} '
+              f'{errors["read"] + errors["write"]:8d}')
+
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
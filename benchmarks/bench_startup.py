@@ -0,0 +1,94 @@
+# 启动耗时基准测试：导入 app 模块的耗时分解 (python -X importtime)
+# filename: benchmarks/bench_startup.py
+#
+# 用法: python benchmarks/bench_startup.py --top 25 --budget 1.0
+#
+# 重型的分析和机器学习依赖应在第一次使用时才导入；如果它们在启动时被导入，
+# 或者总耗时超过预算，脚本以非零状态退出，便于发现启动性能的退化。
+#
+# 导入 app 会执行数据库迁移和搜索索引检查，因此每次都在项目数据库的临时副本上运行，
+# 不修改开发数据库，每次测量的也是同样的初始状态。
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_DB = os.path.join(PROJECT_ROOT, 'product_recommendation.db')
+
+# 不应在Web进程启动时导入的模块
+DEFAULT_FORBIDDEN = ['matplotlib', 'seaborn', 'pandas', 'textblob', 'nltk', 'sklearn']
+
+
+def profile_import(module, database):
+    """在子进程中导入模块，返回 (墙钟耗时秒数, [(累计微秒, 自身微秒, 深度, 模块名)])
+
+    Args:
+        module: 要导入的模块名
+        database: 数据库文件，在其临时副本上运行
+    """
+    workdir = tempfile.mkdtemp(prefix='bench_startup_')
+    db_copy = os.path.join(workdir, 'startup.db')
+    if os.path.exists(database):
+        shutil.copy(database, db_copy)
+    env = dict(os.environ, DATABASE_URL='sqlite:///' + db_copy)
+    try:
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-W', 'ignore', '-c', f'import {module}'],
+            cwd=PROJECT_ROOT, env=env, capture_output=True, text=True
+        )
+        elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if result.returncode != 0:
+        raise RuntimeError(f'导入 {module} 失败:\n{result.stderr[-2000:]}')
+
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((int(cumulative_us), int(self_us), depth, name.strip()))
+    return elapsed, entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Web应用启动导入耗时基准测试')
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--database', default=PROJECT_DB, help='复制该数据库作为启动时使用的临时数据库')
+    parser.add_argument('--top', type=int, default=20, help='显示累计耗时最高的模块数')
+    parser.add_argument('--budget', type=float, default=None, help='导入耗时上限 (秒)')
+    parser.add_argument('--forbid', nargs='*', default=DEFAULT_FORBIDDEN, help='启动时不允许导入的顶层包')
+    args = parser.parse_args()
+
+    elapsed, entries = profile_import(args.module, args.database)
+    root = next((e for e in entries if e[3] == args.module), None)
+    import_seconds = root[0] / 1e6 if root else elapsed
+    print(f'导入 {args.module}: {import_seconds:.3f}s (含解释器启动 {elapsed:.3f}s)，共 {len(entries)} 个模块')
+
+    # 按累计耗时排序，缩进表示导入层级
+    print(f'{"累计(ms)":>10} {"自身(ms)":>10}  模块')
+    for cumulative_us, self_us, depth, name in sorted(entries, reverse=True)[:args.top]:
+        print(f'{cumulative_us / 1000:10.1f} {self_us / 1000:10.1f}  {"  " * depth}{name}')
+
+    failures = []
+    imported = {name.split('.')[0] for _, _, _, name in entries}
+    for package in args.forbid:
+        if package in imported:
+            failures.append(f'启动时导入了 {package}')
+    if args.budget is not None and import_seconds > args.budget:
+        failures.append(f'导入耗时 {import_seconds:.3f}s 超过预算 {args.budget:.3f}s')
+
+    for failure in failures:
+        print(f'退化: {failure}')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+# 推荐模型训练基准测试：矩阵构建和完整训练的耗时随用户行为行数的变化
+# filename: benchmarks/bench_train.py
+#
+# 用法: python benchmarks/bench_train.py --rows 10000 100000 1000000
+
+import argparse
+
+from common import create_benchmark_app, seed_products, seed_behaviors, timed
+
+from models.models import UserBehavior
+from recommendation.recommender import ProductRecommender, BEHAVIOR_WEIGHTS
+from scipy.sparse import csr_matrix
+
+
+def legacy_build(recommender):
+    """旧版训练路径：加载ORM对象并使用 list.index 查找下标"""
+    behaviors = UserBehavior.query.all()
+    user_ids = sorted(set(b.user_id for b in behaviors))
+    item_ids = sorted(set(b.product_id for b in behaviors))
+    rows, cols, data = [], [], []
+    for b in behaviors:
+        rows.append(user_ids.index(b.user_id))
+        cols.append(item_ids.index(b.product_id))
+        data.append(BEHAVIOR_WEIGHTS.get(b.behavior_type, 1.0))
+    return csr_matrix((data, (rows, cols)), shape=(len(user_ids), len(item_ids)))
+
+
+def vectorized_build(recommender):
+    """新版训练路径：按列流式读取并向量化构建矩阵"""
+    return recommender._build_user_item_matrix(*recommender._load_behavior_columns())
+
+
+def full_train(recommender):
+    """完整训练：构建矩阵、物品近邻和内容特征近邻"""
+    recommender.train_model()
+    return recommender.user_item_matrix
+
+
+def main():
+    parser = argparse.ArgumentParser(description='用户-物品矩阵构建和完整训练耗时基准测试')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--legacy-max', type=int, default=20000,
+                        help='旧版路径只在行数不超过该值时运行')
+    args = parser.parse_args()
+
+    print(f'{"行为行数":>10} {"向量化(s)":>12} {"旧版(s)":>12} {"完整训练(s)":>12} {"nnz":>10}')
+    for n_rows in args.rows:
+        app = create_benchmark_app()
+        with app.app_context():
+            seed_products(args.products)
+            seed_behaviors(n_rows, args.users, args.products)
+
+            recommender = ProductRecommender()
+            new_time, matrix = timed(vectorized_build, recommender, repeat=3)
+
+            legacy_time = None
+            if n_rows <= args.legacy_max:
+                legacy_time, legacy_matrix = timed(legacy_build, recommender)
+                assert abs(legacy_matrix - matrix).sum() < 1e-6, '新旧路径结果不一致'
+
+            # 完整的 train_model()，包括矩阵构建之后的近邻计算
+            train_time, trained_matrix = timed(full_train, ProductRecommender())
+            assert abs(trained_matrix - matrix).sum() < 1e-6, '完整训练的矩阵与单独构建的不一致'
+
+        legacy_desc = f'{legacy_time:12.3f}' if legacy_time is not None else f'{"-":>12}'
+        print(f'{n_rows:>10} {new_time:12.3f} {legacy_desc} {train_time:12.3f} {matrix.nnz:>10}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+# 基准测试公共工具
+# filename: benchmarks/common.py
+
+import os
+import sys
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# 确保可以导入项目模块
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from models.models import db
+
+PLATFORMS = ['京东', '天猫', '苏宁', '拼多多']
+BRANDS = ['Apple', '华为', '小米', '三星', 'OPPO', 'vivo', '联想', '戴尔']
+BEHAVIOR_TYPES = ['浏览', '浏览', '浏览', '收藏', '加购', '购买']
+
+
+def create_benchmark_app(db_path=None):
+    """创建一个使用独立SQLite数据库的Flask应用，避免污染项目数据库
+
+    Args:
+        db_path: 数据库文件路径，默认在临时目录中创建
+
+    Returns:
+        Flask应用实例
+    """
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix='bench_'), 'bench.db')
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + db_path
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+
+    return app
+
+
+def seed_products(n_products, n_categories=3, seed=42):
+    """批量写入合成产品数据（需要在应用上下文中调用）"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    db.session.execute(db.text(
+        'INSERT INTO product_categories (id, name, description, created_at) VALUES (:id, :name, :name, :now)'
+    ), [{'id': c + 1, 'name': f'分类{c + 1}', 'now': now} for c in range(n_categories)])
+
+    rows = []
+    for i in range(1, n_products + 1):
+        memory = rng.choice([4, 6, 8, 12, 16])
+        storage = rng.choice([64, 128, 256, 512, 1024])
+        rows.append({
+            'id': i,
+            'category_id': rng.randint(1, n_categories),
+            'name': f'{rng.choice(BRANDS)} 产品{i}',
+            'brand': rng.choice(BRANDS),
+            'model': f'M{i}',
+            'price': round(rng.uniform(500, 20000), 2),
+            'platform': rng.choice(PLATFORMS),
+            'spec_json': f'{{"内存":"{memory}GB","存储":"{storage}GB"}}',
+            'now': now,
+        })
+    db.session.execute(db.text(
+        'INSERT INTO products (id, category_id, name, brand, model, price, platform, spec_json, created_at, updated_at) '
+        'VALUES (:id, :category_id, :name, :brand, :model, :price, :platform, :spec_json, :now, :now)'
+    ), rows)
+    db.session.commit()
+
+
+def seed_behaviors(n_rows, n_users, n_products, seed=42):
+    """批量写入合成用户行为数据（需要在应用上下文中调用）"""
+    rng = random.Random(seed)
+    start = datetime.now() - timedelta(days=30)
+    batch = []
+    for _ in range(n_rows):
+        batch.append({
+            'user_id': rng.randint(1, n_users),
+            'product_id': rng.randint(1, n_products),
+            'behavior_type': rng.choice(BEHAVIOR_TYPES),
+            'created_at': start + timedelta(seconds=rng.randint(0, 30 * 86400)),
+        })
+        if len(batch) >= 50000:
+            _insert_behaviors(batch)
+            batch = []
+    if batch:
+        _insert_behaviors(batch)
+    db.session.commit()
+
+
+def _insert_behaviors(batch):
+    db.session.execute(db.text(
+        'INSERT INTO user_behaviors (user_id, product_id, behavior_type, created_at) '
+        'VALUES (:user_id, :product_id, :behavior_type, :created_at)'
+    ), batch)
+
+
+def timed(func, *args, repeat=1, **kwargs):
+    """执行函数并返回 (最短耗时秒数, 返回值)"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
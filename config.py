@@ -1,12 +1,16 @@
 import os
 
+from models.sqlite_tuning import sqlite_engine_options
+
 class Config:
     # 获取项目根目录的绝对路径
     BASEDIR = os.path.abspath(os.path.dirname(__file__))
     
-    # 数据库配置
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(BASEDIR, 'product_recommendation.db')
+    # 数据库配置 (可通过环境变量 DATABASE_URL 指向其他数据库，例如基准测试使用的临时副本)
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///' + os.path.join(BASEDIR, 'product_recommendation.db'))
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # 文件型SQLite使用连接池，每个进程保持 SQLITE_POOL_SIZE 个连接 (与请求线程数一致)
+    SQLALCHEMY_ENGINE_OPTIONS = sqlite_engine_options(SQLALCHEMY_DATABASE_URI)
     
     # Flask应用配置
     SECRET_KEY = os.urandom(24)
@@ -17,6 +21,33 @@ class Config:
     STATIC_FOLDER = os.path.join(BASEDIR, 'static')
     TEMPLATES_FOLDER = os.path.join(BASEDIR, 'templates')
     
+    # 推荐模型文件目录 (由 train_recommender.py 生成，各工作进程启动时加载)
+    MODEL_ARTIFACT_DIR = os.environ.get('MODEL_ARTIFACT_DIR', os.path.join(BASEDIR, 'model_artifacts'))
+    
+    # 近邻索引的构建方式: exact (精确计算) 或 lsh (近似最近邻，适合大规模物品)
+    RECOMMENDER_SIMILARITY_BACKEND = os.environ.get('RECOMMENDER_SIMILARITY_BACKEND', 'exact')
+    
+    # 个性化推荐算法: item_knn (物品近邻协同过滤) 或 als (隐式反馈矩阵分解)
+    RECOMMENDER_MODE = os.environ.get('RECOMMENDER_MODE', 'item_knn')
+    
+    # 离线训练 (train_recommender.py) 计算近邻索引时使用的进程数
+    RECOMMENDER_TRAIN_JOBS = int(os.environ.get('RECOMMENDER_TRAIN_JOBS', os.cpu_count() or 1))
+    
+    # 离线预计算的推荐表目录，以及结果的最长有效时间 (秒)，过期后回退到实时计算
+    PRECOMPUTED_DIR = os.environ.get('PRECOMPUTED_DIR', os.path.join(BASEDIR, 'precomputed_recommendations'))
+    PRECOMPUTED_MAX_AGE = float(os.environ.get('PRECOMPUTED_MAX_AGE', 6 * 3600))
+    
+    # 后台渲染分析图表的进程数，0 表示在请求中同步渲染
+    CHART_RENDER_WORKERS = int(os.environ.get('CHART_RENDER_WORKERS', 2))
+    
+    # 用户行为的批量写入: 每批最多事件数、最长等待时间 (毫秒) 和队列容量
+    BEHAVIOR_BATCH_SIZE = int(os.environ.get('BEHAVIOR_BATCH_SIZE', 500))
+    BEHAVIOR_FLUSH_INTERVAL = int(os.environ.get('BEHAVIOR_FLUSH_INTERVAL', 200))
+    BEHAVIOR_QUEUE_SIZE = int(os.environ.get('BEHAVIOR_QUEUE_SIZE', 10000))
+    
+    # 导航栏分类和平台列表的缓存时间 (秒)，本进程的管理后台修改后立即失效
+    REFERENCE_DATA_TTL = float(os.environ.get('REFERENCE_DATA_TTL', 300))
+    
     # 确保必要的目录存在
     @staticmethod
     def init_app(app):
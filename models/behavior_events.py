@@ -0,0 +1,128 @@
+# 用户行为事件的异步批量写入
+# filename: models/behavior_events.py
+
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from models.models import UserBehavior
+
+# 通知写入线程退出的哨兵
+_STOP = object()
+
+
+class BehaviorEventWriter:
+    """在后台线程中批量写入用户行为
+
+    请求只把事件放入进程内的有界队列，后台线程每攒够 batch_size 条或每隔 flush_interval 毫秒
+    用一次 executemany 写入并提交，页面响应时间不再包含数据库写入和磁盘同步。
+    队列满时请求最多等待 put_timeout 秒 (背压)，仍然放不进去则在请求中同步写入，不丢弃事件。
+
+    行为ID仍由数据库按提交顺序自增分配，OnlineUpdater 按ID水位线轮询不受影响，
+    只是新行为在下一次批量提交后才可见。
+    """
+
+    def __init__(self, engine, batch_size: int = 500, flush_interval: int = 200,
+                 max_queue: int = 10000, put_timeout: float = 0.05):
+        """初始化写入器
+
+        Args:
+            engine: 数据库引擎
+            batch_size: 每批最多写入的事件数
+            flush_interval: 两次提交之间的最长等待时间 (毫秒)
+            max_queue: 队列中最多积压的事件数
+            put_timeout: 队列满时请求等待的最长时间 (秒)
+        """
+        self.engine = engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval / 1000
+        self.max_queue = max_queue
+        self.put_timeout = put_timeout
+        self.stats = {'queued': 0, 'written': 0, 'batches': 0, 'sync_writes': 0, 'failed': 0}
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def _ensure_started(self):
+        """首次使用时启动写入线程 (fork 出的子进程中重新启动)"""
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._queue = queue.Queue(maxsize=self.max_queue)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='behavior-writer', daemon=True)
+            self._thread.start()
+
+    def record(self, user_id: int, product_id: int, behavior_type: str, created_at: Optional[datetime] = None):
+        """记录一条用户行为 (行为时间取调用时刻，而不是写入时刻)"""
+        event = {
+            'user_id': user_id,
+            'product_id': product_id,
+            'behavior_type': behavior_type,
+            'created_at': created_at or datetime.now(),
+        }
+        self._ensure_started()
+        try:
+            self._queue.put(event, timeout=self.put_timeout)
+            self.stats['queued'] += 1
+        except queue.Full:
+            # 写入线程跟不上时由请求自己写入，减缓事件的产生速度
+            self.stats['sync_writes'] += 1
+            self._write([event])
+
+    def _run(self):
+        """写入线程：攒批并写入，直到收到退出哨兵"""
+        q = self._queue
+        stopping = False
+        while not stopping:
+            batch = []
+            event = q.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if event is _STOP:
+                    stopping = True
+                    break
+                batch.append(event)
+                if len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                try:
+                    event = q.get(timeout=remaining) if remaining > 0 else q.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(batch)
+            for _ in range(len(batch) + stopping):
+                q.task_done()
+
+    def _write(self, events: List[Dict]):
+        """用一条 INSERT 语句批量写入并提交"""
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(UserBehavior.__table__.insert(), events)
+            self.stats['written'] += len(events)
+            self.stats['batches'] += 1
+        except Exception as e:
+            self.stats['failed'] += len(events)
+            print(f"写入用户行为时出错 ({len(events)}条): {str(e)}")
+
+    def flush(self):
+        """等待队列中已有的事件全部写入"""
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def close(self, timeout: float = 10.0):
+        """写入剩余事件并停止写入线程 (进程退出时自动调用)"""
+        if self._pid != os.getpid() or self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
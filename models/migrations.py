@@ -0,0 +1,58 @@
+# 数据库结构迁移
+# filename: models/migrations.py
+
+from typing import Optional
+
+from sqlalchemy import text
+
+from models.models import db
+
+
+def _create_model_indexes(conn):
+    """创建模型中声明的所有索引 (已存在的跳过)，并更新查询计划器的统计信息"""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=conn, checkfirst=True)
+    conn.execute(text('ANALYZE'))
+
+
+# 按版本号排列的迁移 (版本号, 说明, 迁移函数)，迁移函数接收一个处于事务中的连接。
+# 新的结构变更只需在末尾追加一项，已应用的版本记录在 SQLite 的 PRAGMA user_version 中。
+MIGRATIONS = [
+    (1, '为热点查询列添加组合索引', _create_model_indexes),
+]
+
+
+def current_version(engine) -> int:
+    """数据库已应用的迁移版本"""
+    with engine.connect() as conn:
+        return conn.execute(text('PRAGMA user_version')).scalar()
+
+
+def migrate(engine, target: Optional[int] = None) -> int:
+    """依次执行尚未应用的迁移
+
+    db.create_all() 只会创建缺失的表，不会为已有的表补充索引；
+    启动时调用本函数，使旧数据库与模型定义保持一致。
+
+    Args:
+        engine: 数据库引擎
+        target: 迁移到的目标版本，默认为最新版本
+
+    Returns:
+        迁移后的版本号
+    """
+    if engine.dialect.name != 'sqlite':
+        print(f"数据库迁移只支持SQLite，跳过 ({engine.dialect.name})")
+        return 0
+
+    version = current_version(engine)
+    for migration_version, description, upgrade in MIGRATIONS:
+        if migration_version <= version or (target is not None and migration_version > target):
+            continue
+        print(f"应用数据库迁移 {migration_version}: {description}")
+        with engine.begin() as conn:
+            upgrade(conn)
+            conn.execute(text(f'PRAGMA user_version = {int(migration_version)}'))
+        version = migration_version
+    return version
@@ -5,6 +5,8 @@ from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 import json
 
+from models.sqlite_tuning import install_sqlite_pragmas, dispose_engine_after_fork
+
 db = SQLAlchemy()
 
 class User(db.Model):
@@ -44,6 +46,14 @@ class ProductCategory(db.Model):
 class Product(db.Model):
     """产品信息模型"""
     __tablename__ = 'products'
+    __table_args__ = (
+        # 分类页和产品列表按分类 / 平台筛选并按价格排序，名称索引用于同名产品的前缀范围查询
+        db.Index('ix_products_category_price', 'category_id', 'price'),
+        db.Index('ix_products_platform_price', 'platform', 'price'),
+        db.Index('ix_products_price', 'price'),
+        db.Index('ix_products_name', 'name'),
+        db.Index('ix_products_created_at', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     category_id = db.Column(db.Integer, db.ForeignKey('product_categories.id'))
@@ -81,6 +91,11 @@ class Product(db.Model):
 class PlatformDiscount(db.Model):
     """平台优惠模型"""
     __tablename__ = 'platform_discounts'
+    __table_args__ = (
+        # 按产品批量加载优惠；优惠排行只扫描尚未结束的优惠
+        db.Index('ix_platform_discounts_product', 'product_id'),
+        db.Index('ix_platform_discounts_end_date', 'end_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     platform = db.Column(db.String(32), nullable=False)
@@ -99,6 +114,14 @@ class PlatformDiscount(db.Model):
 class UserBehavior(db.Model):
     """用户行为模型"""
     __tablename__ = 'user_behaviors'
+    __table_args__ = (
+        # 收藏列表和收藏状态: user_id + behavior_type，按时间倒序
+        db.Index('ix_user_behaviors_user_type_created', 'user_id', 'behavior_type', 'created_at'),
+        # 个人中心的最近行为: user_id，按时间倒序
+        db.Index('ix_user_behaviors_user_created', 'user_id', 'created_at'),
+        # 按产品统计和删除行为
+        db.Index('ix_user_behaviors_product_type', 'product_id', 'behavior_type'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
@@ -113,6 +136,11 @@ class UserBehavior(db.Model):
 class UserReview(db.Model):
     """用户评价模型"""
     __tablename__ = 'user_reviews'
+    __table_args__ = (
+        # 产品详情页的最新评价和评价统计
+        db.Index('ix_user_reviews_product_created', 'product_id', 'created_at'),
+        db.Index('ix_user_reviews_user', 'user_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
@@ -134,6 +162,10 @@ class UserReview(db.Model):
 class ProductSale(db.Model):
     """产品销售模型"""
     __tablename__ = 'product_sales'
+    __table_args__ = (
+        # 价格趋势按产品和日期范围查询，销量汇总按产品分组
+        db.Index('ix_product_sales_product_date', 'product_id', 'date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'))
@@ -171,8 +203,15 @@ def init_db(app):
     db.init_app(app)
     
     with app.app_context():
+        # SQLite 连接的 WAL / 同步 / 缓存等设置，需要在建立第一个连接之前注册
+        install_sqlite_pragmas(db.engine)
+        dispose_engine_after_fork(db.engine)
         db.create_all()
         
+        # 为已有数据库补充新增的索引等结构变更
+        from models.migrations import migrate
+        migrate(db.engine)
+        
         # 初始化产品类别
         if not ProductCategory.query.filter_by(name='手机').first():
             categories = [
@@ -0,0 +1,58 @@
+# 导航栏等页面公用的参考数据 (产品分类、平台列表) 的进程内缓存
+# filename: models/reference_data.py
+
+from collections import namedtuple
+from typing import List
+
+from models.models import db, Product, ProductCategory
+from recommendation.cache import LRUCache
+
+# 缓存的分类只保存列值，不是ORM对象，可以在请求和线程之间共享
+CategoryItem = namedtuple('CategoryItem', ['id', 'name', 'description', 'created_at'])
+
+
+class ReferenceData:
+    """分类和平台列表的缓存
+
+    几乎每个页面都要显示分类导航，这些数据很少变化，缓存在进程内，
+    管理后台修改分类或产品后调用 invalidate 立即失效；
+    其他进程中的缓存在 ttl 秒后过期。
+    """
+
+    def __init__(self, ttl: float = 300):
+        """初始化缓存
+
+        Args:
+            ttl: 缓存的过期时间 (秒)
+        """
+        self._cache = LRUCache(max_size=8, ttl=ttl)
+
+    def categories(self) -> List[CategoryItem]:
+        """所有产品分类 (按ID排序)"""
+        categories = self._cache.get('categories')
+        if categories is None:
+            rows = db.session.query(
+                ProductCategory.id, ProductCategory.name, ProductCategory.description, ProductCategory.created_at
+            ).order_by(ProductCategory.id).all()
+            categories = [CategoryItem(*row) for row in rows]
+            self._cache.set('categories', categories)
+        return categories
+
+    def platforms(self) -> List[str]:
+        """所有产品所在的平台"""
+        platforms = self._cache.get('platforms')
+        if platforms is None:
+            platforms = [row[0] for row in db.session.query(Product.platform).distinct().all()]
+            self._cache.set('platforms', platforms)
+        return platforms
+
+    def invalidate(self, key: str = None):
+        """使缓存失效
+
+        Args:
+            key: 'categories' 或 'platforms'，默认全部失效
+        """
+        if key is None:
+            self._cache.clear()
+        else:
+            self._cache.delete(key)
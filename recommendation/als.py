@@ -0,0 +1,141 @@
+# 隐式反馈矩阵分解 (交替最小二乘)
+# filename: recommendation/als.py
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+# 分块求解时单个分块中 (行数 × 补齐长度 × 因子数) 数组的内存上限 (字节)
+DEFAULT_SOLVE_BLOCK_BYTES = 64 * 1024 * 1024
+
+
+class ImplicitALS:
+    """基于隐式反馈的交替最小二乘矩阵分解 (Hu, Koren & Volinsky 2008)
+
+    用户-物品矩阵中的行为权重 r 转换为置信度 c = 1 + alpha·r，偏好 p = [r > 0]。
+    每轮固定物品因子求解所有用户因子，再固定用户因子求解所有物品因子；
+    利用 YᵀCᵤY = YᵀY + Yᵀ(Cᵤ - I)Y，每个用户只需累加其交互物品的贡献。
+    用户按交互数量分桶并切分成块，块内用批量矩阵乘法累加并批量求解线性方程组，
+    各块在线程池中并行执行 (NumPy/LAPACK 计算期间会释放GIL)。因子以 float32 存储。
+    """
+
+    def __init__(self, factors: int = 32, regularization: float = 0.1, alpha: float = 10.0,
+                 iterations: int = 10, n_jobs: Optional[int] = None,
+                 max_block_bytes: int = DEFAULT_SOLVE_BLOCK_BYTES, seed: int = 42):
+        """初始化模型
+
+        Args:
+            factors: 隐因子维度
+            regularization: L2正则化系数
+            alpha: 置信度缩放系数
+            iterations: 交替迭代轮数
+            n_jobs: 并行线程数，默认为CPU核数
+            max_block_bytes: 分块求解的内存上限
+            seed: 随机种子
+        """
+        self.factors = factors
+        self.regularization = regularization
+        self.alpha = alpha
+        self.iterations = iterations
+        self.n_jobs = n_jobs or os.cpu_count() or 1
+        self.max_block_bytes = max_block_bytes
+        self.seed = seed
+        self.user_factors = None
+        self.item_factors = None
+
+    def fit(self, user_items: csr_matrix) -> Tuple[np.ndarray, np.ndarray]:
+        """训练模型
+
+        Args:
+            user_items: 用户-物品行为权重矩阵 (用户数 × 物品数)
+
+        Returns:
+            (用户因子, 物品因子)，均为 float32 数组
+        """
+        user_items = csr_matrix(user_items, dtype=np.float32)
+        user_items.data = np.maximum(user_items.data, 0)
+        user_items.eliminate_zeros()
+        item_users = user_items.T.tocsr()
+
+        rng = np.random.default_rng(self.seed)
+        n_users, n_items = user_items.shape
+        self.user_factors = np.zeros((n_users, self.factors), dtype=np.float32)
+        self.item_factors = (rng.standard_normal((n_items, self.factors)) * 0.01).astype(np.float32)
+
+        with ThreadPoolExecutor(max_workers=self.n_jobs) as executor:
+            for _ in range(self.iterations):
+                self.user_factors = self._solve_all(user_items, self.item_factors, executor)
+                self.item_factors = self._solve_all(item_users, self.user_factors, executor)
+
+        return self.user_factors, self.item_factors
+
+    def _solve_all(self, interactions: csr_matrix, fixed: np.ndarray, executor) -> np.ndarray:
+        """固定一侧因子，求解另一侧所有行的因子"""
+        gram = self.gram_matrix(fixed)
+        result = np.zeros((interactions.shape[0], self.factors), dtype=np.float32)
+
+        # 按交互数量分桶 (补齐到2的幂)，同一桶内的行补齐到相同长度后批量计算，
+        # 每块 (行数 × 长度 × 因子数) 的数组不超过内存上限；没有交互的行因子为0
+        counts = np.diff(interactions.indptr)
+        rows = np.nonzero(counts)[0]
+        padded = 1 << np.ceil(np.log2(counts[rows])).astype(np.int64)
+        tasks = []
+        for length in np.unique(padded).tolist():
+            bucket = rows[padded == length]
+            block_rows = max(1, self.max_block_bytes // (length * self.factors * 4))
+            tasks.extend((bucket[i:i + block_rows], length) for i in range(0, len(bucket), block_rows))
+
+        def solve(task):
+            block, length = task
+            result[block] = self._solve_rows(interactions, fixed, gram, block, length)
+
+        list(executor.map(solve, tasks))
+        return result
+
+    def gram_matrix(self, fixed: np.ndarray) -> np.ndarray:
+        """计算 YᵀY + λI"""
+        fixed = fixed.astype(np.float64)
+        return fixed.T @ fixed + self.regularization * np.eye(self.factors)
+
+    def _solve_rows(self, interactions: csr_matrix, fixed: np.ndarray, gram: np.ndarray,
+                    rows: np.ndarray, length: int) -> np.ndarray:
+        """批量求解若干行的因子，每行的交互补齐到 length 个"""
+        starts = interactions.indptr[rows]
+        counts = interactions.indptr[rows + 1] - starts
+        mask = np.arange(length)[None, :] < counts[:, None]
+        positions = np.where(mask, starts[:, None] + np.arange(length)[None, :], 0)
+
+        # 补齐位置的权重为0，不影响结果
+        weights = np.where(mask, self.alpha * interactions.data[positions], 0).astype(np.float32)
+        vectors = np.asarray(fixed, dtype=np.float32)[interactions.indices[positions]]
+
+        # Yᵀ(Cᵤ - I)Y 与 YᵀCᵤp(u)
+        A = gram + np.matmul(vectors.transpose(0, 2, 1) * weights[:, None, :], vectors)
+        b = np.matmul((weights + mask)[:, None, :], vectors)[:, 0, :]
+        return np.linalg.solve(A, b[:, :, None].astype(np.float64))[:, :, 0].astype(np.float32)
+
+    def recalculate_user(self, user_row: csr_matrix, item_factors: Optional[np.ndarray] = None,
+                         gram: Optional[np.ndarray] = None) -> np.ndarray:
+        """固定物品因子，根据用户当前的行为向量重新求解其因子 (用于新行为的即时折叠)
+
+        Args:
+            user_row: 用户行为向量 (1 × 物品数)
+            item_factors: 物品因子，默认使用训练得到的物品因子
+            gram: 预先计算的 YᵀY + λI，避免每次查询都遍历全部物品因子
+
+        Returns:
+            用户因子 (float32)
+        """
+        item_factors = self.item_factors if item_factors is None else item_factors
+        if gram is None:
+            gram = self.gram_matrix(item_factors)
+        user_row = csr_matrix(user_row, dtype=np.float32)
+        keep = (user_row.indices < len(item_factors)) & (user_row.data > 0)
+        n_keep = int(keep.sum())
+        if not n_keep:
+            return np.zeros(self.factors, dtype=np.float32)
+        row = csr_matrix((user_row.data[keep], user_row.indices[keep], [0, n_keep]), shape=(1, len(item_factors)))
+        return self._solve_rows(row, item_factors, gram, np.array([0]), n_keep)[0]
@@ -0,0 +1,327 @@
+# 近似最近邻索引 (随机投影局部敏感哈希)
+# filename: recommendation/ann.py
+
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix, issparse, vstack
+
+from recommendation.neighbors import l2_normalize_rows, assemble_neighbors, block_size_for, topk_from_block, DEFAULT_BLOCK_BYTES
+
+# 维度超过该值时先做特征哈希降维，避免投影矩阵过大
+HASHED_DIM = 4096
+
+
+class RandomProjectionLSH:
+    """基于随机超平面 (SimHash) 的余弦相似度近似最近邻索引
+
+    每张哈希表使用 n_bits 个随机超平面将向量映射为一个桶编码，
+    查询时取出所有表中同桶的物品作为候选，再用精确的余弦相似度重排。
+    召回率与延迟的权衡通过以下参数调节：
+        n_tables: 哈希表数量，越多召回率越高，查询越慢
+        n_bits: 每张表的位数，越多桶越小，候选越少、召回率越低
+        n_probes: 每张表额外探测的相邻桶数量 (翻转投影值最接近0的位)
+        max_candidates: 参与重排的候选数量上限
+    """
+
+    def __init__(self, n_tables: int = 32, n_bits: int = 10, n_probes: int = 4,
+                 max_candidates: int = 20000, seed: int = 42):
+        """初始化索引
+
+        Args:
+            n_tables: 哈希表数量
+            n_bits: 每张表的超平面数量 (不超过30)
+            n_probes: 每张表的多探测数量
+            max_candidates: 重排候选数量上限
+            seed: 随机种子
+        """
+        self.n_tables = n_tables
+        self.n_bits = min(n_bits, 30)
+        self.n_probes = min(n_probes, self.n_bits)
+        self.max_candidates = max_candidates
+        self.seed = seed
+        self.vectors = None
+        self.hashing = None
+        self.projection = None
+        self.codes = None          # (物品数 × 表数) 的桶编码，零向量为 -1
+        self.sorted_codes = None   # 每张表按编码排序后的编码
+        self.order = None          # 每张表按编码排序后的物品下标
+        self._powers = 1 << np.arange(self.n_bits, dtype=np.int64)
+
+    def _make_projection(self, dim: int):
+        """生成随机投影 (维度 × 表数·位数)
+
+        高维稀疏向量 (如物品的用户交互向量) 先用带符号的特征哈希压缩到
+        HASHED_DIM 维，再做高斯投影，投影矩阵的大小与原始维度无关。
+        """
+        rng = np.random.default_rng(self.seed)
+        n_planes = self.n_tables * self.n_bits
+        if dim <= HASHED_DIM:
+            return None, rng.standard_normal((dim, n_planes)).astype(np.float32)
+        buckets = rng.integers(0, HASHED_DIM, dim)
+        signs = rng.choice(np.array([-1.0, 1.0], dtype=np.float32), dim)
+        hashing = csr_matrix((signs, (np.arange(dim), buckets)), shape=(dim, HASHED_DIM))
+        return hashing, rng.standard_normal((HASHED_DIM, n_planes)).astype(np.float32)
+
+    def _project(self, vectors) -> np.ndarray:
+        """计算向量在所有超平面上的投影值"""
+        if self.hashing is not None:
+            vectors = vectors @ self.hashing
+        if issparse(vectors):
+            vectors = vectors.toarray()
+        return np.asarray(vectors @ self.projection, dtype=np.float32)
+
+    def _hash(self, projected: np.ndarray) -> np.ndarray:
+        """将投影值转换为每张表的桶编码"""
+        bits = (projected > 0).reshape(len(projected), self.n_tables, self.n_bits)
+        return (bits.astype(np.int64) @ self._powers).astype(np.int32)
+
+    def fit(self, vectors, block_size: int = 100000) -> 'RandomProjectionLSH':
+        """为物品向量建立索引
+
+        Args:
+            vectors: 物品向量 (物品数 × 维度)，可以是稀疏矩阵或numpy数组
+            block_size: 分块计算投影时每块的物品数量
+
+        Returns:
+            索引自身
+        """
+        self.vectors = l2_normalize_rows(vectors)
+        n_items, dim = self.vectors.shape
+        self.hashing, self.projection = self._make_projection(dim)
+
+        self.codes = np.empty((n_items, self.n_tables), dtype=np.int32)
+        for start in range(0, n_items, block_size):
+            block = self.vectors[start:start + block_size]
+            self.codes[start:start + block_size] = self._hash(self._project(block))
+
+        # 零向量与任何物品都不相似，不参与分桶
+        if issparse(self.vectors):
+            zero_rows = np.diff(self.vectors.indptr) == 0
+        else:
+            zero_rows = ~np.any(self.vectors, axis=1)
+        self.codes[zero_rows] = -1
+
+        self.order = np.argsort(self.codes, axis=0, kind='stable').T.astype(np.int32)
+        self.sorted_codes = np.take_along_axis(self.codes, self.order.T, axis=0).T.copy()
+        return self
+
+    def update(self, vectors, rows: Sequence[int]) -> 'RandomProjectionLSH':
+        """只为变更过的物品重新计算桶编码，其余物品的编码和分桶保持不变
+
+        投影矩阵不变，所以未变更物品的编码与重新建立索引的结果相同；
+        每张表中先删除变更物品的旧编码，再按 (编码, 物品下标) 的顺序插入新编码，
+        得到的分桶与 fit 完全一致。维度或物品数变化时退化为重新建立索引。
+
+        Args:
+            vectors: 全部物品的当前向量 (物品数 × 维度)
+            rows: 变更过的物品下标
+
+        Returns:
+            索引自身
+        """
+        input_dim = (self.hashing if self.hashing is not None else self.projection).shape[0]
+        if self.codes is None or vectors.shape != (len(self.codes), input_dim):
+            return self.fit(vectors)
+
+        rows = np.unique(np.asarray(rows, dtype=np.int64))
+        if not len(rows):
+            return self
+        n_items = len(self.codes)
+        changed = l2_normalize_rows(vectors[rows])
+        if issparse(self.vectors):
+            # 替换稀疏矩阵的若干行：保留其余行，再按行号重新拼接
+            keep = np.setdiff1d(np.arange(n_items), rows)
+            self.vectors = vstack([self.vectors[keep], changed]).tocsr()[np.argsort(np.concatenate([keep, rows]))]
+            zero_rows = np.diff(changed.indptr) == 0
+        else:
+            self.vectors[rows] = changed
+            zero_rows = ~np.any(changed, axis=1)
+
+        new_codes = self._hash(self._project(changed))
+        new_codes[zero_rows] = -1
+        self.codes[rows] = new_codes
+
+        removed = np.isin(self.order, rows)
+        order = self.order[~removed].reshape(self.n_tables, -1)
+        sorted_codes = self.sorted_codes[~removed].reshape(self.n_tables, -1)
+        new_order = np.empty_like(self.order)
+        new_sorted = np.empty_like(self.sorted_codes)
+        for table in range(self.n_tables):
+            keys = sorted_codes[table].astype(np.int64) * n_items + order[table]
+            insert_keys = new_codes[:, table].astype(np.int64) * n_items + rows
+            insert_order = np.argsort(insert_keys)
+            positions = np.searchsorted(keys, insert_keys[insert_order])
+            new_order[table] = np.insert(order[table], positions, rows[insert_order])
+            new_sorted[table] = np.insert(sorted_codes[table], positions, new_codes[insert_order, table])
+        self.order, self.sorted_codes = new_order, new_sorted
+        return self
+
+    def _probe_codes(self, projected: np.ndarray) -> np.ndarray:
+        """生成每张表需要探测的桶编码 (查询数 × 表数 × (1 + n_probes))"""
+        projected = projected.reshape(len(projected), self.n_tables, self.n_bits)
+        codes = (projected > 0).astype(np.int64) @ self._powers
+        if self.n_probes:
+            # 投影值最接近0的位最可能与近邻不同，优先翻转
+            flip_bits = np.argsort(np.abs(projected), axis=2)[:, :, :self.n_probes]
+            codes = np.concatenate([codes[:, :, None], codes[:, :, None] ^ self._powers[flip_bits]], axis=2)
+        else:
+            codes = codes[:, :, None]
+        # 与索引中的编码类型一致，避免 searchsorted 转换整个数组
+        return codes.astype(self.sorted_codes.dtype)
+
+    def _candidates(self, probe_codes: np.ndarray) -> np.ndarray:
+        """取出所有表中落入探测桶的物品"""
+        found = []
+        for table in range(self.n_tables):
+            sorted_codes = self.sorted_codes[table]
+            codes = probe_codes[table]
+            starts = np.searchsorted(sorted_codes, codes, side='left')
+            ends = np.searchsorted(sorted_codes, codes, side='right')
+            for start, end in zip(starts, ends):
+                if end > start:
+                    found.append(self.order[table, start:end])
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        candidates, hits = np.unique(np.concatenate(found), return_counts=True)
+        if len(candidates) > self.max_candidates:
+            # 候选过多时保留在最多张表中碰撞的物品
+            keep = np.lexsort((candidates, -hits))[:self.max_candidates]
+            candidates = np.sort(candidates[keep])
+        return candidates
+
+    def query(self, vector, k: int, exclude: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """查询与向量最相似的k个物品
+
+        Args:
+            vector: 查询向量 (1 × 维度)，稀疏矩阵或numpy数组
+            k: 返回的近邻数量
+            exclude: 需要排除的物品下标 (通常为查询物品自身)
+
+        Returns:
+            (物品下标数组, 余弦相似度数组)，按相似度从高到低排列，只包含正相似度
+        """
+        if issparse(vector):
+            vector = csr_matrix(vector, dtype=np.float32)
+        else:
+            vector = np.asarray(vector, dtype=np.float32).reshape(1, -1)
+        vector = l2_normalize_rows(vector)
+
+        candidates = self._candidates(self._probe_codes(self._project(vector))[0])
+        if exclude is not None:
+            candidates = candidates[candidates != exclude]
+        if len(candidates) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        # 精确重排
+        sims = self.vectors[candidates] @ vector.T
+        sims = np.asarray(sims.toarray() if issparse(sims) else sims, dtype=np.float32).ravel()
+        if k < len(candidates):
+            top = np.argpartition(-sims, k - 1)[:k]
+        else:
+            top = np.arange(len(candidates))
+        top = top[np.lexsort((candidates[top], -sims[top]))]
+        top = top[sims[top] > 0]
+        return candidates[top], sims[top]
+
+    def query_item(self, row: int, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """查询与已索引的第row个物品最相似的k个物品 (排除自身)"""
+        if self.codes[row, 0] < 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        return self.query(self.vectors[row], k, exclude=row)
+
+    def _block_candidates(self, block_rows: np.ndarray) -> np.ndarray:
+        """一次取出一批已索引物品的候选，与逐个调用 _candidates 的结果相同
+
+        Returns:
+            候选掩码 (块大小 × 物品数 的布尔矩阵)，不包含物品自身
+        """
+        n_items = len(self.codes)
+        probe_codes = self._probe_codes(self._project(self.vectors[block_rows]))
+        n_probe = probe_codes.shape[2]
+        owners, found = [], []
+        for table in range(self.n_tables):
+            codes = probe_codes[:, table, :].ravel()
+            starts = np.searchsorted(self.sorted_codes[table], codes, side='left')
+            lengths = np.searchsorted(self.sorted_codes[table], codes, side='right') - starts
+            # 将每个桶的 [start, end) 区间展开为位置数组
+            offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+            found.append(self.order[table, offsets + np.arange(lengths.sum())])
+            owners.append(np.repeat(np.arange(len(codes)) // n_probe, lengths))
+        owners, found = np.concatenate(owners), np.concatenate(found)
+
+        mask = np.zeros((len(block_rows), n_items), dtype=bool)
+        mask[owners, found] = True
+        # 零向量不参与分桶，也没有近邻
+        mask[self.codes[block_rows, 0] < 0] = False
+
+        for row in np.flatnonzero(mask.sum(axis=1) > self.max_candidates):
+            # 候选过多时保留在最多张表中碰撞的物品，碰撞次数相同时保留下标较小的
+            hits = np.bincount(found[owners == row], minlength=n_items)
+            keep = np.lexsort((np.arange(n_items), -hits))[:self.max_candidates]
+            mask[row] = False
+            mask[row, keep] = True
+        mask[np.arange(len(block_rows)), block_rows] = False
+        return mask
+
+    def _similarities(self, block_rows: np.ndarray, vectors) -> np.ndarray:
+        """计算一批已索引物品与给定向量的余弦相似度 (稠密float32矩阵)"""
+        sims = self.vectors[block_rows] @ vectors.T
+        return np.asarray(sims.toarray() if issparse(sims) else sims, dtype=np.float32)
+
+    def neighbors(self, k: int, rows: Optional[Sequence[int]] = None,
+                  max_block_bytes: int = DEFAULT_BLOCK_BYTES) -> csr_matrix:
+        """为已索引的物品生成top-K近邻索引，格式与 build_topk_neighbors 相同
+
+        与 build_topk_neighbors 一样分块处理：每块物品的候选一次取出，
+        再用一次矩阵乘法对块内出现过的候选精确打分，用 topk_from_block 选出top-K。
+
+        Args:
+            k: 每个物品保留的近邻数量
+            rows: 只计算这些物品的近邻，默认计算全部物品
+            max_block_bytes: 单个相似度分块的内存上限
+
+        Returns:
+            近邻索引 (len(rows) × 物品数 的CSR矩阵)
+        """
+        n_items = self.vectors.shape[0]
+        row_ids = np.arange(n_items) if rows is None else np.asarray(rows, dtype=np.int64)
+        block_size = block_size_for(n_items, max_block_bytes)
+
+        counts, indices, data = [], [], []
+        for start in range(0, len(row_ids), block_size):
+            block_rows = row_ids[start:start + block_size]
+            mask = self._block_candidates(block_rows)
+
+            # 只对块内出现过的候选物品计算相似度，非候选的相似度为0
+            columns = np.flatnonzero(mask.any(axis=0))
+            if len(columns) == n_items:
+                sims = self._similarities(block_rows, self.vectors)
+                sims *= mask
+            else:
+                sims = np.zeros(mask.shape, dtype=np.float32)
+                if len(columns):
+                    block_sims = self._similarities(block_rows, self.vectors[columns])
+                    block_sims *= mask[:, columns]
+                    sims[:, columns] = block_sims
+            block_counts, block_indices, block_data = topk_from_block(sims, block_rows, k)
+            counts.append(block_counts)
+            indices.append(block_indices)
+            data.append(block_data)
+
+        return assemble_neighbors(counts, indices, data, len(row_ids), n_items)
+
+
+def build_lsh_neighbors(vectors, k: int = 50, rows: Optional[Sequence[int]] = None, **params) -> csr_matrix:
+    """使用随机投影LSH构建近似的top-K近邻索引
+
+    Args:
+        vectors: 物品向量 (物品数 × 维度)
+        k: 每个物品保留的近邻数量
+        rows: 只计算这些物品的近邻，默认计算全部物品
+        **params: 传给 RandomProjectionLSH 的参数
+
+    Returns:
+        近邻索引 (len(rows) × 物品数 的CSR矩阵)
+    """
+    return RandomProjectionLSH(**params).fit(vectors).neighbors(k, rows)
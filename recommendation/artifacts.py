@@ -0,0 +1,117 @@
+# 推荐模型的持久化
+# filename: recommendation/artifacts.py
+
+import json
+import os
+import shutil
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+# 模型文件格式版本，格式不兼容时递增
+ARTIFACT_FORMAT_VERSION = 1
+
+# 指向当前版本目录的文件名
+CURRENT_POINTER = 'CURRENT'
+
+
+def save_csr(directory: str, name: str, matrix: csr_matrix) -> Dict[str, Any]:
+    """将CSR矩阵保存为三个 .npy 文件，返回其形状等元数据"""
+    np.save(os.path.join(directory, f'{name}_data.npy'), matrix.data)
+    np.save(os.path.join(directory, f'{name}_indices.npy'), matrix.indices)
+    np.save(os.path.join(directory, f'{name}_indptr.npy'), matrix.indptr)
+    return {'shape': list(matrix.shape)}
+
+
+def load_csr(directory: str, name: str, meta: Dict[str, Any], mmap_mode: Optional[str] = 'r') -> csr_matrix:
+    """从 .npy 文件加载CSR矩阵，默认使用内存映射，不复制数据"""
+    data = np.load(os.path.join(directory, f'{name}_data.npy'), mmap_mode=mmap_mode)
+    indices = np.load(os.path.join(directory, f'{name}_indices.npy'), mmap_mode=mmap_mode)
+    indptr = np.load(os.path.join(directory, f'{name}_indptr.npy'), mmap_mode=mmap_mode)
+    return csr_matrix((data, indices, indptr), shape=tuple(meta['shape']), copy=False)
+
+
+def save_id_map(directory: str, name: str, id_map):
+    """保存ID映射 (按下标排列的ID、有序ID及其下标)"""
+    ids = np.asarray(id_map.all_ids(), dtype=np.int64)
+    order = np.argsort(ids, kind='stable')
+    np.save(os.path.join(directory, f'{name}_ids.npy'), ids)
+    np.save(os.path.join(directory, f'{name}_sorted_ids.npy'), ids[order])
+    np.save(os.path.join(directory, f'{name}_order.npy'), order)
+
+
+def load_id_map_arrays(directory: str, name: str, mmap_mode: Optional[str] = 'r'):
+    """加载ID映射数组，返回 (ids, sorted_ids, order)"""
+    return tuple(
+        np.load(os.path.join(directory, f'{name}_{suffix}.npy'), mmap_mode=mmap_mode)
+        for suffix in ('ids', 'sorted_ids', 'order')
+    )
+
+
+def new_version_dir(root_dir: str) -> str:
+    """在模型根目录下创建一个临时的新版本目录"""
+    version = datetime.now().strftime('%Y%m%d%H%M%S%f')
+    path = os.path.join(root_dir, f'.tmp-{version}')
+    os.makedirs(path)
+    return path
+
+
+def publish_version(root_dir: str, tmp_dir: str, meta: Dict[str, Any], keep: int = 3) -> str:
+    """写入元数据并原子地将临时目录发布为当前版本
+
+    Args:
+        root_dir: 模型根目录
+        tmp_dir: 已写入模型文件的临时目录
+        meta: 模型元数据
+        keep: 保留的历史版本数量
+
+    Returns:
+        发布后的版本目录
+    """
+    version = os.path.basename(tmp_dir)[len('.tmp-'):]
+    meta = dict(meta, version=version, format_version=ARTIFACT_FORMAT_VERSION)
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    version_dir = os.path.join(root_dir, version)
+    os.rename(tmp_dir, version_dir)
+
+    # 原子地更新当前版本指针
+    pointer_tmp = os.path.join(root_dir, f'{CURRENT_POINTER}.tmp')
+    with open(pointer_tmp, 'w', encoding='utf-8') as f:
+        f.write(version)
+    os.replace(pointer_tmp, os.path.join(root_dir, CURRENT_POINTER))
+
+    # 清理过旧的版本 (已映射这些文件的进程不受影响)
+    versions = sorted(d for d in os.listdir(root_dir)
+                      if os.path.isdir(os.path.join(root_dir, d)) and not d.startswith('.'))
+    for old in versions[:-keep]:
+        shutil.rmtree(os.path.join(root_dir, old), ignore_errors=True)
+
+    return version_dir
+
+
+def current_version_dir(root_dir: str) -> Optional[str]:
+    """返回当前版本目录，不存在或格式不兼容时返回None"""
+    try:
+        with open(os.path.join(root_dir, CURRENT_POINTER), encoding='utf-8') as f:
+            version = f.read().strip()
+    except OSError:
+        return None
+
+    version_dir = os.path.join(root_dir, version)
+    meta = read_meta(version_dir)
+    if meta is None or meta.get('format_version') != ARTIFACT_FORMAT_VERSION:
+        return None
+    return version_dir
+
+
+def read_meta(version_dir: str) -> Optional[Dict[str, Any]]:
+    """读取版本目录中的元数据"""
+    try:
+        with open(os.path.join(version_dir, 'meta.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
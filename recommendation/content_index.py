@@ -0,0 +1,186 @@
+# 基于内容的相似产品索引
+# filename: recommendation/content_index.py
+
+import json
+import threading
+from typing import List, Optional
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from models.models import db, Product
+from recommendation.cache import LRUCache
+
+# 各项相似度的权重
+BRAND_WEIGHT = 3.0
+PRICE_WEIGHT = 2.0
+PLATFORM_WEIGHT = 1.0
+SPEC_WEIGHT = 0.5
+
+
+def _parse_spec_pairs(spec_json: Optional[str]) -> List[str]:
+    """将规格JSON解析为 "键=值" 形式的列表，值统一序列化以便比较"""
+    if not spec_json:
+        return []
+    try:
+        specs = json.loads(spec_json)
+    except (ValueError, TypeError):
+        return []
+    if not isinstance(specs, dict):
+        return []
+    return [f'{key}={json.dumps(value, ensure_ascii=False, sort_keys=True)}' for key, value in specs.items()]
+
+
+def _encode(values: List) -> np.ndarray:
+    """将取值编码为整数，相同取值 (包括None) 得到相同的编码"""
+    vocab = {}
+    return np.array([vocab.setdefault(v, len(vocab)) for v in values], dtype=np.int32)
+
+
+class CategoryContentArrays:
+    """单个类别下所有产品的预计算数组"""
+
+    def __init__(self, rows):
+        """根据 (id, brand, price, platform, spec_json) 行构建数组"""
+        self.product_ids = np.array([r[0] for r in rows], dtype=np.int64)
+        self.brand_codes = _encode([r[1] for r in rows])
+        self.prices = np.array([r[2] if r[2] is not None else np.nan for r in rows], dtype=np.float64)
+        self.platform_codes = _encode([r[3] for r in rows])
+        self.row_of = {product_id: i for i, product_id in enumerate(self.product_ids.tolist())}
+
+        # 规格的 (键, 值) 对编码为稀疏的二值矩阵，匹配数量即为行向量的内积
+        pair_vocab = {}
+        indptr, indices = [0], []
+        for r in rows:
+            indices.extend(pair_vocab.setdefault(pair, len(pair_vocab)) for pair in _parse_spec_pairs(r[4]))
+            indptr.append(len(indices))
+        self.spec_matrix = csr_matrix(
+            (np.ones(len(indices), dtype=np.float32), np.array(indices, dtype=np.int32), np.array(indptr)),
+            shape=(len(rows), max(len(pair_vocab), 1))
+        )
+        self.spec_matrix_t = self.spec_matrix.T.tocsr()
+
+    def __len__(self) -> int:
+        return len(self.product_ids)
+
+    def scores(self, row: int) -> np.ndarray:
+        """计算类别内所有产品与第row个产品的相似度分数 (自身为 -inf)"""
+        # 品牌相似度
+        scores = BRAND_WEIGHT * (self.brand_codes == self.brand_codes[row])
+
+        # 价格相似度 (归一化差异)
+        price = self.prices[row]
+        if price and not np.isnan(price):
+            valid = (self.prices != 0) & ~np.isnan(self.prices)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                price_diff = np.abs(self.prices - price) / np.maximum(self.prices, price)
+            scores = scores + np.where(valid, (1 - price_diff) * PRICE_WEIGHT, 0)
+
+        # 平台相似度
+        scores = scores + PLATFORM_WEIGHT * (self.platform_codes == self.platform_codes[row])
+
+        # 规格相似度：相同 (键, 值) 对的数量
+        query = self.spec_matrix[row]
+        if query.nnz:
+            matches = np.asarray((self.spec_matrix @ query.T).todense()).ravel()
+            scores = scores + SPEC_WEIGHT * matches
+
+        scores = scores.astype(np.float64)
+        scores[row] = -np.inf
+        return scores
+
+    def top_similar(self, row: int, n: int) -> List[int]:
+        """返回与第row个产品最相似的n个产品ID，分数相同时按产品ID排序"""
+        scores = self.scores(row)
+        n = min(n, len(scores) - 1)
+        if n <= 0:
+            return []
+        top = np.argpartition(-scores, n - 1)[:n]
+        top = top[np.lexsort((top, -scores[top]))]
+        return self.product_ids[top].tolist()
+
+
+class ContentIndex:
+    """按类别缓存的内容相似度索引
+
+    类别数组在 ttl 秒后过期，其他进程对产品的修改最迟在过期后生效；
+    本进程修改产品后由 invalidate_product 立即清除其新旧类别的数组。
+    """
+
+    def __init__(self, ttl: Optional[float] = 300, max_categories: int = 256):
+        """初始化索引
+
+        Args:
+            ttl: 类别数组的过期时间 (秒)，None 表示永不过期
+            max_categories: 最多缓存的类别数
+        """
+        self._categories = LRUCache(max_size=max_categories, ttl=ttl)  # category_id -> CategoryContentArrays
+        self._category_of = {}  # product_id -> category_id
+        self._lock = threading.Lock()
+
+    def _query_category(self, product_id: int):
+        row = db.session.query(Product.category_id).filter(Product.id == product_id).first()
+        if row is None:
+            return None, False
+        with self._lock:
+            self._category_of[product_id] = row[0]
+        return row[0], True
+
+    def _category_for(self, product_id: int):
+        if product_id in self._category_of:
+            return self._category_of[product_id], True
+        return self._query_category(product_id)
+
+    def _arrays_for(self, category_id: Optional[int]) -> CategoryContentArrays:
+        # 未分类的产品 (category_id 为 NULL) 作为一个类别互相比较，== None 会生成 IS NULL
+        arrays = self._categories.get(category_id)
+        if arrays is None:
+            rows = db.session.query(
+                Product.id, Product.brand, Product.price, Product.platform, Product.spec_json
+            ).filter(Product.category_id == category_id).order_by(Product.id).all()
+            arrays = CategoryContentArrays(rows)
+            self._categories.set(category_id, arrays)
+            with self._lock:
+                for product_id in arrays.row_of:
+                    self._category_of[product_id] = category_id
+        return arrays
+
+    def similar(self, product_id: int, n: int) -> Optional[List[int]]:
+        """获取与指定产品同类别且最相似的n个产品ID
+
+        Returns:
+            产品ID列表；产品不存在时返回None；同类别产品不足n个时返回空列表
+        """
+        category_id, exists = self._category_for(product_id)
+        if not exists:
+            return None
+
+        arrays = self._arrays_for(category_id)
+        row = arrays.row_of.get(product_id)
+        if row is None:
+            # 产品可能已移到其他类别 (或刚刚加入该类别)，重新查询类别并重建数组
+            self.invalidate_category(category_id)
+            category_id, exists = self._query_category(product_id)
+            if not exists:
+                return None
+            self.invalidate_category(category_id)
+            arrays = self._arrays_for(category_id)
+            row = arrays.row_of.get(product_id)
+            if row is None:
+                return []
+
+        if len(arrays) - 1 < n:
+            return []
+        return arrays.top_similar(row, n)
+
+    def invalidate_category(self, category_id):
+        """清除某个类别的数组"""
+        self._categories.delete(category_id)
+
+    def invalidate_product(self, product_id: int):
+        """产品变更后清除其原类别和当前类别的数组"""
+        with self._lock:
+            old_category_id = self._category_of.pop(product_id, None)
+        new_category_id, _ = self._query_category(product_id)
+        for category_id in {old_category_id, new_category_id}:
+            self.invalidate_category(category_id)
@@ -0,0 +1,178 @@
+# 优惠力度排行
+# filename: recommendation/discounts.py
+
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import or_
+
+from models.models import db, Product, PlatformDiscount
+
+# 优惠类型编码
+DISCOUNT_TYPE_CODES = {'满减': 0, '折扣': 1, '消费券': 2}
+
+
+def discount_amounts(type_codes: np.ndarray, values: np.ndarray, min_purchases: np.ndarray,
+                     prices: np.ndarray) -> np.ndarray:
+    """向量化计算每条优惠在产品原价上的优惠金额
+
+    满减：价格达到门槛时减去优惠值；折扣：价格 × (1 - 折数/10)；消费券：直接减去优惠值。
+    """
+    return np.select(
+        [(type_codes == 0) & (prices >= min_purchases), type_codes == 1, type_codes == 2],
+        [values, prices * (1 - values / 10), values],
+        default=0.0
+    )
+
+
+def format_discount(discount_type: str, value, min_purchase) -> str:
+    """格式化优惠描述"""
+    if discount_type == '满减':
+        return f'满{min_purchase}减{value}'
+    if discount_type == '折扣':
+        return f'{value}折'
+    if discount_type == '消费券':
+        return f'减{value}元'
+    return ''
+
+
+# 一次加载的全部优惠数据，加载后不再修改；查询只读取同一个快照，不会混用新旧两次加载的数组
+DiscountSnapshot = namedtuple('DiscountSnapshot', [
+    'discount_ids', 'product_ids', 'types', 'values', 'min_purchases',
+    'starts', 'ends', 'amounts', 'percentages'
+])
+
+
+class DiscountIndex:
+    """按时间分桶的有效优惠索引
+
+    只加载尚未结束的优惠 (一次关联查询同时取得产品价格)，优惠金额和比例在加载时整列计算。
+    每个时间桶缓存在该时间段内可能生效的优惠行，查询时只需在这一小部分行中
+    精确过滤生效时间并用 argpartition 选出前n名，过期和尚未开始的优惠不会被扫描。
+    重新加载时整体替换快照，正在进行的查询继续使用它开始时取得的快照。
+    """
+
+    def __init__(self, bucket_seconds: float = 3600, refresh_interval: Optional[float] = 600):
+        """初始化索引
+
+        Args:
+            bucket_seconds: 时间桶的长度 (秒)
+            refresh_interval: 从数据库重新加载的间隔 (秒)，用于同步其他进程写入的数据
+        """
+        self.bucket_seconds = bucket_seconds
+        self.refresh_interval = refresh_interval
+        self._loaded_at = None
+        self._snapshot = None
+        # (快照, 时间桶, 行号)，与快照一起替换
+        self._bucket_cache = None
+        self._lock = threading.Lock()
+
+    def refresh(self, now: Optional[datetime] = None):
+        """从数据库加载所有尚未结束的优惠"""
+        now = now or datetime.now()
+        rows = db.session.query(
+            PlatformDiscount.id, PlatformDiscount.product_id, PlatformDiscount.discount_type,
+            PlatformDiscount.discount_value, PlatformDiscount.min_purchase,
+            PlatformDiscount.start_date, PlatformDiscount.end_date, Product.price
+        ).join(Product, Product.id == PlatformDiscount.product_id).filter(
+            or_(PlatformDiscount.end_date.is_(None), PlatformDiscount.end_date >= now)
+        ).order_by(PlatformDiscount.id).all()
+
+        types = tuple(r[2] for r in rows)
+        values = tuple(r[3] for r in rows)
+        min_purchases = tuple(r[4] for r in rows)
+        type_codes = np.array([DISCOUNT_TYPE_CODES.get(t, -1) for t in types], dtype=np.int8)
+        prices = np.array([r[7] or 0 for r in rows], dtype=np.float64)
+        amounts = discount_amounts(type_codes, np.array([v or 0 for v in values], dtype=np.float64),
+                                   np.array([m or 0 for m in min_purchases], dtype=np.float64), prices)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            percentages = np.where(prices > 0, amounts / prices * 100, 0.0)
+
+        snapshot = DiscountSnapshot(
+            discount_ids=np.array([r[0] for r in rows], dtype=np.int64),
+            product_ids=np.array([r[1] for r in rows], dtype=np.int64),
+            types=types,
+            values=values,
+            min_purchases=min_purchases,
+            starts=np.array([r[5].timestamp() if r[5] else -np.inf for r in rows], dtype=np.float64),
+            ends=np.array([r[6].timestamp() if r[6] else np.inf for r in rows], dtype=np.float64),
+            amounts=amounts,
+            percentages=percentages
+        )
+        for array in snapshot:
+            if isinstance(array, np.ndarray):
+                array.flags.writeable = False
+
+        with self._lock:
+            self._snapshot = snapshot
+            self._bucket_cache = None
+            self._loaded_at = time.monotonic()
+
+    def ensure_loaded(self) -> DiscountSnapshot:
+        """首次使用或超过刷新间隔时重新加载
+
+        Returns:
+            当前的优惠快照
+        """
+        if self._loaded_at is None or (
+            self.refresh_interval is not None
+            and time.monotonic() - self._loaded_at > self.refresh_interval
+        ):
+            self.refresh()
+        with self._lock:
+            return self._snapshot
+
+    def invalidate(self):
+        """优惠或产品价格变化后，下次查询时重新加载"""
+        self._loaded_at = None
+
+    def _rows_for_bucket(self, snapshot: DiscountSnapshot, bucket: int) -> np.ndarray:
+        """快照中在时间桶内任意时刻可能生效的优惠行 (按桶缓存)"""
+        with self._lock:
+            cache = self._bucket_cache
+            if cache is not None and cache[0] is snapshot and cache[1] == bucket:
+                return cache[2]
+        bucket_start = bucket * self.bucket_seconds
+        bucket_end = bucket_start + self.bucket_seconds
+        rows = np.nonzero((snapshot.starts < bucket_end) & (snapshot.ends > bucket_start))[0]
+        with self._lock:
+            # 计算期间快照可能已被替换，只缓存当前快照的结果
+            if self._snapshot is snapshot:
+                self._bucket_cache = (snapshot, bucket, rows)
+        return rows
+
+    def top(self, n: int, now: Optional[datetime] = None) -> Tuple[List[int], List[Dict[str, Any]]]:
+        """当前生效的优惠中优惠比例最高的n条
+
+        Args:
+            n: 数量
+            now: 查询时间，默认为当前时间
+
+        Returns:
+            (产品ID列表, 与之对应的优惠信息列表)
+        """
+        snapshot = self.ensure_loaded()
+        ts = (now or datetime.now()).timestamp()
+        rows = self._rows_for_bucket(snapshot, int(ts // self.bucket_seconds))
+        rows = rows[(snapshot.starts[rows] <= ts) & (snapshot.ends[rows] >= ts)]
+        if len(rows) == 0 or n <= 0:
+            return [], []
+
+        percentages = snapshot.percentages[rows]
+        if len(rows) > n:
+            top = np.argpartition(-percentages, n - 1)[:n]
+            rows, percentages = rows[top], percentages[top]
+        rows = rows[np.lexsort((snapshot.discount_ids[rows], -percentages))]
+
+        product_ids = snapshot.product_ids[rows].tolist()
+        extras = [{
+            'discount_amount': float(snapshot.amounts[row]),
+            'discount_percentage': float(snapshot.percentages[row]),
+            'discount_desc': format_discount(snapshot.types[row], snapshot.values[row],
+                                             snapshot.min_purchases[row])
+        } for row in rows.tolist()]
+        return product_ids, extras
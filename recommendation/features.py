@@ -0,0 +1,204 @@
+# 物品内容特征提取
+# filename: recommendation/features.py
+
+import json
+import re
+from functools import lru_cache
+from typing import List, Iterable, Optional, Tuple
+
+import numpy as np
+
+from models.models import db, Product
+
+# 规格特征的归一化基准
+MEMORY_SCALE_GB = 16.0     # 内存按16GB归一化
+STORAGE_SCALE_GB = 1024.0  # 存储按1TB归一化
+
+_CAPACITY_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*(TB|GB|MB|T|G|M)?', re.IGNORECASE)
+_UNIT_TO_GB = {'tb': 1024.0, 't': 1024.0, 'gb': 1.0, 'g': 1.0, 'mb': 1 / 1024.0, 'm': 1 / 1024.0}
+
+
+def parse_capacity(value) -> float:
+    """将容量规格 (如 "8GB"、"1TB") 解析为以GB为单位的数值，无法解析时返回0"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str):
+        return 0.0
+    match = _CAPACITY_PATTERN.search(value)
+    if not match:
+        return 0.0
+    unit = (match.group(2) or 'gb').lower()
+    return float(match.group(1)) * _UNIT_TO_GB[unit]
+
+
+@lru_cache(maxsize=65536)
+def parse_spec_features(spec_json: Optional[str]) -> Tuple[float, float]:
+    """从规格JSON中解析内存和存储容量 (GB)，相同的规格字符串只解析一次"""
+    if not spec_json:
+        return 0.0, 0.0
+    try:
+        specs = json.loads(spec_json)
+    except (ValueError, TypeError):
+        return 0.0, 0.0
+    if not isinstance(specs, dict):
+        return 0.0, 0.0
+    return parse_capacity(specs.get('内存', 0)), parse_capacity(specs.get('存储', 0))
+
+
+class ItemFeatureStore:
+    """列式存储的物品特征，用于基于内容的推荐
+
+    每个产品的规格只在加载或变更时解析一次；全站归一化参数 (最高价格、
+    类别和平台词表) 在生成矩阵时对整列一次性计算。特征矩阵的列顺序固定为：
+    类别one-hot (按类别ID排序)、归一化价格、平台one-hot (按平台名排序)、内存、存储。
+    """
+
+    def __init__(self):
+        """初始化特征存储"""
+        self.product_ids = np.empty(0, dtype=np.int64)
+        self.category_ids = np.empty(0, dtype=np.int64)
+        self.prices = np.empty(0, dtype=np.float64)
+        self.platforms = np.empty(0, dtype=object)
+        self.memory_gb = np.empty(0, dtype=np.float32)
+        self.storage_gb = np.empty(0, dtype=np.float32)
+        self.schema = []
+        self._row_of = {}
+        self._dirty = set()
+        self._loaded = False
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def _query_rows(self, product_ids: Optional[Iterable[int]] = None):
+        query = db.session.query(
+            Product.id, Product.category_id, Product.price, Product.platform, Product.spec_json
+        )
+        if product_ids is not None:
+            query = query.filter(Product.id.in_(list(product_ids)))
+        return query.all()
+
+    def load(self):
+        """全量加载所有产品的特征列"""
+        rows = self._query_rows()
+        self.product_ids = np.array([r[0] for r in rows], dtype=np.int64)
+        self.category_ids = np.array([r[1] or 0 for r in rows], dtype=np.int64)
+        self.prices = np.array([r[2] if r[2] is not None else np.nan for r in rows], dtype=np.float64)
+        self.platforms = np.array([r[3] or '' for r in rows], dtype=object)
+        specs = [parse_spec_features(r[4]) for r in rows]
+        self.memory_gb = np.array([s[0] for s in specs], dtype=np.float32)
+        self.storage_gb = np.array([s[1] for s in specs], dtype=np.float32)
+        self._row_of = {product_id: i for i, product_id in enumerate(self.product_ids.tolist())}
+        self._dirty.clear()
+        self._loaded = True
+
+    def mark_dirty(self, product_id: int):
+        """标记产品已变更，下次刷新时重新解析"""
+        self._dirty.add(product_id)
+
+    def refresh(self) -> List[int]:
+        """只重新加载已变更的产品
+
+        Returns:
+            本次刷新的产品ID列表
+        """
+        if not self._loaded:
+            changed = sorted(self._dirty)
+            self.load()
+            return changed
+        if not self._dirty:
+            return []
+
+        changed = sorted(self._dirty)
+        self._dirty.clear()
+        rows = {r[0]: r for r in self._query_rows(changed)}
+
+        appended = []
+        for product_id in changed:
+            row = rows.get(product_id)
+            idx = self._row_of.get(product_id)
+            if idx is None:
+                if row is not None:
+                    appended.append(row)
+                continue
+            if row is None:
+                # 产品已删除，清空该行特征
+                self.category_ids[idx] = 0
+                self.prices[idx] = np.nan
+                self.platforms[idx] = ''
+                self.memory_gb[idx] = 0
+                self.storage_gb[idx] = 0
+                continue
+            self.category_ids[idx] = row[1] or 0
+            self.prices[idx] = row[2] if row[2] is not None else np.nan
+            self.platforms[idx] = row[3] or ''
+            self.memory_gb[idx], self.storage_gb[idx] = parse_spec_features(row[4])
+
+        if appended:
+            specs = [parse_spec_features(r[4]) for r in appended]
+            start = len(self.product_ids)
+            self.product_ids = np.concatenate([self.product_ids, [r[0] for r in appended]]).astype(np.int64)
+            self.category_ids = np.concatenate([self.category_ids, [r[1] or 0 for r in appended]]).astype(np.int64)
+            self.prices = np.concatenate([self.prices, [r[2] if r[2] is not None else np.nan for r in appended]])
+            self.platforms = np.concatenate([self.platforms, np.array([r[3] or '' for r in appended], dtype=object)])
+            self.memory_gb = np.concatenate([self.memory_gb, [s[0] for s in specs]]).astype(np.float32)
+            self.storage_gb = np.concatenate([self.storage_gb, [s[1] for s in specs]]).astype(np.float32)
+            for i, row in enumerate(appended):
+                self._row_of[row[0]] = start + i
+
+        return changed
+
+    def feature_matrix(self, item_ids: List[int]) -> np.ndarray:
+        """生成指定物品的特征矩阵 (float32)，不存在的产品对应全零行
+
+        Args:
+            item_ids: 物品ID列表，决定矩阵的行顺序
+
+        Returns:
+            特征矩阵 (物品数 × 特征维度)
+        """
+        if not self._loaded:
+            self.load()
+
+        # 全站归一化参数
+        category_vocab = np.unique(self.category_ids[self.category_ids > 0])
+        platform_vocab = np.array(sorted(set(self.platforms.tolist()) - {''}), dtype=object)
+        max_price = np.nanmax(self.prices) if np.any(~np.isnan(self.prices)) else 0.0
+        if not max_price or max_price <= 0:
+            max_price = 1.0
+
+        self.schema = ([f'category:{c}' for c in category_vocab.tolist()] + ['price'] +
+                       [f'platform:{p}' for p in platform_vocab.tolist()] + ['memory', 'storage'])
+        n_category, n_platform = len(category_vocab), len(platform_vocab)
+        matrix = np.zeros((len(item_ids), len(self.schema)), dtype=np.float32)
+
+        rows = np.array([self._row_of.get(item_id, -1) for item_id in item_ids], dtype=np.int64)
+        present = np.nonzero(rows >= 0)[0]
+        if len(present) == 0:
+            return matrix
+        src = rows[present]
+
+        # 类别特征 (one-hot编码)
+        categories = self.category_ids[src]
+        category_pos = np.searchsorted(category_vocab, categories)
+        has_category = (category_pos < n_category) & (categories > 0)
+        has_category[has_category] &= category_vocab[category_pos[has_category]] == categories[has_category]
+        matrix[present[has_category], category_pos[has_category]] = 1
+
+        # 价格特征 (归一化)
+        prices = self.prices[src]
+        matrix[present, n_category] = np.where(np.isnan(prices), 0, prices / max_price)
+
+        # 平台特征 (one-hot编码)
+        platforms = self.platforms[src]
+        if n_platform:
+            platform_pos = np.searchsorted(platform_vocab, platforms)
+            has_platform = platform_pos < n_platform
+            has_platform[has_platform] &= platform_vocab[platform_pos[has_platform]] == platforms[has_platform]
+            matrix[present[has_platform], n_category + 1 + platform_pos[has_platform]] = 1
+
+        # 规格特征
+        matrix[present, -2] = self.memory_gb[src] / MEMORY_SCALE_GB
+        matrix[present, -1] = self.storage_gb[src] / STORAGE_SCALE_GB
+
+        return matrix
@@ -0,0 +1,102 @@
+# ID与矩阵下标之间的映射
+# filename: recommendation/id_map.py
+
+from typing import Iterable, Optional
+
+import numpy as np
+
+
+class IdMap:
+    """将用户/产品ID映射为矩阵下标
+
+    基于有序数组的二分查找实现，不为每个ID创建Python对象，
+    因此可以直接使用内存映射的数组构建，加载开销与ID数量无关。
+    训练后新增的ID保存在一个小字典和按下标排列的列表中，原数组保持不变。
+    """
+
+    def __init__(self, ids: np.ndarray, sorted_ids: Optional[np.ndarray] = None,
+                 order: Optional[np.ndarray] = None):
+        """初始化映射
+
+        Args:
+            ids: 按矩阵下标排列的ID数组
+            sorted_ids: 升序排列的ID数组，默认由 ids 计算
+            order: sorted_ids 中每个ID对应的矩阵下标，默认由 ids 计算
+        """
+        self.ids = np.asarray(ids)
+        if self.ids.dtype.kind not in 'iu':
+            self.ids = self.ids.astype(np.int64)
+        if sorted_ids is None or order is None:
+            order = np.argsort(self.ids, kind='stable')
+            sorted_ids = self.ids[order]
+        self.sorted_ids = sorted_ids
+        self.order = order
+        self._extra = {}
+        self._extra_ids = []
+
+    def __len__(self) -> int:
+        return len(self.ids) + len(self._extra)
+
+    def get(self, key, default=None):
+        """获取ID对应的下标，不存在时返回 default"""
+        pos = int(np.searchsorted(self.sorted_ids, key))
+        if pos < len(self.sorted_ids) and self.sorted_ids[pos] == key:
+            return int(self.order[pos])
+        return self._extra.get(key, default)
+
+    def __contains__(self, key) -> bool:
+        return self.get(key) is not None
+
+    def __getitem__(self, key) -> int:
+        idx = self.get(key)
+        if idx is None:
+            raise KeyError(key)
+        return idx
+
+    def lookup(self, keys: Iterable) -> np.ndarray:
+        """批量查找下标，不存在的ID返回 -1"""
+        keys = np.asarray(keys, dtype=self.sorted_ids.dtype if len(self.sorted_ids) else np.int64)
+        result = np.full(len(keys), -1, dtype=np.int64)
+        if len(self.sorted_ids):
+            pos = np.minimum(np.searchsorted(self.sorted_ids, keys), len(self.sorted_ids) - 1)
+            found = self.sorted_ids[pos] == keys
+            result[found] = self.order[pos[found]]
+        if self._extra:
+            for i in np.nonzero(result < 0)[0]:
+                result[i] = self._extra.get(keys[i].item(), -1)
+        return result
+
+    def add(self, key) -> int:
+        """追加一个新ID，返回其下标"""
+        idx = self.get(key)
+        if idx is None:
+            idx = len(self)
+            self._extra[key] = idx
+            self._extra_ids.append(key)
+        return idx
+
+    def copy(self) -> 'IdMap':
+        """复制映射 (共享原有的ID数组，只复制追加的ID)，用于在副本上追加后整体替换"""
+        clone = IdMap.__new__(IdMap)
+        clone.ids, clone.sorted_ids, clone.order = self.ids, self.sorted_ids, self.order
+        clone._extra = dict(self._extra)
+        clone._extra_ids = list(self._extra_ids)
+        return clone
+
+    def ids_at(self, indices) -> np.ndarray:
+        """批量获取下标对应的ID (包括追加的ID)"""
+        indices = np.asarray(indices, dtype=np.int64)
+        n_base = len(self.ids)
+        if not self._extra_ids or len(indices) == 0 or indices.max() < n_base:
+            return np.asarray(self.ids[indices])
+        result = np.empty(len(indices), dtype=self.ids.dtype)
+        base = indices < n_base
+        result[base] = self.ids[indices[base]]
+        result[~base] = np.array(self._extra_ids, dtype=self.ids.dtype)[indices[~base] - n_base]
+        return result
+
+    def all_ids(self) -> np.ndarray:
+        """按下标顺序返回全部ID (包括追加的ID)"""
+        if not self._extra_ids:
+            return self.ids
+        return np.concatenate([self.ids, np.array(self._extra_ids, dtype=self.ids.dtype)])
@@ -0,0 +1,148 @@
+# 物品近邻索引
+# filename: recommendation/neighbors.py
+
+import numpy as np
+from scipy.sparse import csr_matrix, issparse, diags
+from typing import Optional, Sequence
+
+# 计算相似度时单个分块允许占用的最大内存 (字节)
+DEFAULT_BLOCK_BYTES = 256 * 1024 * 1024
+
+
+def l2_normalize_rows(vectors):
+    """对矩阵的每一行做L2归一化，全零行保持为零
+
+    Args:
+        vectors: 稀疏矩阵或numpy数组
+
+    Returns:
+        与输入同类型的归一化矩阵 (float32)
+    """
+    if issparse(vectors):
+        vectors = csr_matrix(vectors, dtype=np.float32)
+        norms = np.sqrt(np.asarray(vectors.multiply(vectors).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return csr_matrix(diags(1.0 / norms) @ vectors, dtype=np.float32)
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def block_size_for(n_items: int, max_block_bytes: int = DEFAULT_BLOCK_BYTES) -> int:
+    """根据内存上限计算每个分块包含的物品数量"""
+    return max(1, int(max_block_bytes // (max(n_items, 1) * 4)))
+
+
+def topk_from_block(sims: np.ndarray, block_rows: np.ndarray, k: int):
+    """从一个相似度分块中选出每行的top-K近邻
+
+    Args:
+        sims: 分块相似度 (块大小 × 物品数)，会被原地修改
+        block_rows: 分块中每一行对应的物品下标
+        k: 每个物品保留的近邻数量
+
+    Returns:
+        (每行保留的近邻数, 近邻下标, 相似度) 三元组
+    """
+    # 排除自身
+    sims[np.arange(len(block_rows)), block_rows] = 0
+
+    n_items = sims.shape[1]
+    if k < n_items:
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+    else:
+        top = np.broadcast_to(np.arange(n_items), sims.shape)
+    top_vals = np.take_along_axis(sims, top, axis=1)
+
+    # 只保留正相似度，保证索引稀疏
+    mask = top_vals > 0
+    return mask.sum(axis=1), top[mask], top_vals[mask]
+
+
+def build_topk_neighbors(vectors, k: int = 50, rows: Optional[Sequence[int]] = None,
+                         max_block_bytes: int = DEFAULT_BLOCK_BYTES) -> csr_matrix:
+    """分块计算余弦相似度，只保留每个物品的top-K近邻
+
+    峰值内存为 O(块大小 × 物品数)，结果内存为 O(物品数 × K)。
+
+    Args:
+        vectors: 物品向量 (物品数 × 维度)，可以是稀疏矩阵或numpy数组
+        k: 每个物品保留的近邻数量
+        rows: 只计算这些物品的近邻，默认计算全部物品
+        max_block_bytes: 单个相似度分块的内存上限
+
+    Returns:
+        近邻索引 (len(rows) × 物品数 的CSR矩阵)，第i行存储第i个物品的近邻及相似度
+    """
+    normed = l2_normalize_rows(vectors)
+    n_items = normed.shape[0]
+    row_ids = np.arange(n_items) if rows is None else np.asarray(rows, dtype=np.int64)
+    block_size = block_size_for(n_items, max_block_bytes)
+
+    counts, indices, data = [], [], []
+    for start in range(0, len(row_ids), block_size):
+        block_rows = row_ids[start:start + block_size]
+        sims = normed[block_rows] @ normed.T
+        sims = sims.toarray() if issparse(sims) else np.array(sims)
+        block_counts, block_indices, block_data = topk_from_block(sims.astype(np.float32, copy=False), block_rows, k)
+        counts.append(block_counts)
+        indices.append(block_indices)
+        data.append(block_data)
+
+    return assemble_neighbors(counts, indices, data, len(row_ids), n_items)
+
+
+def assemble_neighbors(counts, indices, data, n_rows: int, n_items: int) -> csr_matrix:
+    """将各分块的近邻结果拼接为CSR矩阵"""
+    if not counts:
+        return csr_matrix((n_rows, n_items), dtype=np.float32)
+
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.concatenate(counts), out=indptr[1:])
+    return csr_matrix((np.concatenate(data).astype(np.float32),
+                       np.concatenate(indices).astype(np.int32),
+                       indptr), shape=(n_rows, n_items))
+
+
+def ranked_neighbors(neighbors: csr_matrix, row: int, n: int):
+    """按相似度从高到低返回某一行的前n个近邻
+
+    Returns:
+        (近邻下标数组, 相似度数组)
+    """
+    start, end = neighbors.indptr[row], neighbors.indptr[row + 1]
+    cols = neighbors.indices[start:end]
+    vals = neighbors.data[start:end]
+    order = np.argsort(-vals, kind='stable')[:n]
+    return cols[order], vals[order]
+
+
+def replace_rows(neighbors: csr_matrix, rows: Sequence[int], new_rows: csr_matrix) -> csr_matrix:
+    """用新计算的近邻替换索引中的若干行，其余行保持不变
+
+    Args:
+        neighbors: 原近邻索引
+        rows: 需要替换的行下标
+        new_rows: 新的近邻 (len(rows) × 物品数)
+
+    Returns:
+        替换后的近邻索引
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    n_rows = neighbors.shape[0]
+
+    old_entry_rows = np.repeat(np.arange(n_rows), np.diff(neighbors.indptr))
+    keep = ~np.isin(old_entry_rows, rows)
+    new_entry_rows = rows[np.repeat(np.arange(len(rows)), np.diff(new_rows.indptr))]
+
+    entry_rows = np.concatenate([old_entry_rows[keep], new_entry_rows])
+    order = np.argsort(entry_rows, kind='stable')
+    indices = np.concatenate([neighbors.indices[keep], new_rows.indices])[order]
+    data = np.concatenate([neighbors.data[keep], new_rows.data])[order]
+
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(entry_rows, minlength=n_rows), out=indptr[1:])
+    return csr_matrix((data.astype(np.float32), indices.astype(np.int32), indptr),
+                      shape=(n_rows, max(neighbors.shape[1], new_rows.shape[1])))
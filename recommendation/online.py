@@ -0,0 +1,303 @@
+# 推荐模型的在线增量更新
+# filename: recommendation/online.py
+
+import atexit
+import os
+import threading
+import time
+from collections import namedtuple
+from typing import Dict, List, Tuple, Optional
+
+import numpy as np
+from scipy.sparse import csr_matrix, csc_matrix, coo_matrix
+
+from models.models import db, UserBehavior
+from recommendation.neighbors import topk_from_block, assemble_neighbors, replace_rows, block_size_for
+from recommendation.popularity import PURCHASE_BEHAVIOR
+
+
+def pad_csr(matrix: csr_matrix, n_rows: int, n_cols: int) -> csr_matrix:
+    """将CSR矩阵扩展到更大的形状 (新增的行和列为空)，不复制数据数组"""
+    if matrix.shape == (n_rows, n_cols):
+        return matrix
+    indptr = matrix.indptr
+    if n_rows > matrix.shape[0]:
+        indptr = np.concatenate([indptr, np.full(n_rows - matrix.shape[0], indptr[-1], dtype=indptr.dtype)])
+    return csr_matrix((matrix.data, matrix.indices, indptr), shape=(n_rows, n_cols), copy=False)
+
+
+def pad_csc(matrix: csc_matrix, n_rows: int, n_cols: int) -> csc_matrix:
+    """将CSC矩阵扩展到更大的形状 (新增的行和列为空)"""
+    if matrix.shape == (n_rows, n_cols):
+        return matrix
+    indptr = matrix.indptr
+    if n_cols > matrix.shape[1]:
+        indptr = np.concatenate([indptr, np.full(n_cols - matrix.shape[1], indptr[-1], dtype=indptr.dtype)])
+    return csc_matrix((matrix.data, matrix.indices, indptr), shape=(n_rows, n_cols), copy=False)
+
+
+class ModelState(namedtuple('ModelState', [
+    'user_index', 'item_index', 'user_item_matrix', 'delta', 'item_neighbors'
+])):
+    """推荐时读取的一组互相对应的模型数据
+
+    在线更新在副本上构建新的ID映射、矩阵和近邻索引，再整体替换；
+    请求开始时取得一个快照，之后只使用快照中的数据，不会看到更新到一半的状态。
+    """
+
+    def has_changes(self, user_index: int) -> bool:
+        """用户在基础矩阵之后是否有新的行为"""
+        if self.delta is None or user_index >= self.delta.shape[0]:
+            return False
+        return self.delta.indptr[user_index + 1] > self.delta.indptr[user_index]
+
+    def user_rows(self, user_indices) -> csr_matrix:
+        """获取用户的当前交互向量 (基础矩阵 + 增量)"""
+        rows = self.user_item_matrix[user_indices]
+        if self.delta is not None:
+            rows = rows + self.delta[user_indices]
+        return csr_matrix(rows)
+
+
+class OnlineUpdater:
+    """将新的用户行为增量合并到推荐模型中
+
+    新行为通过自增ID水位线从数据库轮询 (可以看到所有进程写入的行为)，
+    本进程内的删除操作 (如取消收藏) 通过 record() 直接记录。
+    行为以增量矩阵的形式叠加在基础用户-物品矩阵上，只重新计算受影响物品的近邻，
+    并使受影响用户的推荐缓存失效；增量过大时再合并到基础矩阵中。
+    轮询到的购买行为同时计入热门排行榜的销量。
+
+    调用 start() 后，轮询和近邻计算在后台线程中每隔 update_interval 秒执行一次，
+    请求线程只读取快照；未启动时 (离线脚本) 由 maybe_update() 在调用线程中同步更新。
+    """
+
+    def __init__(self, recommender, behavior_weights: Dict[str, float], default_weight: float = 1.0,
+                 update_interval: float = 2.0, compact_threshold: int = 200000, poll_batch: int = 10000):
+        """初始化在线更新器
+
+        Args:
+            recommender: 推荐系统实例
+            behavior_weights: 行为类型到权重的映射
+            default_weight: 未知行为类型的权重
+            update_interval: 两次增量更新之间的最短间隔 (秒)
+            compact_threshold: 增量矩阵非零元素超过该值时合并到基础矩阵
+            poll_batch: 每次从数据库读取的最大行为数量
+        """
+        self.recommender = recommender
+        self.behavior_weights = behavior_weights
+        self.default_weight = default_weight
+        self.update_interval = update_interval
+        self.compact_threshold = compact_threshold
+        self.poll_batch = poll_batch
+        self.watermark = None
+        self.delta = None
+        self._events = []
+        self._base_csc = None
+        self._item_norms = None
+        self._last_update = 0.0
+        self._events_lock = threading.Lock()
+        self._update_lock = threading.RLock()
+        # 替换模型数据和读取快照时持有
+        self._state_lock = threading.Lock()
+        self._app = None
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        atexit.register(self.stop)
+
+    def snapshot(self) -> ModelState:
+        """当前模型数据的快照"""
+        rec = self.recommender
+        with self._state_lock:
+            return ModelState(rec.user_index, rec.item_index, rec.user_item_matrix, self.delta, rec.item_neighbors)
+
+    def _publish(self, **changes):
+        """整体替换模型数据 (delta 保存在更新器中，其余保存在推荐系统上)"""
+        with self._state_lock:
+            for name, value in changes.items():
+                setattr(self if name == 'delta' else self.recommender, name, value)
+
+    def start(self, app):
+        """在后台线程中定期执行增量更新
+
+        线程在首次调用 maybe_update() 时启动 (fork 出的子进程中重新启动)。
+
+        Args:
+            app: Flask 应用，后台线程在其应用上下文中访问数据库
+        """
+        self._app = app
+
+    def stop(self):
+        """停止后台更新线程"""
+        self._stop.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout=self.update_interval + 1)
+
+    def _ensure_started(self):
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._events_lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._stop = threading.Event()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='online-updater', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        """后台线程：每隔 update_interval 秒轮询并合并新行为"""
+        while not self._stop.wait(self.update_interval):
+            if self.recommender.user_item_matrix is None:
+                continue
+            with self._app.app_context():
+                try:
+                    self.update()
+                except Exception as e:
+                    print(f"在线更新推荐模型时出错: {str(e)}")
+                finally:
+                    db.session.remove()
+
+    def reset(self, watermark: Optional[int]):
+        """模型重新训练或加载后重置增量状态
+
+        Args:
+            watermark: 基础矩阵已包含的最大行为ID
+        """
+        with self._events_lock:
+            self._events = []
+        self.watermark = watermark
+        self.delta = None
+        self._base_csc = None
+        self._item_norms = None
+
+    def record(self, user_id: int, product_id: int, weight: float):
+        """记录一条本进程内的行为变化 (例如取消收藏时权重为负)"""
+        with self._events_lock:
+            self._events.append((user_id, product_id, weight))
+
+    def maybe_update(self):
+        """已启动后台更新时确保线程在运行；否则距上次更新超过间隔时同步执行一次增量更新"""
+        if self._app is not None:
+            self._ensure_started()
+            return
+        if self.recommender.user_item_matrix is None:
+            return
+        if time.monotonic() - self._last_update < self.update_interval:
+            return
+        self.update()
+
+    def update(self):
+        """轮询新行为并合并到模型中"""
+        if not self._update_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_update = time.monotonic()
+            events = self._poll()
+            with self._events_lock:
+                events.extend(self._events)
+                self._events = []
+            if events:
+                self._apply(events)
+            if self.delta is not None and self.delta.nnz > self.compact_threshold:
+                self.compact()
+        finally:
+            self._update_lock.release()
+
+    def _poll(self) -> List[Tuple[int, int, float]]:
+        """读取水位线之后新增的行为"""
+        query = db.session.query(
+            UserBehavior.id, UserBehavior.user_id, UserBehavior.product_id, UserBehavior.behavior_type
+        ).filter(UserBehavior.user_id.isnot(None), UserBehavior.product_id.isnot(None))
+        if self.watermark is not None:
+            query = query.filter(UserBehavior.id > self.watermark)
+        rows = query.order_by(UserBehavior.id).limit(self.poll_batch).all()
+        if rows:
+            self.watermark = rows[-1][0]
+        for behavior_id, _, product_id, behavior_type in rows:
+            if behavior_type == PURCHASE_BEHAVIOR:
+                self.recommender.record_sale(product_id, 1, behavior_id=behavior_id)
+        return [(user_id, product_id, self.behavior_weights.get(behavior_type, self.default_weight))
+                for _, user_id, product_id, behavior_type in rows]
+
+    def _apply(self, events: List[Tuple[int, int, float]]):
+        """将一批行为叠加到增量矩阵，并更新受影响物品的近邻
+
+        新的ID映射、矩阵和近邻索引都在副本上构建，最后一次性替换。
+        """
+        rec = self.recommender
+
+        # 新用户和新物品追加到ID映射副本的末尾
+        user_index, item_index = rec.user_index.copy(), rec.item_index.copy()
+        user_rows = np.array([user_index.add(e[0]) for e in events], dtype=np.int64)
+        item_cols = np.array([item_index.add(e[1]) for e in events], dtype=np.int64)
+        weights = np.array([e[2] for e in events], dtype=np.float64)
+        n_users, n_items = len(user_index), len(item_index)
+
+        base = pad_csr(rec.user_item_matrix, n_users, n_items)
+        batch = coo_matrix((weights, (user_rows, item_cols)), shape=(n_users, n_items)).tocsr()
+        delta = batch if self.delta is None else pad_csr(self.delta, n_users, n_items) + batch
+
+        affected_items = np.unique(item_cols)
+        neighbors = self._updated_neighbors(base, delta, affected_items)
+
+        self._publish(user_index=user_index, item_index=item_index, user_item_matrix=base, delta=delta,
+                      item_neighbors=neighbors if neighbors is not None else rec.item_neighbors)
+
+        # 使受影响用户的推荐缓存失效
+        for user_id in set(e[0] for e in events):
+            rec.invalidate_user_recommendations(user_id)
+
+    def _updated_neighbors(self, base: csr_matrix, delta: csr_matrix, affected_items: np.ndarray):
+        """只为受影响的物品重新计算top-K近邻"""
+        rec = self.recommender
+        if rec.item_neighbors is None:
+            return None
+        n_users, n_items = base.shape
+        if rec.mode != 'item_knn':
+            # 矩阵分解模式的近邻来自物品因子，在线更新时保持不变
+            return pad_csr(rec.item_neighbors, n_items, n_items)
+
+        # 基础矩阵的列存储和物品向量长度只在首次使用时计算，之后增量维护
+        if self._base_csc is None:
+            self._base_csc = base.tocsc()
+        base_csc = pad_csc(self._base_csc, n_users, n_items)
+        self._base_csc = base_csc
+        if self._item_norms is None:
+            self._item_norms = np.sqrt(np.asarray(base_csc.multiply(base_csc).sum(axis=0)).ravel())
+        if len(self._item_norms) < n_items:
+            self._item_norms = np.concatenate([self._item_norms, np.zeros(n_items - len(self._item_norms))])
+
+        # 受影响物品的当前向量 (物品数 × 用户数)
+        vectors = (base_csc[:, affected_items] + delta.tocsc()[:, affected_items]).T.tocsr()
+        self._item_norms[affected_items] = np.sqrt(np.asarray(vectors.multiply(vectors).sum(axis=1)).ravel())
+        norms = np.where(self._item_norms > 0, self._item_norms, 1.0)
+
+        counts, indices, data = [], [], []
+        block_size = block_size_for(n_items, rec.max_block_bytes)
+        for start in range(0, len(affected_items), block_size):
+            block_rows = affected_items[start:start + block_size]
+            block_vectors = vectors[start:start + block_size]
+            sims = (block_vectors @ base + block_vectors @ delta).toarray().astype(np.float32)
+            sims /= norms[block_rows][:, None] * norms[None, :]
+            block_counts, block_indices, block_data = topk_from_block(sims, block_rows, rec.n_neighbors)
+            counts.append(block_counts)
+            indices.append(block_indices)
+            data.append(block_data)
+
+        new_rows = assemble_neighbors(counts, indices, data, len(affected_items), n_items)
+        return replace_rows(pad_csr(rec.item_neighbors, n_items, n_items), affected_items, new_rows)
+
+    def compact(self):
+        """将增量矩阵合并到基础矩阵中"""
+        rec = self.recommender
+        with self._update_lock:
+            if self.delta is None:
+                return
+            if rec.mode == 'als':
+                # 合并后无法再区分哪些用户有新行为，先为这些用户重新求解因子
+                rec.fold_in_users(np.nonzero(np.diff(self.delta.indptr))[0])
+            merged = (rec.user_item_matrix + self.delta).tocsr()
+            merged.eliminate_zeros()
+            self._publish(user_item_matrix=merged, delta=None)
+            self._base_csc = None
@@ -0,0 +1,104 @@
+# 多进程并行构建物品近邻索引
+# filename: recommendation/parallel.py
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix, issparse
+
+from recommendation.neighbors import (
+    l2_normalize_rows, block_size_for, topk_from_block, assemble_neighbors, DEFAULT_BLOCK_BYTES
+)
+
+# 工作进程中重建的归一化向量 (由进程池的 initializer 设置)
+_worker_vectors = None
+_worker_segments = []
+
+
+def _to_shared(array: np.ndarray, segments: list) -> Tuple[str, tuple, str]:
+    """将数组复制到一块新的共享内存中，返回 (名称, 形状, 类型)"""
+    segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[...] = array
+    segments.append(segment)
+    return segment.name, array.shape, array.dtype.str
+
+
+def _from_shared(spec: Tuple[str, tuple, str]) -> np.ndarray:
+    """在工作进程中映射共享内存中的数组 (不复制)"""
+    name, shape, dtype = spec
+    segment = shared_memory.SharedMemory(name=name)
+    _worker_segments.append(segment)
+    return np.ndarray(shape, dtype=np.dtype(dtype), buffer=segment.buf)
+
+
+def _init_worker(specs: Dict[str, tuple], shape: tuple, sparse: bool):
+    """工作进程初始化：从共享内存重建向量矩阵"""
+    global _worker_vectors
+    if sparse:
+        _worker_vectors = csr_matrix(
+            (_from_shared(specs['data']), _from_shared(specs['indices']), _from_shared(specs['indptr'])),
+            shape=shape, copy=False
+        )
+    else:
+        _worker_vectors = _from_shared(specs['dense'])
+
+
+def _topk_block(task: Tuple[np.ndarray, int]):
+    """计算一个物品块的top-K近邻"""
+    block_rows, k = task
+    sims = _worker_vectors[block_rows] @ _worker_vectors.T
+    sims = sims.toarray() if issparse(sims) else np.array(sims)
+    return topk_from_block(sims.astype(np.float32, copy=False), block_rows, k)
+
+
+def build_topk_neighbors_parallel(vectors, k: int = 50, rows: Optional[Sequence[int]] = None,
+                                  n_jobs: Optional[int] = None,
+                                  max_block_bytes: int = DEFAULT_BLOCK_BYTES) -> csr_matrix:
+    """多进程分块计算余弦相似度，结果与 build_topk_neighbors 相同
+
+    归一化后的向量只放入共享内存一次，各工作进程直接映射，不通过pickle传递矩阵；
+    每个任务只传递物品块的下标，返回该块的top-K结果，最后按块顺序拼接。
+
+    Args:
+        vectors: 物品向量 (物品数 × 维度)，可以是稀疏矩阵或numpy数组
+        k: 每个物品保留的近邻数量
+        rows: 只计算这些物品的近邻，默认计算全部物品
+        n_jobs: 工作进程数，默认为CPU核数
+        max_block_bytes: 单个相似度分块的内存上限 (每个进程)
+
+    Returns:
+        近邻索引 (len(rows) × 物品数 的CSR矩阵)
+    """
+    n_jobs = n_jobs or os.cpu_count() or 1
+    normed = l2_normalize_rows(vectors)
+    n_items = normed.shape[0]
+    row_ids = np.arange(n_items) if rows is None else np.asarray(rows, dtype=np.int64)
+
+    # 块大小同时受内存上限和进程数约束，保证每个进程都有任务
+    block_size = min(block_size_for(n_items, max_block_bytes),
+                     max(1, -(-len(row_ids) // (n_jobs * 4))))
+    tasks = [(row_ids[start:start + block_size], k) for start in range(0, len(row_ids), block_size)]
+
+    segments = []
+    try:
+        sparse = issparse(normed)
+        if sparse:
+            specs = {name: _to_shared(getattr(normed, name), segments) for name in ('data', 'indices', 'indptr')}
+        else:
+            specs = {'dense': _to_shared(np.ascontiguousarray(normed), segments)}
+
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                 initargs=(specs, normed.shape, sparse)) as executor:
+            results = list(executor.map(_topk_block, tasks))
+    finally:
+        for segment in segments:
+            segment.close()
+            segment.unlink()
+
+    counts = [r[0] for r in results]
+    indices = [r[1] for r in results]
+    data = [r[2] for r in results]
+    return assemble_neighbors(counts, indices, data, len(row_ids), n_items)
@@ -0,0 +1,175 @@
+# 热门产品排行榜
+# filename: recommendation/popularity.py
+
+import bisect
+import threading
+import time
+from typing import List, Tuple, Optional
+
+from sqlalchemy import func
+
+from models.models import db, Product, UserReview, ProductSale, UserBehavior
+
+# 计入销量的用户行为类型
+PURCHASE_BEHAVIOR = '购买'
+
+
+class PopularityLeaderboard:
+    """内存中的热门产品排行榜
+
+    排序依据为评分的贝叶斯平均值 (评价较少的产品会向全站平均分收缩)，
+    其次是评价数量和总销量 (销量数据加上用户的购买行为)。新增评价或销量时只调整对应产品在排行中的位置，
+    读取前N名的开销为 O(N)。全站评价数量和评分总和随之更新，全站平均分的变化超过
+    mean_tolerance 时才用新的平均分重新排序全部产品。
+    """
+
+    def __init__(self, prior_weight: float = 5.0, refresh_interval: Optional[float] = 600,
+                 mean_tolerance: float = 0.01):
+        """初始化排行榜
+
+        Args:
+            prior_weight: 贝叶斯平均中先验 (全站平均分) 的权重，相当于虚拟评价数量
+            refresh_interval: 从数据库全量刷新的间隔 (秒)，用于同步其他进程写入的数据
+            mean_tolerance: 全站平均分变化超过该值时重新排序
+        """
+        self.prior_weight = prior_weight
+        self.refresh_interval = refresh_interval
+        self.mean_tolerance = mean_tolerance
+        self._stats = {}      # product_id -> [评价数量, 评分总和, 总销量]
+        self._keys = {}       # product_id -> 当前排序键
+        self._ranking = []    # 按排序键升序排列 (即热度从高到低)
+        self._total_reviews = 0
+        self._total_rating = 0.0
+        self._global_mean = 0.0   # 当前排序键使用的全站平均分
+        self._behavior_watermark = 0  # 全量刷新时已计入销量的最大行为ID
+        self._loaded_at = None
+        self._lock = threading.RLock()
+
+    def refresh(self):
+        """从数据库全量重建排行榜"""
+        review_stats = db.session.query(
+            UserReview.product_id, func.count(UserReview.id), func.sum(UserReview.rating)
+        ).group_by(UserReview.product_id).all()
+        sales_stats = db.session.query(
+            ProductSale.product_id, func.sum(ProductSale.sales_volume)
+        ).group_by(ProductSale.product_id).all()
+        behavior_watermark = db.session.query(func.max(UserBehavior.id)).scalar() or 0
+        purchase_stats = db.session.query(
+            UserBehavior.product_id, func.count(UserBehavior.id)
+        ).filter(
+            UserBehavior.behavior_type == PURCHASE_BEHAVIOR, UserBehavior.id <= behavior_watermark
+        ).group_by(UserBehavior.product_id).all()
+        product_ids = [row[0] for row in db.session.query(Product.id).all()]
+
+        stats = {product_id: [0, 0.0, 0] for product_id in product_ids}
+        for product_id, review_count, rating_sum in review_stats:
+            if product_id in stats:
+                stats[product_id][0] = review_count
+                stats[product_id][1] = float(rating_sum or 0)
+        for product_id, total_sales in sales_stats:
+            if product_id in stats:
+                stats[product_id][2] = int(total_sales or 0)
+        for product_id, purchases in purchase_stats:
+            if product_id in stats:
+                stats[product_id][2] += purchases
+
+        with self._lock:
+            self._stats = stats
+            self._total_reviews = sum(s[0] for s in stats.values())
+            self._total_rating = sum(s[1] for s in stats.values())
+            self._behavior_watermark = behavior_watermark
+            self._rerank()
+            self._loaded_at = time.monotonic()
+
+    def _current_mean(self) -> float:
+        """根据全站评价数量和评分总和计算平均分"""
+        return self._total_rating / self._total_reviews if self._total_reviews else 0.0
+
+    def _rerank(self):
+        """用当前的全站平均分重新计算所有排序键 (调用方持有锁)"""
+        self._global_mean = self._current_mean()
+        self._keys = {product_id: self._sort_key(product_id, s) for product_id, s in self._stats.items()}
+        self._ranking = sorted(self._keys.values())
+
+    def ensure_loaded(self):
+        """首次使用或超过刷新间隔时全量加载"""
+        if self._loaded_at is None or (
+            self.refresh_interval is not None
+            and time.monotonic() - self._loaded_at > self.refresh_interval
+        ):
+            self.refresh()
+
+    def bayesian_rating(self, review_count: int, rating_sum: float) -> float:
+        """计算贝叶斯平均评分"""
+        return (self.prior_weight * self._global_mean + rating_sum) / (self.prior_weight + review_count)
+
+    def _sort_key(self, product_id: int, stat) -> Tuple[float, int, int, int]:
+        review_count, rating_sum, total_sales = stat
+        return (-self.bayesian_rating(review_count, rating_sum), -review_count, -total_sales, product_id)
+
+    def _update(self, product_id: int, review_count: int = 0, rating_sum: float = 0.0, sales: int = 0):
+        """增量更新单个产品的统计数据，并调整其在排行中的位置"""
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            stat = self._stats.setdefault(product_id, [0, 0.0, 0])
+            stat[0] += review_count
+            stat[1] += rating_sum
+            stat[2] += sales
+            self._total_reviews += review_count
+            self._total_rating += rating_sum
+            if review_count and abs(self._current_mean() - self._global_mean) > self.mean_tolerance:
+                self._rerank()
+                return
+
+            old_key = self._keys.get(product_id)
+            if old_key is not None:
+                del self._ranking[bisect.bisect_left(self._ranking, old_key)]
+            new_key = self._sort_key(product_id, stat)
+            self._keys[product_id] = new_key
+            bisect.insort(self._ranking, new_key)
+
+    def record_review(self, product_id: int, rating: int):
+        """记录一条新评价"""
+        self._update(product_id, review_count=1, rating_sum=float(rating or 0))
+
+    def record_sale(self, product_id: int, sales_volume: int, behavior_id: Optional[int] = None):
+        """记录新的销量数据
+
+        Args:
+            product_id: 产品ID
+            sales_volume: 销量
+            behavior_id: 来自购买行为时为行为ID，已在全量刷新中计入的行为会被忽略
+        """
+        if behavior_id is not None and behavior_id <= self._behavior_watermark:
+            return
+        self._update(product_id, sales=int(sales_volume or 0))
+
+    def remove_product(self, product_id: int):
+        """从排行榜中移除产品 (其评价同时从全站平均分中扣除)"""
+        with self._lock:
+            old_key = self._keys.pop(product_id, None)
+            stat = self._stats.pop(product_id, None)
+            if stat is not None:
+                self._total_reviews -= stat[0]
+                self._total_rating -= stat[1]
+            if old_key is not None:
+                del self._ranking[bisect.bisect_left(self._ranking, old_key)]
+            if abs(self._current_mean() - self._global_mean) > self.mean_tolerance:
+                self._rerank()
+
+    def top(self, n: int) -> List[Tuple[int, int, float]]:
+        """获取前N名热门产品
+
+        Returns:
+            (产品ID, 评价数量, 平均评分) 列表
+        """
+        self.ensure_loaded()
+        with self._lock:
+            result = []
+            for key in self._ranking[:n]:
+                product_id = key[3]
+                review_count, rating_sum, _ = self._stats[product_id]
+                avg_rating = rating_sum / review_count if review_count else 0
+                result.append((product_id, review_count, avg_rating))
+            return result
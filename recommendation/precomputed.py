@@ -0,0 +1,149 @@
+# 离线预计算的推荐结果
+# filename: recommendation/precomputed.py
+
+import os
+import time
+from datetime import datetime
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from recommendation import artifacts
+from recommendation.id_map import IdMap
+
+
+def _pad_lists(lists: Sequence[Sequence[int]], width: int) -> np.ndarray:
+    """将长度不一的ID列表补齐为 (行数 × width) 的数组，空位为 -1"""
+    table = np.full((len(lists), width), -1, dtype=np.int64)
+    for i, ids in enumerate(lists):
+        ids = list(ids)[:width]
+        table[i, :len(ids)] = ids
+    return table
+
+
+class PrecomputedStore:
+    """离线批量生成的推荐表，按用户ID或产品ID直接查找
+
+    每个用户的个性化推荐和每个产品的相似产品各保存为一个 (行数 × N) 的
+    内存映射数组，配合 IdMap 定位行。热门和优惠列表变化较快，由实时的排行榜和优惠索引提供，不做预计算。
+    结果超过 max_age 秒视为过期；生成之后被修改或删除的产品所在的行也不再使用，调用方应回退到实时计算。
+    """
+
+    def __init__(self, max_age: Optional[float] = 3600):
+        """初始化存储
+
+        Args:
+            max_age: 结果的最长有效时间 (秒)，None 表示永不过期
+        """
+        self.max_age = max_age
+        self.meta = None
+        self.generated_at = None
+        self._generated_ts = None
+        self._user_index = None
+        self._user_table = None
+        self._product_index = None
+        self._product_table = None
+        self._stale_products = set()
+
+    @property
+    def fresh(self) -> bool:
+        """是否存在未过期的预计算结果"""
+        if self._generated_ts is None:
+            return False
+        return self.max_age is None or time.time() - self._generated_ts <= self.max_age
+
+    @property
+    def width(self) -> int:
+        """每个键保存的推荐数量"""
+        return self.meta['n'] if self.meta else 0
+
+    def load(self, root_dir: str) -> bool:
+        """加载当前版本的预计算结果
+
+        Args:
+            root_dir: 预计算结果根目录
+
+        Returns:
+            是否加载成功
+        """
+        version_dir = artifacts.current_version_dir(root_dir)
+        if version_dir is None:
+            return False
+
+        meta = artifacts.read_meta(version_dir)
+        self._user_index = IdMap(*artifacts.load_id_map_arrays(version_dir, 'user'))
+        self._product_index = IdMap(*artifacts.load_id_map_arrays(version_dir, 'product'))
+        self._user_table = np.load(os.path.join(version_dir, 'user_top.npy'), mmap_mode='r')
+        self._product_table = np.load(os.path.join(version_dir, 'similar_top.npy'), mmap_mode='r')
+        self.meta = meta
+        self.generated_at = datetime.fromisoformat(meta['generated_at'])
+        self._generated_ts = self.generated_at.timestamp()
+        self._stale_products = set()
+        return True
+
+    def clear(self):
+        """丢弃已加载的结果"""
+        self.meta = None
+        self.generated_at = None
+        self._generated_ts = None
+        self._stale_products = set()
+
+    def invalidate_product(self, product_id: int):
+        """产品被修改或删除后，不再使用包含该产品的推荐行 (直到下一次预计算)"""
+        self._stale_products.add(product_id)
+
+    def _lookup(self, index: IdMap, table: np.ndarray, key: int, n: int) -> Optional[List[int]]:
+        idx = index.get(key)
+        if idx is None:
+            return None
+        row = table[idx, :n]
+        ids = row[row >= 0].tolist()
+        if self._stale_products and not self._stale_products.isdisjoint(ids):
+            return None
+        return ids
+
+    def user_items(self, user_id: int, n: int) -> Optional[List[int]]:
+        """用户的个性化推荐产品ID，未命中或已过期时返回None"""
+        if not self.fresh or n > self.width:
+            return None
+        return self._lookup(self._user_index, self._user_table, user_id, n)
+
+    def similar_items(self, product_id: int, n: int) -> Optional[List[int]]:
+        """产品的相似产品ID，未命中或已过期时返回None"""
+        if not self.fresh or n > self.width or product_id in self._stale_products:
+            return None
+        return self._lookup(self._product_index, self._product_table, product_id, n)
+
+    @staticmethod
+    def save(root_dir: str, n: int, user_ids: List[int], user_lists: List[List[int]],
+             product_ids: List[int], similar_lists: List[List[int]], model_version: Optional[str] = None) -> str:
+        """保存一个新版本的预计算结果并设为当前版本
+
+        Args:
+            root_dir: 预计算结果根目录
+            n: 每个键保存的推荐数量
+            user_ids: 用户ID列表
+            user_lists: 与 user_ids 对应的个性化推荐产品ID列表
+            product_ids: 产品ID列表
+            similar_lists: 与 product_ids 对应的相似产品ID列表
+            model_version: 生成结果所用的模型版本
+
+        Returns:
+            新版本目录
+        """
+        os.makedirs(root_dir, exist_ok=True)
+        tmp_dir = artifacts.new_version_dir(root_dir)
+
+        artifacts.save_id_map(tmp_dir, 'user', IdMap(np.array(user_ids, dtype=np.int64)))
+        artifacts.save_id_map(tmp_dir, 'product', IdMap(np.array(product_ids, dtype=np.int64)))
+        np.save(os.path.join(tmp_dir, 'user_top.npy'), _pad_lists(user_lists, n))
+        np.save(os.path.join(tmp_dir, 'similar_top.npy'), _pad_lists(similar_lists, n))
+
+        meta = {
+            'generated_at': datetime.now().isoformat(),
+            'model_version': model_version,
+            'n': n,
+            'n_users': len(user_ids),
+            'n_products': len(product_ids),
+        }
+        return artifacts.publish_version(root_dir, tmp_dir, meta)
@@ -0,0 +1,95 @@
+# 推荐结果的产品信息填充
+# filename: recommendation/product_cards.py
+
+from typing import List, Dict, Any, Iterable, Optional
+
+from models.models import Product
+from recommendation.cache import LRUCache
+
+
+def product_to_card(product: Product) -> Dict[str, Any]:
+    """将产品对象转换为推荐结果中使用的产品卡片字典"""
+    return {
+        'id': product.id,
+        'name': product.name,
+        'brand': product.brand,
+        'price': product.price,
+        'platform': product.platform,
+        'image_url': product.image_url
+    }
+
+
+class ProductCardStore:
+    """产品卡片缓存，批量填充推荐结果中的产品信息"""
+
+    def __init__(self, max_size: int = 10000, ttl: Optional[float] = 600):
+        """初始化产品卡片缓存
+
+        Args:
+            max_size: 最多缓存的产品数量
+            ttl: 缓存过期时间 (秒)，用于兜底其他进程中的产品修改
+        """
+        self._cache = LRUCache(max_size=max_size, ttl=ttl)
+
+    def get_cards(self, product_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """获取一组产品的卡片，未命中缓存的产品通过一次 IN 查询加载
+
+        Args:
+            product_ids: 产品ID列表
+
+        Returns:
+            产品ID到卡片字典的映射 (不存在的产品不会出现在结果中)
+        """
+        cards = {}
+        missing = []
+        for product_id in product_ids:
+            if product_id in cards:
+                continue
+            card = self._cache.get(product_id)
+            if card is None:
+                missing.append(product_id)
+            else:
+                cards[product_id] = card
+
+        if missing:
+            for product in Product.query.filter(Product.id.in_(missing)).all():
+                card = product_to_card(product)
+                self._cache.set(product.id, card)
+                cards[product.id] = card
+
+        return cards
+
+    def hydrate(self, product_ids: List[int], recommendation_type: str,
+                extras: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """按推荐顺序生成推荐结果列表
+
+        Args:
+            product_ids: 按排名排序的产品ID列表
+            recommendation_type: 推荐类型描述
+            extras: 与 product_ids 一一对应的附加字段
+
+        Returns:
+            推荐产品列表，已删除的产品会被跳过
+        """
+        cards = self.get_cards(product_ids)
+
+        result = []
+        for i, product_id in enumerate(product_ids):
+            card = cards.get(product_id)
+            if card is None:
+                continue
+            item = dict(card)
+            if extras is not None:
+                item.update(extras[i])
+            item['recommendation_type'] = recommendation_type
+            result.append(item)
+
+        return result
+
+    def invalidate(self, product_id: int):
+        """使某个产品的卡片缓存失效"""
+        self._cache.delete(product_id)
+
+    def clear(self):
+        """清空全部卡片缓存"""
+        self._cache.clear()
@@ -2,142 +2,448 @@
 # filename: recommendation/recommender.py
 
 import numpy as np
-import pandas as pd
-from sklearn.metrics.pairwise import cosine_similarity
 from scipy.sparse import csr_matrix
-from sqlalchemy import func, or_
+from sqlalchemy import func, select
 from typing import List, Dict, Any, Tuple, Optional
-import json
 import os
-from datetime import datetime, timedelta
+from datetime import datetime
 
 # 导入数据库模型
-from models.models import db, Product, UserBehavior, UserReview, ProductSale, PlatformDiscount
+from models.models import db, Product, UserBehavior
+from recommendation.neighbors import build_topk_neighbors, ranked_neighbors, replace_rows, block_size_for, DEFAULT_BLOCK_BYTES
+from recommendation.als import ImplicitALS
+from recommendation.ann import RandomProjectionLSH, build_lsh_neighbors
+from recommendation.parallel import build_topk_neighbors_parallel
+from recommendation.features import ItemFeatureStore
+from recommendation.content_index import ContentIndex
+from recommendation.id_map import IdMap
+from recommendation import artifacts
+from recommendation.online import OnlineUpdater
+from recommendation.cache import LRUCache
+from recommendation.product_cards import ProductCardStore
+from recommendation.popularity import PopularityLeaderboard
+from recommendation.discounts import DiscountIndex
+from recommendation.precomputed import PrecomputedStore
+
+# 不同用户行为的权重
+BEHAVIOR_WEIGHTS = {
+    '浏览': 1.0,
+    '收藏': 2.0,
+    '加购': 3.0,
+    '购买': 5.0
+}
+DEFAULT_BEHAVIOR_WEIGHT = 1.0
+
+# 物品数量不少于该值时才启用多进程计算近邻 (进程启动的开销较大)
+PARALLEL_MIN_ITEMS = 5000
 
 class ProductRecommender:
     """产品推荐系统，提供多种推荐算法"""
     
-    def __init__(self):
-        """初始化推荐系统"""
+    def __init__(self, n_neighbors: int = 50, max_block_bytes: int = DEFAULT_BLOCK_BYTES,
+                 similarity_backend: str = 'exact', ann_params: Optional[Dict[str, Any]] = None,
+                 mode: str = 'item_knn', als_params: Optional[Dict[str, Any]] = None, n_jobs: int = 1):
+        """初始化推荐系统
+        
+        Args:
+            n_neighbors: 近邻索引中每个物品保留的相似物品数量
+            max_block_bytes: 分块计算相似度时单个分块的内存上限
+            similarity_backend: 近邻索引的构建方式，'exact' 为精确计算，'lsh' 为随机投影近似最近邻
+            ann_params: 近似最近邻的参数 (n_tables, n_bits, n_probes, max_candidates)
+            mode: 个性化推荐算法，'item_knn' 为物品近邻协同过滤，'als' 为隐式反馈矩阵分解
+            als_params: 矩阵分解的参数 (factors, regularization, alpha, iterations, n_jobs)
+            n_jobs: 精确计算近邻索引时使用的进程数，大于1时按物品分块多进程并行
+        """
+        if similarity_backend not in ('exact', 'lsh'):
+            raise ValueError(f"未知的相似度计算方式: {similarity_backend}")
+        if mode not in ('item_knn', 'als'):
+            raise ValueError(f"未知的推荐算法: {mode}")
+        self.mode = mode
+        self.als = ImplicitALS(**(als_params or {}))
+        self.n_neighbors = n_neighbors
+        self.n_jobs = n_jobs
+        self.similarity_backend = similarity_backend
+        self.ann_params = ann_params or {}
+        self.model_version = None
+        self.max_block_bytes = max_block_bytes
         self.user_item_matrix = None
-        self.item_similarity_matrix = None
+        self.item_neighbors = None
+        self.content_neighbors = None
+        # 特征变更后未变更物品的内容近邻是否需要重建 (下次训练时重建)
+        self.content_neighbors_stale = False
+        # LSH后端下内容特征的索引，产品修改后只更新变更物品的桶编码
+        self.content_lsh = None
         self.item_features_matrix = None
-        self.item_ids = []
-        self.user_ids = []
+        self.user_factors = None
+        self.item_factors = None
+        self._item_gram = None
+        self.item_index = IdMap([])
+        self.user_index = IdMap([])
+        
+        # 推荐结果的产品卡片缓存
+        self.product_cards = ProductCardStore()
+        
+        # 热门产品排行榜
+        self.popularity = PopularityLeaderboard()
+        
+        # 有效优惠索引
+        self.discount_index = DiscountIndex()
+        
+        # 物品内容特征
+        self.feature_store = ItemFeatureStore()
+        
+        # 基于内容的相似产品索引
+        self.content_index = ContentIndex()
+        
+        # 新用户行为的在线增量更新，以及用户推荐结果缓存
+        self.online = OnlineUpdater(self, BEHAVIOR_WEIGHTS, DEFAULT_BEHAVIOR_WEIGHT)
+        self.recommendation_cache = LRUCache(max_size=10000, ttl=300)
+        
+        # 离线预计算的推荐表
+        self.precomputed = PrecomputedStore()
+    
+    @property
+    def user_ids(self) -> np.ndarray:
+        """按矩阵行下标排列的用户ID (加载的模型中为内存映射数组)"""
+        return self.user_index.all_ids()
+    
+    @property
+    def item_ids(self) -> np.ndarray:
+        """按矩阵列下标排列的产品ID (加载的模型中为内存映射数组)"""
+        return self.item_index.all_ids()
     
     def train_model(self):
-        """训练推荐模型，构建用户-物品矩阵和物品相似度矩阵"""
-        # 获取所有用户行为数据
-        behaviors = UserBehavior.query.all()
+        """训练推荐模型，构建用户-物品矩阵和物品近邻索引"""
+        # 以列的形式获取所有用户行为数据 (记录水位线，之后的新行为通过在线更新合并)
+        watermark = db.session.query(func.max(UserBehavior.id)).scalar()
+        user_col, item_col, type_col = self._load_behavior_columns(watermark)
         
         # 如果没有足够的数据，则不训练模型
-        if len(behaviors) < 10:
+        if len(user_col) < 10:
             print("数据不足，无法训练模型")
             return
         
         # 构建用户-物品矩阵
-        user_ids = sorted(list(set([b.user_id for b in behaviors])))
-        item_ids = sorted(list(set([b.product_id for b in behaviors])))
-        
-        # 保存ID映射
-        self.user_ids = user_ids
-        self.item_ids = item_ids
-        
-        # 创建用户-物品交互矩阵
-        user_item_data = []
-        for b in behaviors:
-            # 根据行为类型赋予不同权重
-            weight = 1.0
-            if b.behavior_type == '浏览':
-                weight = 1.0
-            elif b.behavior_type == '收藏':
-                weight = 2.0
-            elif b.behavior_type == '加购':
-                weight = 3.0
-            elif b.behavior_type == '购买':
-                weight = 5.0
-            
-            user_idx = user_ids.index(b.user_id)
-            item_idx = item_ids.index(b.product_id)
-            user_item_data.append((user_idx, item_idx, weight))
+        self.user_item_matrix = self._build_user_item_matrix(user_col, item_col, type_col)
         
-        # 创建稀疏矩阵
-        rows, cols, data = zip(*user_item_data) if user_item_data else ([], [], [])
-        self.user_item_matrix = csr_matrix((data, (rows, cols)), shape=(len(user_ids), len(item_ids)))
+        if self.mode == 'als':
+            # 矩阵分解得到用户和物品因子，相似产品使用物品因子的余弦近邻
+            self.user_factors, self.item_factors = self.als.fit(self.user_item_matrix)
+            self._item_gram = None
+            item_vectors = self.item_factors
+        else:
+            item_vectors = self.user_item_matrix.T.tocsr()
         
-        # 计算物品相似度矩阵
-        if len(item_ids) > 1:
-            self.item_similarity_matrix = cosine_similarity(self.user_item_matrix.T)
+        # 计算物品近邻索引 (只保留每个物品的top-K相似物品)
+        if len(self.item_index) > 1:
+            self.item_neighbors = self._build_neighbors(item_vectors)
         
         # 构建物品特征矩阵
         self._build_item_features_matrix()
         
-        print(f"模型训练完成: {len(user_ids)}个用户, {len(item_ids)}个物品")
+        self.online.reset(watermark)
+        self.recommendation_cache.clear()
+        self.precomputed.clear()
+        
+        print(f"模型训练完成: {len(self.user_index)}个用户, {len(self.item_index)}个物品")
+    
+    def _load_behavior_columns(self, watermark: Optional[int] = None,
+                               chunk_size: int = 50000) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """从数据库中流式读取 (user_id, product_id, behavior_type) 元组，并按列返回
+        
+        Args:
+            watermark: 只读取ID不超过该值的行为
+            chunk_size: 每次从游标读取的行数
+            
+        Returns:
+            用户ID、产品ID和行为类型三列数组
+        """
+        statement = select(UserBehavior.user_id, UserBehavior.product_id, UserBehavior.behavior_type).where(
+            UserBehavior.user_id.isnot(None), UserBehavior.product_id.isnot(None)
+        )
+        if watermark is not None:
+            statement = statement.where(UserBehavior.id <= watermark)
+        result = db.session.execute(statement)
+        
+        user_chunks, item_chunks, type_chunks = [], [], []
+        while True:
+            rows = result.fetchmany(chunk_size)
+            if not rows:
+                break
+            users, items, types = zip(*rows)
+            user_chunks.append(np.fromiter(users, dtype=np.int64, count=len(rows)))
+            item_chunks.append(np.fromiter(items, dtype=np.int64, count=len(rows)))
+            type_chunks.append(np.array(types, dtype=object))
+        
+        if not user_chunks:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=object)
+        
+        return np.concatenate(user_chunks), np.concatenate(item_chunks), np.concatenate(type_chunks)
+    
+    def _build_user_item_matrix(self, user_col: np.ndarray, item_col: np.ndarray,
+                                type_col: np.ndarray) -> csr_matrix:
+        """根据行为数据列一次性构建用户-物品稀疏矩阵，并保存ID映射
+        
+        Args:
+            user_col: 用户ID列
+            item_col: 产品ID列
+            type_col: 行为类型列
+            
+        Returns:
+            用户-物品交互矩阵 (CSR格式)
+        """
+        # 通过 np.unique 同时得到有序ID列表和每行对应的矩阵下标
+        user_ids, rows = np.unique(user_col, return_inverse=True)
+        item_ids, cols = np.unique(item_col, return_inverse=True)
+        
+        # 保存ID映射 (在线更新新增的ID由 IdMap 自行追加，不复制为列表)
+        self.user_index = IdMap(user_ids, user_ids, np.arange(len(user_ids)))
+        self.item_index = IdMap(item_ids, item_ids, np.arange(len(item_ids)))
+        
+        # 根据行为类型赋予不同权重：先对行为类型编码，再通过查找表向量化映射
+        behavior_types, type_codes = np.unique(type_col, return_inverse=True)
+        weight_table = np.array([BEHAVIOR_WEIGHTS.get(t, DEFAULT_BEHAVIOR_WEIGHT) for t in behavior_types],
+                                dtype=np.float64)
+        data = weight_table[type_codes]
+        
+        # 创建稀疏矩阵 (重复的用户-物品对会被累加)
+        return csr_matrix((data, (rows, cols)), shape=(len(user_ids), len(item_ids)))
     
     def _build_item_features_matrix(self):
         """构建物品特征矩阵，用于基于内容的推荐"""
-        if not self.item_ids:
+        if not len(self.item_index):
             return
         
-        # 获取所有产品信息
-        products = Product.query.filter(Product.id.in_(self.item_ids)).all()
-        
-        # 提取产品特征
-        features = []
-        for product_id in self.item_ids:
-            product = next((p for p in products if p.id == product_id), None)
-            if not product:
-                # 如果找不到产品，使用零向量
-                features.append(np.zeros(10))
-                continue
-            
-            # 提取产品特征
-            feature_vector = []
-            
-            # 类别特征 (one-hot编码)
-            category_id = product.category_id or 0
-            category_feature = [0, 0, 0]  # 假设有3个类别
-            if 1 <= category_id <= 3:
-                category_feature[category_id - 1] = 1
-            feature_vector.extend(category_feature)
-            
-            # 价格特征 (归一化)
-            max_price = max([p.price for p in products if p.price is not None] or [1])
-            price_feature = product.price / max_price if product.price else 0
-            feature_vector.append(price_feature)
-            
-            # 平台特征 (one-hot编码)
-            platforms = list(set([p.platform for p in products if p.platform]))
-            platform_feature = [0] * len(platforms)
-            if product.platform in platforms:
-                platform_feature[platforms.index(product.platform)] = 1
-            feature_vector.extend(platform_feature)
+        # 全量加载产品特征列 (每个产品的规格只解析一次)
+        self.feature_store.load()
+        self.item_features_matrix = self.feature_store.feature_matrix(self.item_ids)
+        
+        # 计算基于内容的物品近邻索引
+        self.content_lsh = None
+        if len(self.item_index) > 1:
+            self.content_neighbors = self._build_content_neighbors()
+        self.content_neighbors_stale = False
+    
+    def _build_neighbors(self, vectors, rows: Optional[List[int]] = None):
+        """按配置的方式构建top-K近邻索引
+        
+        Args:
+            vectors: 物品向量 (物品数 × 维度)
+            rows: 只计算这些物品的近邻，默认计算全部物品
             
-            # 规格特征
-            specs = product.specifications
-            # 提取一些通用特征，如内存、存储等
-            memory = specs.get('内存', 0)
-            if isinstance(memory, str):
-                memory = float(''.join(filter(str.isdigit, memory))) if any(c.isdigit() for c in memory) else 0
-            feature_vector.append(memory / 16)  # 假设最大16GB
+        Returns:
+            近邻索引 (CSR矩阵)
+        """
+        if self.similarity_backend == 'lsh':
+            return build_lsh_neighbors(vectors, self.n_neighbors, rows=rows, **self.ann_params)
+        n_rows = vectors.shape[0] if rows is None else len(rows)
+        if self.n_jobs > 1 and n_rows >= PARALLEL_MIN_ITEMS:
+            return build_topk_neighbors_parallel(vectors, self.n_neighbors, rows=rows, n_jobs=self.n_jobs,
+                                                 max_block_bytes=self.max_block_bytes)
+        return build_topk_neighbors(vectors, self.n_neighbors, rows=rows, max_block_bytes=self.max_block_bytes)
+    
+    def _build_content_neighbors(self, rows: Optional[List[int]] = None):
+        """构建内容特征的近邻索引
+        
+        LSH后端保留内容特征的索引：只计算部分物品时 (产品被修改)，
+        只为这些物品重新计算桶编码，不重新建立整个索引。
+        
+        Args:
+            rows: 只计算这些物品的近邻，默认计算全部物品
             
-            storage = specs.get('存储', 0)
-            if isinstance(storage, str):
-                storage = float(''.join(filter(str.isdigit, storage))) if any(c.isdigit() for c in storage) else 0
-            feature_vector.append(storage / 1024)  # 假设最大1TB
+        Returns:
+            近邻索引 (CSR矩阵)
+        """
+        if self.similarity_backend != 'lsh':
+            return self._build_neighbors(self.item_features_matrix, rows=rows)
+        if rows is None or self.content_lsh is None:
+            # 从模型目录加载后索引尚未建立，首次修改产品时建立一次
+            self.content_lsh = RandomProjectionLSH(**self.ann_params).fit(self.item_features_matrix)
+        else:
+            self.content_lsh.update(self.item_features_matrix, rows)
+        return self.content_lsh.neighbors(self.n_neighbors, rows=rows, max_block_bytes=self.max_block_bytes)
+    
+    def refresh_item_features(self):
+        """只为变更过的产品重新提取特征，并更新它们的内容近邻
+        
+        在管理后台的请求中调用，只计算变更产品所在的行。归一化参数或特征维度变化时，
+        其他物品的近邻也会改变，但不在请求中全量重建 (O(N²))，而是标记为过期，
+        由下一次训练 (train_recommender.py) 重建。
+        """
+        if self.item_features_matrix is None:
+            return
+        
+        changed = self.feature_store.refresh()
+        if not changed:
+            return
+        
+        old_schema = list(self.feature_store.schema)
+        old_features = self.item_features_matrix
+        self.item_features_matrix = self.feature_store.feature_matrix(self.item_ids)
+        if self.content_neighbors is None:
+            return
+        
+        changed_rows = [self.item_index[p] for p in changed if p in self.item_index]
+        if changed_rows:
+            new_rows = self._build_content_neighbors(rows=changed_rows)
+            self.content_neighbors = replace_rows(self.content_neighbors, changed_rows, new_rows)
+        
+        unchanged_rows = np.setdiff1d(np.arange(len(self.item_index)), changed_rows)
+        if not self.content_neighbors_stale and (
+                self.feature_store.schema != old_schema or
+                old_features.shape != self.item_features_matrix.shape or
+                not np.array_equal(old_features[unchanged_rows], self.item_features_matrix[unchanged_rows])):
+            self.content_neighbors_stale = True
+            print("物品特征的归一化参数已变化，其他物品的内容近邻将在下次训练时重建")
+    
+    def save_model(self, artifact_dir: str) -> Optional[str]:
+        """将训练好的模型保存为新的版本目录，并将其设为当前版本
+        
+        Args:
+            artifact_dir: 模型根目录
             
-            # 确保特征向量长度一致
-            while len(feature_vector) < 10:
-                feature_vector.append(0)
+        Returns:
+            新版本目录，模型未训练时返回None
+        """
+        if self.user_item_matrix is None:
+            return None
+        
+        # 先合并增量行为，使保存的矩阵与行为水位线一致
+        self.online.compact()
+        
+        os.makedirs(artifact_dir, exist_ok=True)
+        tmp_dir = artifacts.new_version_dir(artifact_dir)
+        
+        meta = {
+            'created_at': datetime.now().isoformat(),
+            'n_users': len(self.user_index),
+            'n_items': len(self.item_index),
+            'n_neighbors': self.n_neighbors,
+            'similarity_backend': self.similarity_backend,
+            'mode': self.mode,
+            'feature_schema': self.feature_store.schema,
+            'behavior_watermark': self.online.watermark,
+            'matrices': {}
+        }
+        artifacts.save_id_map(tmp_dir, 'user', self.user_index)
+        artifacts.save_id_map(tmp_dir, 'item', self.item_index)
+        for name in ('user_item_matrix', 'item_neighbors', 'content_neighbors'):
+            matrix = getattr(self, name)
+            if matrix is not None:
+                meta['matrices'][name] = artifacts.save_csr(tmp_dir, name, matrix.tocsr())
+        if self.item_features_matrix is not None:
+            np.save(os.path.join(tmp_dir, 'item_features.npy'), self.item_features_matrix)
+        if self.mode == 'als':
+            np.save(os.path.join(tmp_dir, 'user_factors.npy'), self.user_factors)
+            np.save(os.path.join(tmp_dir, 'item_factors.npy'), self.item_factors)
+        
+        version_dir = artifacts.publish_version(artifact_dir, tmp_dir, meta)
+        print(f"模型已保存: {version_dir}")
+        return version_dir
+    
+    def load_model(self, artifact_dir: str, mmap: bool = True) -> bool:
+        """加载当前版本的模型
+        
+        数组以内存映射方式打开，多个工作进程共享同一份页缓存，无需重新训练。
+        
+        Args:
+            artifact_dir: 模型根目录
+            mmap: 是否使用内存映射 (只读)
             
-            features.append(feature_vector[:10])  # 截断或填充到10维
+        Returns:
+            是否加载成功
+        """
+        version_dir = artifacts.current_version_dir(artifact_dir)
+        if version_dir is None:
+            return False
+        
+        meta = artifacts.read_meta(version_dir)
+        mmap_mode = 'r' if mmap else None
+        
+        user_ids, user_sorted, user_order = artifacts.load_id_map_arrays(version_dir, 'user', mmap_mode)
+        item_ids, item_sorted, item_order = artifacts.load_id_map_arrays(version_dir, 'item', mmap_mode)
+        self.user_index = IdMap(user_ids, user_sorted, user_order)
+        self.item_index = IdMap(item_ids, item_sorted, item_order)
+        
+        for name in ('user_item_matrix', 'item_neighbors', 'content_neighbors'):
+            matrix_meta = meta['matrices'].get(name)
+            setattr(self, name, artifacts.load_csr(version_dir, name, matrix_meta, mmap_mode) if matrix_meta else None)
+        
+        features_path = os.path.join(version_dir, 'item_features.npy')
+        self.item_features_matrix = np.load(features_path, mmap_mode=mmap_mode) if os.path.exists(features_path) else None
+        self.feature_store.schema = list(meta.get('feature_schema') or [])
+        
+        # 以训练时的算法为准
+        self.mode = meta.get('mode', 'item_knn')
+        if self.mode == 'als':
+            self.user_factors = np.load(os.path.join(version_dir, 'user_factors.npy'), mmap_mode=mmap_mode)
+            self.item_factors = np.load(os.path.join(version_dir, 'item_factors.npy'), mmap_mode=mmap_mode)
+        else:
+            self.user_factors = self.item_factors = None
+        self._item_gram = None
+        self.content_neighbors_stale = False
+        self.content_lsh = None
+        self.model_version = meta['version']
+        self.online.reset(meta.get('behavior_watermark'))
+        self.recommendation_cache.clear()
+        
+        print(f"模型已加载: 版本 {self.model_version}, {len(self.user_index)}个用户, {len(self.item_index)}个物品")
+        return True
+    
+    def precompute(self, root_dir: str, n: int = 20, batch_size: int = 1024) -> str:
+        """批量预计算所有用户的个性化推荐和所有产品的相似产品 (热门和优惠列表始终实时计算)
         
-        # 转换为numpy数组
-        self.item_features_matrix = np.array(features)
+        Args:
+            root_dir: 预计算结果根目录
+            n: 每个用户/产品保存的推荐数量
+            batch_size: 批量计算用户推荐时每批的用户数量
+            
+        Returns:
+            新版本目录
+        """
+        user_ids = self.user_ids.tolist()
+        recommended_ids = self._recommend_ids_batch(user_ids, n, batch_size)
+        user_lists = [recommended_ids.get(user_id, []) for user_id in user_ids]
+        
+        product_ids = [row[0] for row in db.session.query(Product.id).order_by(Product.id).all()]
+        similar_lists = [self._similar_product_ids(product_id, n) for product_id in product_ids]
+        
+        version_dir = PrecomputedStore.save(
+            root_dir, n, user_ids, user_lists, product_ids, similar_lists,
+            model_version=self.model_version
+        )
+        self.precomputed.load(root_dir)
+        print(f"推荐结果预计算完成: {len(user_ids)}个用户, {len(product_ids)}个产品")
+        return version_dir
+    
+    def load_precomputed(self, root_dir: str, max_age: Optional[float] = None) -> bool:
+        """加载离线预计算的推荐表
         
-        # 计算基于内容的物品相似度
-        if len(self.item_ids) > 1:
-            self.content_similarity_matrix = cosine_similarity(self.item_features_matrix)
+        Args:
+            root_dir: 预计算结果根目录
+            max_age: 结果的最长有效时间 (秒)，默认保持当前设置
+            
+        Returns:
+            是否加载成功
+        """
+        if max_age is not None:
+            self.precomputed.max_age = max_age
+        return self.precomputed.load(root_dir)
+    
+    def _similar_product_ids(self, product_id: int, n: int) -> List[int]:
+        """相似产品ID：协同过滤近邻在前，不足时用同类别的内容相似产品补充"""
+        similar_ids = []
+        state = self.online.snapshot()
+        if state.item_neighbors is not None and product_id in state.item_index:
+            item_idx = state.item_index[product_id]
+            if item_idx < state.item_neighbors.shape[0]:
+                similar_item_indices, _ = ranked_neighbors(state.item_neighbors, item_idx, n)
+                similar_ids = state.item_index.ids_at(similar_item_indices).tolist()
+        if len(similar_ids) < n:
+            seen = set(similar_ids)
+            content_ids = self.content_index.similar(product_id, n - len(similar_ids)) or []
+            similar_ids.extend(pid for pid in content_ids if pid not in seen)
+        return similar_ids[:n]
     
     def get_user_recommendations(self, user_id: int, n: int = 5) -> List[Dict[str, Any]]:
         """基于协同过滤为用户推荐产品
@@ -149,56 +455,200 @@ class ProductRecommender:
         Returns:
             推荐产品列表
         """
+        # 合并最近的用户行为 (启动后台更新后只确认更新线程在运行)，之后只读取同一个快照
+        self.online.maybe_update()
+        state = self.online.snapshot()
+        
+        # 用户没有新行为时直接使用离线预计算的结果
+        user_idx = state.user_index.get(user_id)
+        if user_idx is None or not state.has_changes(user_idx):
+            precomputed_ids = self.precomputed.user_items(user_id, n)
+            if precomputed_ids is not None:
+                return self._fill_with_popular(self.product_cards.hydrate(precomputed_ids, '个性化推荐'), n)
+        
         # 如果模型未训练，返回热门产品
-        if self.user_item_matrix is None or user_id not in self.user_ids:
+        if not self._is_trained() or user_idx is None:
             return self.get_popular_products(n)
         
-        # 获取用户索引
-        user_idx = self.user_ids.index(user_id)
-        
-        # 获取用户已交互的物品
-        user_interactions = self.user_item_matrix[user_idx].toarray().flatten()
-        interacted_items = set(np.where(user_interactions > 0)[0])
-        
-        # 计算推荐分数
-        scores = np.zeros(len(self.item_ids))
-        
-        # 对于用户交互过的每个物品
-        for item_idx in interacted_items:
-            # 获取相似物品
-            similar_items = self.item_similarity_matrix[item_idx]
-            # 加权计算推荐分数
-            scores += similar_items * user_interactions[item_idx]
-        
-        # 将已交互的物品分数设为0
-        scores[list(interacted_items)] = 0
-        
-        # 获取分数最高的n个物品
-        recommended_item_indices = np.argsort(scores)[-n:][::-1]
-        recommended_item_ids = [self.item_ids[idx] for idx in recommended_item_indices]
-        
-        # 获取推荐产品详情
-        recommended_products = []
-        for product_id in recommended_item_ids:
-            product = Product.query.get(product_id)
-            if product:
-                recommended_products.append({
-                    'id': product.id,
-                    'name': product.name,
-                    'brand': product.brand,
-                    'price': product.price,
-                    'platform': product.platform,
-                    'image_url': product.image_url,
-                    'recommendation_type': '个性化推荐'
-                })
-        
-        # 如果推荐数量不足，补充热门产品
-        if len(recommended_products) < n:
-            popular_products = self.get_popular_products(n - len(recommended_products))
-            recommended_products.extend(popular_products)
-        
+        cached = self.recommendation_cache.get(user_id)
+        if cached is not None and cached[0] == n:
+            return cached[1]
+        
+        # 获取用户已交互的物品 (包括尚未合并到基础矩阵的增量行为)
+        user_row = state.user_rows([user_idx])
+        
+        if self.mode == 'als':
+            # 计算推荐分数：用户因子与物品因子表的一次点积
+            recommended_item_indices = self._rank_factor_scores(state, [user_idx], user_row, n)[0]
+        else:
+            # 计算推荐分数：用户行向量与近邻索引的一次稀疏乘法，结果只包含候选物品
+            candidates = user_row @ state.item_neighbors
+            recommended_item_indices = self._rank_candidates(
+                candidates.indices, candidates.data, user_row.indices, n
+            )
+        recommended_item_ids = state.item_index.ids_at(recommended_item_indices).tolist()
+        
+        # 获取推荐产品详情，数量不足时补充热门产品
+        recommended_products = self._fill_with_popular(
+            self.product_cards.hydrate(recommended_item_ids, '个性化推荐'), n
+        )
+        
+        self.recommendation_cache.set(user_id, (n, recommended_products))
         return recommended_products
     
+    def get_user_recommendations_batch(self, user_ids: List[int], n: int = 5,
+                                       batch_size: int = 1024) -> Dict[int, List[Dict[str, Any]]]:
+        """批量为多个用户生成推荐，用于离线预计算首页推荐
+        
+        Args:
+            user_ids: 用户ID列表
+            n: 每个用户的推荐数量
+            batch_size: 每次稀疏矩阵乘法包含的用户数量
+            
+        Returns:
+            用户ID到推荐产品列表的映射
+        """
+        recommended_ids = self._recommend_ids_batch(user_ids, n, batch_size)
+        
+        # 一次查询填充所有推荐产品的信息
+        self.product_cards.get_cards({pid for ids in recommended_ids.values() for pid in ids})
+        popular_products = None
+        
+        result = {}
+        for user_id in user_ids:
+            products = self.product_cards.hydrate(recommended_ids.get(user_id, []), '个性化推荐')
+            
+            # 如果推荐数量不足，补充热门产品
+            if len(products) < n:
+                if popular_products is None:
+                    popular_products = self.get_popular_products(n)
+                products.extend(popular_products[:n - len(products)])
+            result[user_id] = products
+        
+        return result
+    
+    def _recommend_ids_batch(self, user_ids: List[int], n: int, batch_size: int = 1024) -> Dict[int, List[int]]:
+        """批量计算用户的个性化推荐产品ID (不含热门产品补充)
+        
+        Args:
+            user_ids: 用户ID列表
+            n: 每个用户的推荐数量
+            batch_size: 每次稀疏矩阵乘法包含的用户数量
+            
+        Returns:
+            模型中已知用户的ID到推荐产品ID列表的映射
+        """
+        self.online.maybe_update()
+        state = self.online.snapshot()
+        
+        recommended_ids = {}
+        if self._is_trained():
+            known_users = [user_id for user_id in user_ids if user_id in state.user_index]
+            if self.mode == 'als':
+                # 稠密分数矩阵 (用户数 × 物品数) 受分块内存上限约束
+                batch_size = min(batch_size, block_size_for(len(state.item_index), self.max_block_bytes))
+            for start in range(0, len(known_users), batch_size):
+                batch_users = known_users[start:start + batch_size]
+                batch_indices = [state.user_index[u] for u in batch_users]
+                user_rows = state.user_rows(batch_indices)
+                
+                if self.mode == 'als':
+                    ranked = self._rank_factor_scores(state, batch_indices, user_rows, n)
+                    for user_id, item_indices in zip(batch_users, ranked):
+                        recommended_ids[user_id] = state.item_index.ids_at(item_indices).tolist()
+                    continue
+                
+                # 一次稀疏矩阵乘法为整批用户打分
+                candidates = (user_rows @ state.item_neighbors).tocsr()
+                for i, user_id in enumerate(batch_users):
+                    c_start, c_end = candidates.indptr[i], candidates.indptr[i + 1]
+                    s_start, s_end = user_rows.indptr[i], user_rows.indptr[i + 1]
+                    item_indices = self._rank_candidates(
+                        candidates.indices[c_start:c_end], candidates.data[c_start:c_end],
+                        user_rows.indices[s_start:s_end], n
+                    )
+                    recommended_ids[user_id] = state.item_index.ids_at(item_indices).tolist()
+        
+        return recommended_ids
+    
+    def _fill_with_popular(self, products: List[Dict[str, Any]], n: int) -> List[Dict[str, Any]]:
+        """推荐数量不足n个时补充热门产品"""
+        if len(products) < n:
+            products.extend(self.get_popular_products(n - len(products)))
+        return products
+    
+    @staticmethod
+    def _rank_candidates(item_indices: np.ndarray, scores: np.ndarray,
+                         seen_items: np.ndarray, n: int) -> np.ndarray:
+        """从候选物品中排除已交互的物品，并选出分数最高的n个
+        
+        Args:
+            item_indices: 候选物品下标
+            scores: 候选物品分数
+            seen_items: 用户已交互的物品下标
+            n: 推荐数量
+            
+        Returns:
+            按分数从高到低排序的物品下标
+        """
+        mask = (scores > 0) & ~np.isin(item_indices, seen_items)
+        item_indices, scores = item_indices[mask], scores[mask]
+        if len(scores) > n:
+            top = np.argpartition(-scores, n - 1)[:n]
+            item_indices, scores = item_indices[top], scores[top]
+        return item_indices[np.lexsort((item_indices, -scores))]
+    
+    def _is_trained(self) -> bool:
+        """当前算法所需的个性化模型是否可用"""
+        if self.mode == 'als':
+            return self.item_factors is not None
+        return self.item_neighbors is not None
+    
+    def _user_factor(self, state, user_idx: int, user_row) -> np.ndarray:
+        """获取用户因子；用户有训练后的新行为时，固定物品因子即时重新求解"""
+        if user_idx < len(self.user_factors) and not state.has_changes(user_idx):
+            return self.user_factors[user_idx]
+        if self._item_gram is None:
+            self._item_gram = self.als.gram_matrix(self.item_factors)
+        return self.als.recalculate_user(user_row, self.item_factors, self._item_gram)
+    
+    def fold_in_users(self, user_indices: np.ndarray):
+        """将用户的最新行为折叠进用户因子表 (在线增量合并到基础矩阵之前调用)
+        
+        Args:
+            user_indices: 有新行为的用户下标
+        """
+        if self.user_factors is None or len(user_indices) == 0:
+            return
+        state = self.online.snapshot()
+        factors = np.zeros((len(state.user_index), self.user_factors.shape[1]), dtype=np.float32)
+        factors[:len(self.user_factors)] = self.user_factors
+        user_rows = state.user_rows(user_indices)
+        for i, user_idx in enumerate(user_indices):
+            factors[user_idx] = self._user_factor(state, int(user_idx), user_rows[i])
+        self.user_factors = factors
+    
+    def _rank_factor_scores(self, state, user_indices: List[int], user_rows, n: int) -> List[np.ndarray]:
+        """用因子点积为一批用户打分，并排除已交互的物品
+        
+        Args:
+            state: 模型数据快照
+            user_indices: 用户下标列表
+            user_rows: 对应的用户行为向量 (CSR矩阵)
+            n: 推荐数量
+            
+        Returns:
+            每个用户按分数从高到低排序的物品下标
+        """
+        factors = np.stack([self._user_factor(state, idx, user_rows[i]) for i, idx in enumerate(user_indices)])
+        scores = factors @ np.asarray(self.item_factors).T
+        all_items = np.arange(scores.shape[1])
+        ranked = []
+        for i in range(len(user_indices)):
+            seen = user_rows.indices[user_rows.indptr[i]:user_rows.indptr[i + 1]]
+            ranked.append(self._rank_candidates(all_items, scores[i], seen, n))
+        return ranked
+    
     def get_similar_products(self, product_id: int, n: int = 5) -> List[Dict[str, Any]]:
         """获取与指定产品相似的产品
         
@@ -209,37 +659,28 @@ class ProductRecommender:
         Returns:
             相似产品列表
         """
+        # 优先使用离线预计算的结果
+        precomputed_ids = self.precomputed.similar_items(product_id, n)
+        if precomputed_ids is not None:
+            return self._fill_with_popular(self.product_cards.hydrate(precomputed_ids, '相似产品'), n)
+        
+        # 合并最近的用户行为
+        self.online.maybe_update()
+        state = self.online.snapshot()
+        
         # 如果模型未训练或产品不在模型中，使用基于内容的推荐
-        if self.item_similarity_matrix is None or product_id not in self.item_ids:
+        if state.item_neighbors is None or product_id not in state.item_index:
             return self._get_content_based_recommendations(product_id, n)
         
         # 获取产品索引
-        item_idx = self.item_ids.index(product_id)
-        
-        # 获取相似产品
-        similar_scores = self.item_similarity_matrix[item_idx]
-        
-        # 排除自身
-        similar_scores[item_idx] = 0
+        item_idx = state.item_index[product_id]
         
-        # 获取分数最高的n个物品
-        similar_item_indices = np.argsort(similar_scores)[-n:][::-1]
-        similar_item_ids = [self.item_ids[idx] for idx in similar_item_indices]
+        # 从近邻索引中获取相似度最高的n个物品 (索引中已排除自身)
+        similar_item_indices, _ = ranked_neighbors(state.item_neighbors, item_idx, n)
+        similar_item_ids = state.item_index.ids_at(similar_item_indices).tolist()
         
         # 获取相似产品详情
-        similar_products = []
-        for similar_id in similar_item_ids:
-            product = Product.query.get(similar_id)
-            if product:
-                similar_products.append({
-                    'id': product.id,
-                    'name': product.name,
-                    'brand': product.brand,
-                    'price': product.price,
-                    'platform': product.platform,
-                    'image_url': product.image_url,
-                    'recommendation_type': '相似产品'
-                })
+        similar_products = self.product_cards.hydrate(similar_item_ids, '相似产品')
         
         # 如果相似产品数量不足，补充基于内容的推荐
         if len(similar_products) < n:
@@ -258,69 +699,19 @@ class ProductRecommender:
         Returns:
             相似产品列表
         """
-        # 获取产品信息
-        product = Product.query.get(product_id)
-        if not product:
-            return []
+        # 在预计算的类别数组上向量化计算品牌、价格、平台和规格相似度
+        similar_item_ids = self.content_index.similar(product_id, n)
         
-        # 获取同类别的产品
-        similar_products = Product.query.filter(
-            Product.category_id == product.category_id,
-            Product.id != product_id
-        ).all()
+        # 产品不存在
+        if similar_item_ids is None:
+            return []
         
         # 如果没有足够的同类别产品，返回热门产品
-        if len(similar_products) < n:
+        if len(similar_item_ids) < n:
             return self.get_popular_products(n)
         
-        # 计算相似度分数
-        scores = []
-        for p in similar_products:
-            # 基于品牌、价格等计算相似度
-            score = 0
-            
-            # 品牌相似度
-            if p.brand == product.brand:
-                score += 3
-            
-            # 价格相似度 (归一化差异)
-            if p.price and product.price:
-                price_diff = abs(p.price - product.price) / max(p.price, product.price)
-                score += (1 - price_diff) * 2
-            
-            # 平台相似度
-            if p.platform == product.platform:
-                score += 1
-            
-            # 规格相似度
-            p_specs = p.specifications
-            product_specs = product.specifications
-            
-            common_keys = set(p_specs.keys()) & set(product_specs.keys())
-            if common_keys:
-                for key in common_keys:
-                    if p_specs[key] == product_specs[key]:
-                        score += 0.5
-            
-            scores.append((p, score))
-        
-        # 按分数排序
-        scores.sort(key=lambda x: x[1], reverse=True)
-        
         # 获取前n个产品
-        recommended_products = []
-        for p, score in scores[:n]:
-            recommended_products.append({
-                'id': p.id,
-                'name': p.name,
-                'brand': p.brand,
-                'price': p.price,
-                'platform': p.platform,
-                'image_url': p.image_url,
-                'recommendation_type': '相似产品'
-            })
-        
-        return recommended_products
+        return self.product_cards.hydrate(similar_item_ids, '相似产品')
     
     def get_popular_products(self, n: int = 5) -> List[Dict[str, Any]]:
         """获取热门产品
@@ -331,47 +722,18 @@ class ProductRecommender:
         Returns:
             热门产品列表
         """
-        # 基于评价数量和评分获取热门产品
-        popular_products = db.session.query(
-            Product, func.count(UserReview.id).label('review_count'),
-            func.avg(UserReview.rating).label('avg_rating')
-        ).outerjoin(UserReview).group_by(Product.id).order_by(
-            func.avg(UserReview.rating).desc(),
-            func.count(UserReview.id).desc()
-        ).limit(n*2).all()
-        
-        # 如果没有足够的评价数据，基于销量获取热门产品
-        if len(popular_products) < n:
-            sales_products = db.session.query(
-                Product, func.sum(ProductSale.sales_volume).label('total_sales')
-            ).outerjoin(ProductSale).group_by(Product.id).order_by(
-                func.sum(ProductSale.sales_volume).desc()
-            ).limit(n*2).all()
-            
-            # 合并两个列表
-            all_products = list(popular_products)
-            for p, sales in sales_products:
-                if p not in [x[0] for x in all_products]:
-                    all_products.append((p, 0, 0))
-            
-            popular_products = all_products
+        # 从增量维护的排行榜读取前n名 (按贝叶斯平均评分、评价数量和销量排序)
+        popular_products = self.popularity.top(n)
         
         # 格式化结果
-        result = []
-        for product, review_count, avg_rating in popular_products[:n]:
-            result.append({
-                'id': product.id,
-                'name': product.name,
-                'brand': product.brand,
-                'price': product.price,
-                'platform': product.platform,
-                'image_url': product.image_url,
+        return self.product_cards.hydrate(
+            [product_id for product_id, review_count, avg_rating in popular_products],
+            '热门产品',
+            extras=[{
                 'review_count': review_count,
-                'avg_rating': float(avg_rating) if avg_rating else 0,
-                'recommendation_type': '热门产品'
-            })
-        
-        return result
+                'avg_rating': float(avg_rating) if avg_rating else 0
+            } for product_id, review_count, avg_rating in popular_products]
+        )
     
     def get_discount_recommendations(self, n: int = 5) -> List[Dict[str, Any]]:
         """获取优惠力度最大的产品推荐
@@ -382,67 +744,74 @@ class ProductRecommender:
         Returns:
             优惠产品列表
         """
-        # 获取有优惠的产品
-        products_with_discounts = db.session.query(
-            Product, PlatformDiscount
-        ).join(PlatformDiscount).all()
-        
-        # 计算优惠力度
-        discount_products = []
-        for product, discount in products_with_discounts:
-            # 计算优惠金额
-            discount_amount = 0
-            if discount.discount_type == '满减' and product.price >= discount.min_purchase:
-                discount_amount = discount.discount_value
-            elif discount.discount_type == '折扣':
-                discount_amount = product.price * (1 - discount.discount_value / 10)
-            elif discount.discount_type == '消费券':
-                discount_amount = discount.discount_value
-            
-            # 计算优惠比例
-            discount_percentage = discount_amount / product.price * 100 if product.price > 0 else 0
-            
-            discount_products.append({
-                'product': product,
-                'discount': discount,
-                'discount_amount': discount_amount,
-                'discount_percentage': discount_percentage
-            })
+        # 从有效优惠索引读取 (已过期的优惠不会返回)
+        product_ids, extras = self.discount_index.top(n)
+        result = self.product_cards.hydrate(product_ids, '特惠产品', extras=extras)
         
-        # 按优惠比例排序
-        discount_products.sort(key=lambda x: x['discount_percentage'], reverse=True)
+        # 如果优惠产品不足，补充热门产品
+        return self._fill_with_popular(result, n)
+    
+    def invalidate_product(self, product_id: int):
+        """产品被修改或删除后，清除与该产品相关的缓存
         
-        # 获取前n个产品
-        result = []
-        for item in discount_products[:n]:
-            product = item['product']
-            discount = item['discount']
-            
-            # 格式化优惠描述
-            discount_desc = ''
-            if discount.discount_type == '满减':
-                discount_desc = f'满{discount.min_purchase}减{discount.discount_value}'
-            elif discount.discount_type == '折扣':
-                discount_desc = f'{discount.discount_value}折'
-            elif discount.discount_type == '消费券':
-                discount_desc = f'减{discount.discount_value}元'
-            
-            result.append({
-                'id': product.id,
-                'name': product.name,
-                'brand': product.brand,
-                'price': product.price,
-                'platform': product.platform,
-                'image_url': product.image_url,
-                'discount_amount': item['discount_amount'],
-                'discount_percentage': item['discount_percentage'],
-                'discount_desc': discount_desc,
-                'recommendation_type': '特惠产品'
-            })
+        Args:
+            product_id: 产品ID
+        """
+        self.product_cards.invalidate(product_id)
+        self.precomputed.invalidate_product(product_id)
+        self.content_index.invalidate_product(product_id)
+        self.feature_store.mark_dirty(product_id)
+        self.refresh_item_features()
+        self.discount_index.invalidate()
+    
+    def remove_product(self, product_id: int):
+        """产品被删除后，将其从缓存和排行榜中移除
         
-        # 如果优惠产品不足，补充热门产品
-        if len(result) < n:
-            popular_products = self.get_popular_products(n - len(result))
-            result.extend(popular_products)
+        Args:
+            product_id: 产品ID
+        """
+        self.invalidate_product(product_id)
+        self.popularity.remove_product(product_id)
+    
+    def record_review(self, product_id: int, rating: int):
+        """新增评价后增量更新热门排行榜
         
-        return result
+        Args:
+            product_id: 产品ID
+            rating: 评分 (1-5)
+        """
+        self.popularity.record_review(product_id, rating)
+    
+    def record_sale(self, product_id: int, sales_volume: int, behavior_id: Optional[int] = None):
+        """新增销量数据后增量更新热门排行榜
+        
+        在线更新轮询到新的购买行为时也会调用本方法。
+        
+        Args:
+            product_id: 产品ID
+            sales_volume: 销量
+            behavior_id: 来自购买行为时为行为ID，用于避免与排行榜全量刷新重复计数
+        """
+        self.popularity.record_sale(product_id, sales_volume, behavior_id=behavior_id)
+    
+    def record_behavior_removal(self, user_id: int, product_id: int, behavior_type: str):
+        """用户撤销某个行为 (如取消收藏) 后，从在线模型中扣除对应权重
+        
+        新增的行为会从数据库中自动轮询，无需调用本方法。
+        
+        Args:
+            user_id: 用户ID
+            product_id: 产品ID
+            behavior_type: 行为类型
+        """
+        weight = BEHAVIOR_WEIGHTS.get(behavior_type, DEFAULT_BEHAVIOR_WEIGHT)
+        self.online.record(user_id, product_id, -weight)
+        self.invalidate_user_recommendations(user_id)
+    
+    def invalidate_user_recommendations(self, user_id: int):
+        """清除某个用户的推荐结果缓存
+        
+        Args:
+            user_id: 用户ID
+        """
+        self.recommendation_cache.delete(user_id)
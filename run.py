@@ -1,18 +1,14 @@
 #!/usr/bin/env python3
 # run.py - 应用启动脚本
 
-from app import app
+from app import app, recommender
 
 if __name__ == '__main__':
-    # 训练推荐模型
-    # from recommendation.recommender import ProductRecommender
-    # recommender = ProductRecommender()
-    # recommender.train_model()
-
-    with app.app_context():
-        from recommendation.recommender import ProductRecommender
-        recommender = ProductRecommender()
-        recommender.train_model()
+    # 没有已保存的推荐模型时训练一次并保存，之后启动直接加载
+    if recommender.model_version is None:
+        with app.app_context():
+            recommender.train_model()
+            recommender.save_model(app.config['MODEL_ARTIFACT_DIR'])
     
     # 启动Flask应用
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,239 @@
+# 产品全文搜索索引
+# filename: search/product_index.py
+
+import json
+from typing import Any, Dict, List, Optional
+
+from flask_sqlalchemy import Pagination
+from sqlalchemy import func, text
+from sqlalchemy.exc import OperationalError
+
+from models.models import db, Product
+from search.tokenizer import index_tokens, query_terms
+
+# bm25 中各列的权重: 名称、品牌、型号、规格
+COLUMN_WEIGHTS = (10.0, 4.0, 4.0, 1.0)
+
+
+def _spec_values(spec_json: Optional[str]) -> str:
+    """规格JSON中的取值 (键名不参与搜索)"""
+    if not spec_json:
+        return ''
+    try:
+        specs = json.loads(spec_json)
+    except (ValueError, TypeError):
+        return ''
+    if not isinstance(specs, dict):
+        return ''
+    return ' '.join(str(value) for value in specs.values())
+
+
+def product_document(product_id: int, name: Optional[str], brand: Optional[str],
+                     model: Optional[str], spec_json: Optional[str]) -> Dict[str, Any]:
+    """产品在索引中的一行，各列保存空格分隔的分词结果"""
+    return {
+        'id': product_id,
+        'name': ' '.join(index_tokens(name)),
+        'brand': ' '.join(index_tokens(brand)),
+        'model': ' '.join(index_tokens(model)),
+        'specs': ' '.join(index_tokens(_spec_values(spec_json))),
+    }
+
+
+class ProductSearchIndex:
+    """基于 SQLite FTS5 的产品搜索索引
+
+    分词在Python中完成 (见 search.tokenizer)，FTS5 只按空格切分，因此中文不需要额外的分词扩展。
+    索引表的 rowid 就是产品ID；产品的增删改由管理后台在同一事务中同步到索引，
+    启动时发现索引与产品表的数量不一致 (例如批量导入了数据) 则重建。
+    另有一个按三字母组 (trigram) 分词的产品名称索引，用于 containing() 的子串查找，
+    词中间的片段 (例如型号后缀) 也能匹配。
+    当前SQLite不支持FTS5 (或 trigram 分词器) 时回退到 LIKE 查询。
+    """
+
+    def __init__(self, table: str = 'product_search', rebuild_batch: int = 5000):
+        """初始化索引
+
+        Args:
+            table: FTS5 虚拟表的表名
+            rebuild_batch: 重建索引时每批读取的产品数
+        """
+        self.table = table
+        self.name_table = f'{table}_name'
+        self.rebuild_batch = rebuild_batch
+        self.available = False
+        self.substring_available = False
+        self._insert_sql = text(f'INSERT INTO {table} (rowid, name, brand, model, specs) '
+                                f'VALUES (:id, :name, :brand, :model, :specs)')
+        self._insert_name_sql = text(f'INSERT INTO {self.name_table} (rowid, name) VALUES (:id, :name)')
+        self._rank_sql = f'bm25({table}, {", ".join(str(w) for w in COLUMN_WEIGHTS)})'
+
+    def ensure(self) -> bool:
+        """创建索引表，与产品表不一致时重建 (需要在应用上下文中调用)
+
+        Returns:
+            索引是否可用
+        """
+        if db.engine.dialect.name != 'sqlite':
+            print(f"产品搜索索引只支持SQLite，回退到LIKE查询 ({db.engine.dialect.name})")
+            return False
+        try:
+            db.session.execute(text(f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} "
+                                    f"USING fts5(name, brand, model, specs, tokenize='unicode61')"))
+            db.session.commit()
+        except OperationalError as e:
+            db.session.rollback()
+            print(f"创建产品搜索索引失败，回退到LIKE查询: {str(e)}")
+            return False
+        self.available = True
+
+        try:
+            # trigram 分词器需要 SQLite 3.34 及以上版本
+            db.session.execute(text(f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.name_table} "
+                                    f"USING fts5(name, tokenize='trigram')"))
+            db.session.commit()
+            self.substring_available = True
+        except OperationalError as e:
+            db.session.rollback()
+            print(f"创建产品名称子串索引失败，名称查找回退到LIKE查询: {str(e)}")
+
+        products = tuple(db.session.query(func.count(Product.id), func.max(Product.id)).one())
+        tables = [self.table] + ([self.name_table] if self.substring_available else [])
+        if any(tuple(db.session.execute(text(f'SELECT count(*), max(rowid) FROM {table}')).one()) != products
+               for table in tables):
+            self.rebuild()
+        return True
+
+    def rebuild(self):
+        """根据产品表重建整个索引"""
+        print("重建产品搜索索引")
+        db.session.execute(text(f'DELETE FROM {self.table}'))
+        if self.substring_available:
+            db.session.execute(text(f'DELETE FROM {self.name_table}'))
+        last_id = 0
+        while True:
+            rows = db.session.query(
+                Product.id, Product.name, Product.brand, Product.model, Product.spec_json
+            ).filter(Product.id > last_id).order_by(Product.id).limit(self.rebuild_batch).all()
+            if not rows:
+                break
+            db.session.execute(self._insert_sql, [product_document(*row) for row in rows])
+            if self.substring_available:
+                db.session.execute(self._insert_name_sql, [{'id': row[0], 'name': row[1] or ''} for row in rows])
+            last_id = rows[-1][0]
+        db.session.commit()
+
+    def index_product(self, product: Product):
+        """添加或更新一个产品的索引 (在当前事务中执行，由调用方提交)"""
+        if not self.available:
+            return
+        db.session.execute(text(f'DELETE FROM {self.table} WHERE rowid = :id'), {'id': product.id})
+        db.session.execute(self._insert_sql, product_document(
+            product.id, product.name, product.brand, product.model, product.spec_json))
+        if self.substring_available:
+            db.session.execute(text(f'DELETE FROM {self.name_table} WHERE rowid = :id'), {'id': product.id})
+            db.session.execute(self._insert_name_sql, {'id': product.id, 'name': product.name or ''})
+
+    def remove_product(self, product_id: int):
+        """删除一个产品的索引 (在当前事务中执行，由调用方提交)"""
+        if not self.available:
+            return
+        db.session.execute(text(f'DELETE FROM {self.table} WHERE rowid = :id'), {'id': product_id})
+        if self.substring_available:
+            db.session.execute(text(f'DELETE FROM {self.name_table} WHERE rowid = :id'), {'id': product_id})
+
+    def _match_expression(self, keyword: str, fallback: bool = True) -> Optional[str]:
+        """搜索词对应的 FTS5 查询，没有可搜索的词时返回None
+
+        中文先按相邻两字匹配；没有结果且 fallback 为True时改为按单字匹配。
+        """
+        terms = query_terms(keyword)
+        if not terms:
+            return None
+        match = ' AND '.join(terms)
+        if fallback:
+            unigram_match = ' AND '.join(query_terms(keyword, cjk_bigrams=False))
+            if unigram_match != match and db.session.execute(
+                text(f'SELECT 1 FROM {self.table} WHERE {self.table} MATCH :match LIMIT 1'), {'match': match}
+            ).first() is None:
+                match = unigram_match
+        return match
+
+    def _matching_ids(self, match: str):
+        """匹配查询的产品ID子查询"""
+        return text(f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH :match').bindparams(
+            match=match).columns(rowid=db.Integer)
+
+    def filter(self, query, keyword: str):
+        """在产品查询上添加关键词条件，保持查询原有的排序和分页方式
+
+        Args:
+            query: Product 查询
+            keyword: 搜索词
+
+        Returns:
+            添加条件后的查询
+        """
+        match = self._match_expression(keyword) if self.available else None
+        if match is None:
+            return query.filter(Product.name.like(f'%{keyword}%'))
+        return query.filter(Product.id.in_(self._matching_ids(match)))
+
+    def search(self, keyword: str, page: int = 1, per_page: int = 20, category_id: Optional[int] = None,
+               platform: Optional[str] = None) -> Pagination:
+        """按相关度排序的分页搜索
+
+        Args:
+            keyword: 搜索词
+            page: 页码，从1开始
+            per_page: 每页数量
+            category_id: 只搜索该分类
+            platform: 只搜索该平台
+
+        Returns:
+            分页结果，与 Query.paginate() 的返回值用法相同
+        """
+        page = max(page, 1)
+        match = self._match_expression(keyword) if self.available else None
+        if match is None:
+            query = Product.query.filter(Product.name.like(f'%{keyword}%'))
+            if category_id:
+                query = query.filter(Product.category_id == category_id)
+            if platform:
+                query = query.filter(Product.platform == platform)
+            return query.order_by(Product.id).paginate(page=page, per_page=per_page, error_out=False)
+
+        where = [f'{self.table} MATCH :match']
+        params = {'match': match}
+        if category_id:
+            where.append('p.category_id = :category_id')
+            params['category_id'] = category_id
+        if platform:
+            where.append('p.platform = :platform')
+            params['platform'] = platform
+        from_where = (f'FROM {self.table} JOIN products p ON p.id = {self.table}.rowid '
+                      f'WHERE {" AND ".join(where)}')
+
+        total = db.session.execute(text(f'SELECT count(*) {from_where}'), params).scalar()
+        ids = [row[0] for row in db.session.execute(
+            text(f'SELECT p.id {from_where} ORDER BY {self._rank_sql} LIMIT :limit OFFSET :offset'),
+            {**params, 'limit': per_page, 'offset': (page - 1) * per_page}
+        )]
+        products = {p.id: p for p in Product.query.filter(Product.id.in_(ids)).all()} if ids else {}
+        return Pagination(None, page, per_page, total, [products[i] for i in ids if i in products])
+
+    def containing(self, name: str) -> List[Product]:
+        """名称包含给定文本的产品
+
+        结果与 LIKE '%name%' 相同 (文本可以从词的中间开始)，至少3个字符时先用 trigram 名称索引
+        缩小范围，不扫描整个产品表；更短的文本或索引不可用时使用 LIKE 查询。
+        """
+        if not self.substring_available or len(name) < 3:
+            return Product.query.filter(Product.name.like(f'%{name}%')).all()
+        # 整个文本作为一个短语匹配，即名称中连续出现该文本的所有三字母组
+        phrase = '"' + name.replace('"', '""') + '"'
+        matching_ids = text(f'SELECT rowid FROM {self.name_table} WHERE {self.name_table} MATCH :phrase').bindparams(
+            phrase=phrase).columns(rowid=db.Integer)
+        needle = name.lower()
+        candidates = Product.query.filter(Product.id.in_(matching_ids)).all()
+        return [product for product in candidates if needle in (product.name or '').lower()]
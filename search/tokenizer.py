@@ -0,0 +1,56 @@
+# 产品搜索的分词
+# filename: search/tokenizer.py
+
+import re
+import unicodedata
+from typing import List
+
+# 连续的字母、连续的数字、连续的汉字分别作为一段
+_SEGMENT_RE = re.compile(r'[a-z]+|[0-9]+|[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+')
+
+
+def _normalize(text: str) -> str:
+    """全角转半角并转为小写"""
+    return unicodedata.normalize('NFKC', text).lower()
+
+
+def _is_cjk(segment: str) -> bool:
+    return not segment[0].isascii()
+
+
+def index_tokens(text: str) -> List[str]:
+    """建立索引时的分词
+
+    字母和数字分开成词 ("16GB" 得到 "16" 和 "gb")；汉字没有词边界，
+    同时索引单字和相邻两字，查询时用两字组合匹配任意长度的中文词。
+    """
+    if not text:
+        return []
+    tokens = []
+    for segment in _SEGMENT_RE.findall(_normalize(text)):
+        if _is_cjk(segment):
+            tokens.extend(segment)
+            tokens.extend(segment[i:i + 2] for i in range(len(segment) - 1))
+        else:
+            tokens.append(segment)
+    return tokens
+
+
+def query_terms(text: str, cjk_bigrams: bool = True) -> List[str]:
+    """将搜索词转换为 FTS5 查询项，所有查询项都要匹配
+
+    字母和数字按前缀匹配 ("iph" 可以匹配 "iphone")；中文默认按相邻两字匹配，
+    cjk_bigrams 为False时按单字匹配 (用于搜索词中的几个词之间没有空格、两字匹配没有结果的情况)。
+    """
+    if not text:
+        return []
+    terms = []
+    for segment in _SEGMENT_RE.findall(_normalize(text)):
+        if not _is_cjk(segment):
+            terms.append(f'"{segment}"*')
+        elif len(segment) == 1 or not cjk_bigrams:
+            terms.extend(f'"{char}"' for char in segment)
+        else:
+            terms.extend(f'"{segment[i:i + 2]}"' for i in range(len(segment) - 1))
+    # 去重并保持顺序
+    return list(dict.fromkeys(terms))
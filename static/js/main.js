@@ -16,6 +16,25 @@ document.addEventListener('DOMContentLoaded', function() {
         $('.alert-dismissible').alert('close');
     }, 5000);
     
+    // 后台渲染中的分析图表：先显示占位图，轮询图表文件，生成后替换
+    $('img[data-chart-src]').each(function() {
+        var img = $(this);
+        var src = img.data('chart-src');
+        var attempts = 0;
+        
+        (function poll() {
+            $.ajax({ url: src, type: 'HEAD', cache: false })
+                .done(function() {
+                    img.attr('src', src).removeAttr('data-chart-src');
+                })
+                .fail(function() {
+                    if (++attempts < 30) {
+                        setTimeout(poll, 1000);
+                    }
+                });
+        })();
+    });
+    
     // 产品详情页评价表单
     if (document.getElementById('reviewModal')) {
         $('#reviewModal').on('show.bs.modal', function (event) {
@@ -154,10 +173,18 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
     
+    // 产品详情页的分析数据：页面渲染后从接口获取 (接口返回ETag，浏览器验证缓存后复用)
+    function loadAnalysis(element, callback) {
+        if (!element) {
+            return;
+        }
+        $.getJSON(element.getAttribute('data-source')).done(callback);
+    }
+    
     // 价格趋势图
-    if (document.getElementById('priceTrendChart')) {
-        var ctx = document.getElementById('priceTrendChart').getContext('2d');
-        var chartData = JSON.parse(document.getElementById('priceTrendData').textContent);
+    var priceTrendCanvas = document.getElementById('priceTrendChart');
+    loadAnalysis(priceTrendCanvas, function(chartData) {
+        var ctx = priceTrendCanvas.getContext('2d');
         
         new Chart(ctx, {
             type: 'line',
@@ -211,12 +238,12 @@ document.addEventListener('DOMContentLoaded', function() {
                 }
             }
         });
-    }
+    });
     
     // 平台价格对比图
-    if (document.getElementById('platformCompareChart')) {
-        var ctx = document.getElementById('platformCompareChart').getContext('2d');
-        var chartData = JSON.parse(document.getElementById('platformCompareData').textContent);
+    var platformCompareCanvas = document.getElementById('platformCompareChart');
+    loadAnalysis(platformCompareCanvas, function(chartData) {
+        var ctx = platformCompareCanvas.getContext('2d');
         
         new Chart(ctx, {
             type: 'bar',
@@ -258,5 +285,95 @@ document.addEventListener('DOMContentLoaded', function() {
                 }
             }
         });
-    }
+    });
+    
+    // 最优购买方案
+    var optimalPlans = document.getElementById('optimalPlans');
+    loadAnalysis(optimalPlans, function(data) {
+        var tbody = $(optimalPlans).empty();
+        var detailUrl = optimalPlans.getAttribute('data-detail-url');
+        (data.best_plans || []).slice(0, 5).forEach(function(plan, index) {
+            var row = $('<tr>').toggleClass('table-success', index === 0);
+            row.append($('<td>').text(plan.platform));
+            row.append($('<td>').text(plan.product_name));
+            row.append($('<td>').text('¥' + plan.original_price));
+            row.append($('<td>').text(plan.discount_desc));
+            row.append($('<td class="text-danger font-weight-bold">').text('¥' + plan.final_price));
+            row.append($('<td>').text(Math.round(plan.discount_percentage) + '%'));
+            row.append($('<td>').append(
+                $('<a class="btn btn-sm btn-outline-primary">查看详情</a>')
+                    .attr('href', detailUrl.replace(/0$/, plan.product_id))
+            ));
+            tbody.append(row);
+        });
+    });
+    
+    // 情感分析：进度条和雷达图
+    var reviewAnalysis = document.getElementById('reviewAnalysis');
+    var emotionLabels = {
+        positive_emotion: '积极情感',
+        negative_emotion: '消极情感',
+        objectivity: '客观程度',
+        length_factor: '评价详细度'
+    };
+    loadAnalysis(reviewAnalysis, function(data) {
+        var emotions = data.emotion_dimensions || {};
+        var container = $(reviewAnalysis).find('.emotion-analysis').empty();
+        Object.keys(emotions).forEach(function(dimension) {
+            var percent = Math.round(emotions[dimension] * 100);
+            container.append(
+                $('<div class="emotion-dimension mb-3">')
+                    .append($('<span class="mb-2 d-block">').text(emotionLabels[dimension] || dimension))
+                    .append($('<div class="progress">').append(
+                        $('<div class="progress-bar" role="progressbar" aria-valuemin="0" aria-valuemax="100">')
+                            .css('width', percent + '%')
+                            .attr('aria-valuenow', percent)
+                            .text(percent + '%')
+                    ))
+            );
+        });
+        
+        // 有评价时绘制情感雷达图
+        if (!data.review_count) {
+            return;
+        }
+        var radarCanvas = document.getElementById('emotionRadarChart');
+        radarCanvas.classList.remove('d-none');
+        var ctx = radarCanvas.getContext('2d');
+        
+        new Chart(ctx, {
+            type: 'radar',
+            data: {
+                labels: ['积极情感', '消极情感', '客观程度', '评价详细度'],
+                datasets: [{
+                    label: '情感得分',
+                    data: [
+                        emotions.positive_emotion || 0,
+                        emotions.negative_emotion || 0,
+                        emotions.objectivity || 0,
+                        emotions.length_factor || 0
+                    ],
+                    borderColor: '#3498db',
+                    backgroundColor: 'rgba(52, 152, 219, 0.25)',
+                    borderWidth: 2,
+                    pointRadius: 3
+                }]
+            },
+            options: {
+                responsive: true,
+                maintainAspectRatio: false,
+                scales: {
+                    r: {
+                        beginAtZero: true
+                    }
+                },
+                plugins: {
+                    title: {
+                        display: true,
+                        text: '产品评价情感分析雷达图'
+                    }
+                }
+            }
+        });
+    });
 });
@@ -0,0 +1,32 @@
+# 测试公共配置: 在项目数据库的临时副本上创建应用
+# filename: tests/conftest.py
+
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+
+@pytest.fixture(scope='session')
+def app():
+    """使用临时数据库副本的应用 (导入 app 模块前设置 DATABASE_URL)"""
+    workdir = tempfile.mkdtemp(prefix='test_app_')
+    db_path = os.path.join(workdir, 'test.db')
+    shutil.copy(os.path.join(PROJECT_ROOT, 'product_recommendation.db'), db_path)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + db_path
+    os.environ['CHART_RENDER_WORKERS'] = '0'
+
+    import app as app_module
+    app_module.app.config['TESTING'] = True
+    yield app_module.app
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,100 @@
+# 近似最近邻索引测试
+# filename: tests/test_ann.py
+
+import numpy as np
+import pytest
+from scipy.sparse import random as sparse_random
+
+from models.models import db, Product
+from recommendation.ann import RandomProjectionLSH
+from recommendation.recommender import ProductRecommender
+
+
+def random_vectors(sparse: bool, n_items: int = 300, dim: int = 40):
+    """生成测试用的物品向量，包含几个零向量"""
+    rng = np.random.default_rng(0)
+    if sparse:
+        vectors = sparse_random(n_items, dim, density=0.2, random_state=0, format='csr', dtype=np.float32)
+        vectors.data = np.abs(vectors.data)
+        vectors = vectors.tolil()
+        vectors[:3] = 0
+        return vectors.tocsr()
+    vectors = rng.standard_normal((n_items, dim)).astype(np.float32)
+    vectors[:3] = 0
+    return vectors
+
+
+@pytest.mark.parametrize('sparse', [False, True])
+def test_block_neighbors_match_single_queries(sparse):
+    """分块生成的近邻与逐个物品查询的结果一致"""
+    index = RandomProjectionLSH(n_tables=8, n_bits=6, n_probes=2, max_candidates=50).fit(random_vectors(sparse))
+    neighbors = index.neighbors(10, max_block_bytes=64 * 300 * 4)
+
+    for row in range(neighbors.shape[0]):
+        start, end = neighbors.indptr[row], neighbors.indptr[row + 1]
+        found = dict(zip(neighbors.indices[start:end].tolist(), neighbors.data[start:end]))
+        expected_ids, expected_sims = index.query_item(row, 10)
+        assert set(found) == set(expected_ids.tolist())
+        assert np.allclose([found[i] for i in expected_ids.tolist()], expected_sims, atol=1e-5)
+
+
+@pytest.mark.parametrize('sparse', [False, True])
+def test_update_matches_refit(sparse):
+    """只更新变更物品的桶编码，得到的索引与重新建立的索引相同"""
+    vectors = random_vectors(sparse)
+    index = RandomProjectionLSH(n_tables=8, n_bits=6, n_probes=2).fit(vectors)
+
+    changed = np.array([5, 40, 41, 250])
+    updated = vectors.copy()
+    if sparse:
+        updated = updated.tolil()
+        updated[changed] = random_vectors(sparse)[changed + 1] * 3
+        updated[1] = random_vectors(sparse)[10]
+        updated = updated.tocsr()
+    else:
+        updated[changed] = random_vectors(sparse)[changed + 1] * 3
+        updated[1] = random_vectors(sparse)[10]
+    changed = np.append(changed, 1)
+    index.update(updated, changed)
+    refit = RandomProjectionLSH(n_tables=8, n_bits=6, n_probes=2).fit(updated)
+
+    assert np.array_equal(index.codes, refit.codes)
+    assert np.array_equal(index.order, refit.order)
+    assert np.array_equal(index.sorted_codes, refit.sorted_codes)
+    new_rows, expected_rows = index.neighbors(10, rows=changed), refit.neighbors(10, rows=changed)
+    assert np.array_equal(new_rows.indptr, expected_rows.indptr)
+    assert np.array_equal(new_rows.indices, expected_rows.indices)
+    assert np.allclose(new_rows.data, expected_rows.data)
+
+
+def test_product_edit_updates_content_neighbors_without_refit(app, monkeypatch):
+    """修改产品后只更新该产品的桶编码，得到的内容近邻与重新建立索引的结果相同"""
+    with app.app_context():
+        recommender = ProductRecommender(similarity_backend='lsh')
+        recommender.train_model()
+        product_id = int(recommender.item_ids[0])
+        product = db.session.get(Product, product_id)
+        old_price = product.price
+
+        fits = []
+        original_fit = RandomProjectionLSH.fit
+
+        def counting_fit(index, *args, **kwargs):
+            fits.append(index)
+            return original_fit(index, *args, **kwargs)
+
+        monkeypatch.setattr(RandomProjectionLSH, 'fit', counting_fit)
+        product.price = old_price * 3
+        db.session.commit()
+        try:
+            recommender.invalidate_product(product_id)
+            assert not fits
+
+            row = recommender.item_index[product_id]
+            expected = original_fit(RandomProjectionLSH(), recommender.item_features_matrix).neighbors(
+                recommender.n_neighbors, rows=[row])
+            start, end = recommender.content_neighbors.indptr[row], recommender.content_neighbors.indptr[row + 1]
+            assert sorted(recommender.content_neighbors.indices[start:end]) == sorted(expected.indices)
+        finally:
+            product.price = old_price
+            db.session.commit()
@@ -0,0 +1,52 @@
+# 图表缓存测试
+# filename: tests/test_chart_cache.py
+
+import os
+
+from analysis.chart_cache import ChartCache
+
+
+class CountingRenderer:
+    """记录调用次数的渲染函数"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, path):
+        self.calls += 1
+        with open(path, 'wb') as f:
+            f.write(b'\x89PNG' + b'0' * 100)
+
+
+def test_same_data_is_rendered_once(tmp_path):
+    """相同数据第二次获取图表时不再渲染"""
+    cache = ChartCache(str(tmp_path))
+    render = CountingRenderer()
+    first = cache.get_or_render('price_trend', {'prices': [1, 2, 3]}, render)
+    second = cache.get_or_render('price_trend', {'prices': [1, 2, 3]}, render)
+    assert first == second
+    assert render.calls == 1
+
+    cache.get_or_render('price_trend', {'prices': [1, 2, 4]}, render)
+    assert render.calls == 2
+
+
+def test_chart_written_by_another_process_is_reused(tmp_path):
+    """其他进程 (另一个缓存实例) 已生成的图表直接复用"""
+    render = CountingRenderer()
+    this_process, other_process = ChartCache(str(tmp_path)), ChartCache(str(tmp_path))
+    this_process.get_or_render('platform_compare', {'prices': [4]}, render)
+    other_process.get_or_render('platform_compare', {'prices': [5]}, render)
+    this_process.get_or_render('platform_compare', {'prices': [5]}, render)
+    assert render.calls == 2
+
+
+def test_file_limit_applies_to_whole_directory(tmp_path):
+    """文件数上限按整个目录计算，两个实例写入的图表合计不超过上限"""
+    caches = [ChartCache(str(tmp_path), max_files=3), ChartCache(str(tmp_path), max_files=3)]
+    render = CountingRenderer()
+    for i in range(8):
+        url = caches[i % 2].get_or_render('price_trend', {'i': i}, render)
+    files = [name for name in os.listdir(tmp_path) if name.endswith('.png')]
+    assert len(files) == 3
+    assert os.path.basename(url) in files
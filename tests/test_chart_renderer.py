@@ -0,0 +1,23 @@
+# 后台图表渲染测试
+# filename: tests/test_chart_renderer.py
+
+import os
+
+from analysis.chart_cache import ChartCache
+from analysis.chart_renderer import ChartRenderer
+
+PRICE_TREND = {'dates': ['2025-03-01', '2025-03-02'], 'prices': [100.0, 90.0], 'discount_prices': [95.0, 85.0]}
+
+
+def test_process_pool_renders_chart(tmp_path):
+    """进程池 (forkserver/spawn 启动) 中渲染的图表写入缓存目录，之后的提交直接命中"""
+    renderer = ChartRenderer(max_workers=1)
+    cache = ChartCache(str(tmp_path))
+    try:
+        url, ready = renderer.submit(cache, 'price_trend', PRICE_TREND)
+        assert not ready
+        renderer.wait(timeout=60)
+        assert os.path.exists(os.path.join(str(tmp_path), os.path.basename(url)))
+        assert renderer.submit(cache, 'price_trend', PRICE_TREND) == (url, True)
+    finally:
+        renderer.shutdown()
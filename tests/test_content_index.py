@@ -0,0 +1,79 @@
+# 基于内容的相似产品索引测试
+# filename: tests/test_content_index.py
+
+from models.models import db, Product
+from recommendation.content_index import ContentIndex
+
+
+def all_similar(index, product_id, category_id):
+    """与产品同类别的全部其他产品 (按相似度排序)"""
+    n = Product.query.filter(Product.category_id == category_id).count() - 1
+    return index.similar(product_id, n)
+
+
+def two_categories():
+    """取两个不同的类别，以及每个类别中的一个产品"""
+    first = Product.query.filter(Product.category_id.isnot(None)).order_by(Product.id).first()
+    second = Product.query.filter(Product.category_id.isnot(None),
+                                  Product.category_id != first.category_id).order_by(Product.id).first()
+    return first, second
+
+
+def test_moving_product_invalidates_both_categories(app):
+    """产品换到其他类别后，原类别和新类别的相似产品都立即更新"""
+    with app.app_context():
+        index = ContentIndex(ttl=None)
+        product, other = two_categories()
+        old_category, new_category = product.category_id, other.category_id
+        neighbor = Product.query.filter(Product.category_id == old_category, Product.id != product.id).first()
+        assert product.id not in all_similar(index, other.id, new_category)
+        assert product.id in all_similar(index, neighbor.id, old_category)
+
+        product.category_id = new_category
+        db.session.commit()
+        try:
+            index.invalidate_product(product.id)
+            assert product.id in all_similar(index, other.id, new_category)
+            assert product.id not in all_similar(index, neighbor.id, old_category)
+        finally:
+            product.category_id = old_category
+            db.session.commit()
+
+
+def test_arrays_expire_after_ttl(app):
+    """其他进程的修改在类别数组过期后生效"""
+    with app.app_context():
+        cached, expiring = ContentIndex(ttl=None), ContentIndex(ttl=0)
+        product, other = two_categories()
+        old_category, new_category = product.category_id, other.category_id
+        for index in (cached, expiring):
+            assert product.id not in all_similar(index, other.id, new_category)
+
+        # 不调用 invalidate_product，模拟其他进程的修改
+        product.category_id = new_category
+        db.session.commit()
+        try:
+            assert product.id not in all_similar(cached, other.id, new_category)
+            assert product.id in all_similar(expiring, other.id, new_category)
+        finally:
+            product.category_id = old_category
+            db.session.commit()
+
+
+def test_uncategorized_products_are_compared_with_each_other(app):
+    """未分类的产品与其他未分类的产品比较，不会因类别为空而没有相似产品"""
+    with app.app_context():
+        products = Product.query.filter(Product.category_id.isnot(None)).order_by(Product.id).limit(3).all()
+        old_categories = [p.category_id for p in products]
+        for p in products:
+            p.category_id = None
+        db.session.commit()
+        try:
+            index = ContentIndex()
+            similar = index.similar(products[0].id, 2)
+            assert sorted(similar) == sorted(p.id for p in products[1:])
+            assert index.similar(products[0].id, 3) == []
+        finally:
+            for p, category_id in zip(products, old_categories):
+                p.category_id = category_id
+            db.session.commit()
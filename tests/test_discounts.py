@@ -0,0 +1,49 @@
+# 优惠力度排行索引测试
+# filename: tests/test_discounts.py
+
+import sys
+import threading
+from datetime import datetime
+
+from recommendation.discounts import DiscountIndex
+
+# 示例数据中的优惠在 2025-03 至 2025-05 之间生效
+LOADED_AT = datetime(2025, 3, 1)
+QUERY_AT = datetime(2025, 4, 1)
+# 晚于部分优惠的结束时间，重新加载得到的数组长度不同
+LATER_LOADED_AT = datetime(2025, 3, 20)
+
+
+def test_queries_during_refresh_see_consistent_results(app):
+    """重新加载期间的查询结果与加载前相同，不会读到新旧数组混合的数据"""
+    with app.app_context():
+        index = DiscountIndex(refresh_interval=None)
+        index.refresh(now=LOADED_AT)
+        expected = index.top(5, now=QUERY_AT)
+        assert expected[0]
+
+    stop = threading.Event()
+    errors = []
+
+    def keep_refreshing():
+        with app.app_context():
+            try:
+                while not stop.is_set():
+                    index.refresh(now=LATER_LOADED_AT)
+                    index.refresh(now=LOADED_AT)
+            except Exception as e:
+                errors.append(e)
+
+    # 缩短线程切换间隔，让查询更容易在重新加载的中途被打断
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    refresher = threading.Thread(target=keep_refreshing)
+    refresher.start()
+    try:
+        for _ in range(500):
+            assert index.top(5, now=QUERY_AT) == expected
+    finally:
+        stop.set()
+        refresher.join()
+        sys.setswitchinterval(switch_interval)
+    assert not errors
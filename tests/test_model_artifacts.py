@@ -0,0 +1,30 @@
+# 推荐模型持久化测试
+# filename: tests/test_model_artifacts.py
+
+from recommendation.recommender import ProductRecommender
+
+
+def recommended_ids(recommender, user_ids):
+    """每个用户的个性化推荐产品ID"""
+    recommendations = recommender.get_user_recommendations_batch(user_ids, n=5)
+    return {user_id: [product['id'] for product in products] for user_id, products in recommendations.items()}
+
+
+def test_loaded_model_reproduces_trained_recommendations(app, tmp_path):
+    """加载的模型与刚训练的模型给出相同的推荐，ID数组保持内存映射"""
+    with app.app_context():
+        trained = ProductRecommender()
+        trained.train_model()
+        trained.save_model(str(tmp_path))
+
+        loaded = ProductRecommender()
+        assert loaded.load_model(str(tmp_path))
+        # ID数组直接使用只读的内存映射，没有复制到进程内
+        for ids in (loaded.item_ids, loaded.user_ids):
+            assert not ids.flags.owndata and not ids.flags.writeable
+
+        user_ids = trained.user_ids.tolist()
+        assert recommended_ids(loaded, user_ids) == recommended_ids(trained, user_ids)
+        product_id = int(trained.item_ids[0])
+        assert ([p['id'] for p in loaded.get_similar_products(product_id)] ==
+                [p['id'] for p in trained.get_similar_products(product_id)])
@@ -0,0 +1,63 @@
+# 物品近邻索引测试
+# filename: tests/test_neighbors.py
+
+import numpy as np
+import pytest
+from scipy.sparse import random as sparse_random
+
+from recommendation.neighbors import build_topk_neighbors, ranked_neighbors, replace_rows
+
+
+def brute_force_similarities(vectors, row: int):
+    """逐个计算第row个物品与其他物品的余弦相似度，只保留正相似度"""
+    vectors = vectors.toarray() if hasattr(vectors, 'toarray') else vectors
+    norms = np.linalg.norm(vectors, axis=1)
+    sims = {}
+    for other in range(len(vectors)):
+        if other == row or norms[row] == 0 or norms[other] == 0:
+            continue
+        sim = float(vectors[row] @ vectors[other]) / (norms[row] * norms[other])
+        if sim > 0:
+            sims[other] = sim
+    return sims
+
+
+def random_vectors(sparse: bool):
+    """生成测试用的物品向量，包含一个零向量"""
+    if sparse:
+        vectors = sparse_random(120, 30, density=0.15, random_state=1, format='lil', dtype=np.float64)
+        vectors[7] = 0
+        return vectors.tocsr()
+    vectors = np.random.default_rng(1).standard_normal((120, 30))
+    vectors[7] = 0
+    return vectors
+
+
+@pytest.mark.parametrize('sparse', [False, True])
+@pytest.mark.parametrize('max_block_bytes', [16 * 120 * 4, 1024 * 1024])
+def test_topk_neighbors_match_brute_force(sparse, max_block_bytes):
+    """分块计算的top-K近邻与逐个计算余弦相似度的排序相同"""
+    vectors = random_vectors(sparse)
+    neighbors = build_topk_neighbors(vectors, k=10, max_block_bytes=max_block_bytes)
+
+    assert neighbors.shape == (120, 120)
+    for row in range(120):
+        expected = brute_force_similarities(vectors, row)
+        cols, sims = ranked_neighbors(neighbors, row, 10)
+        # 相似度序列与暴力排序的前k个相同，每个近邻的相似度都是真实的余弦相似度
+        # (相似度相同的物品顺序不限)
+        assert np.allclose(sims, sorted(expected.values(), reverse=True)[:10], atol=1e-5)
+        assert np.allclose(sims, [expected[col] for col in cols.tolist()], atol=1e-5)
+
+
+def test_replace_rows_matches_full_rebuild():
+    """只重新计算部分物品的近邻，替换后与全量计算的结果相同"""
+    vectors = random_vectors(sparse=False)
+    neighbors = build_topk_neighbors(vectors, k=10)
+
+    changed = [3, 50, 119]
+    vectors[changed] = np.random.default_rng(2).standard_normal((3, 30))
+    updated = replace_rows(neighbors, changed, build_topk_neighbors(vectors, k=10, rows=changed))
+    rebuilt = build_topk_neighbors(vectors, k=10)
+    for row in changed:
+        assert ranked_neighbors(updated, row, 10)[0].tolist() == ranked_neighbors(rebuilt, row, 10)[0].tolist()
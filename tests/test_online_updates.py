@@ -0,0 +1,85 @@
+# 推荐模型在线增量更新测试
+# filename: tests/test_online_updates.py
+
+import threading
+from datetime import datetime
+
+from models.models import db, UserBehavior
+from recommendation.recommender import ProductRecommender
+
+
+def recommended_ids(recommender, user_id):
+    return [product['id'] for product in recommender.get_user_recommendations(user_id, n=5)]
+
+
+def test_new_behavior_changes_recommendations(app):
+    """用户的新行为在 update() 之后反映到该用户的推荐中"""
+    with app.app_context():
+        recommender = ProductRecommender()
+        recommender.train_model()
+        user_id = int(recommender.user_ids[0])
+        before = recommended_ids(recommender, user_id)
+        product_id = before[0]
+
+        purchase = UserBehavior(user_id=user_id, product_id=product_id, behavior_type='购买',
+                                created_at=datetime.now())
+        db.session.add(purchase)
+        db.session.commit()
+        try:
+            recommender.online.update()
+            after = recommended_ids(recommender, user_id)
+            assert product_id not in after
+            assert after != before
+        finally:
+            db.session.delete(purchase)
+            db.session.commit()
+
+
+def test_new_user_gets_recommendations_after_update(app):
+    """训练后才出现的用户在 update() 之后得到个性化推荐"""
+    with app.app_context():
+        recommender = ProductRecommender()
+        recommender.train_model()
+        new_user = int(max(recommender.user_ids)) + 1
+        product_id = int(recommender.item_ids[0])
+
+        recommender.online.record(new_user, product_id, 5.0)
+        recommender.online.update()
+        recommendations = recommender.get_user_recommendations(new_user, n=5)
+        assert recommendations
+        assert all(p['recommendation_type'] == '个性化推荐' for p in recommendations[:1])
+        assert product_id not in [p['id'] for p in recommendations]
+
+
+def test_reads_during_updates_see_consistent_model(app):
+    """更新进行中的推荐请求不会读到只更新了一部分的ID映射、矩阵和近邻索引"""
+    with app.app_context():
+        recommender = ProductRecommender()
+        recommender.train_model()
+        first_new_user = int(max(recommender.user_ids)) + 1
+        item_ids = [int(i) for i in recommender.item_ids[:20]]
+        n_updates = 30
+        errors = []
+        done = threading.Event()
+
+        def reader():
+            with app.app_context():
+                while not done.is_set():
+                    for user_id in range(first_new_user, first_new_user + n_updates):
+                        try:
+                            recommender.get_user_recommendations(user_id, n=5)
+                        except Exception as e:
+                            errors.append(e)
+
+        readers = [threading.Thread(target=reader) for _ in range(3)]
+        for t in readers:
+            t.start()
+        try:
+            for i in range(n_updates):
+                recommender.online.record(first_new_user + i, item_ids[i % len(item_ids)], 5.0)
+                recommender.online.update()
+        finally:
+            done.set()
+            for t in readers:
+                t.join()
+        assert errors == []
@@ -0,0 +1,94 @@
+# 热门产品排行榜测试
+# filename: tests/test_popularity.py
+
+from contextlib import contextmanager
+from datetime import datetime
+
+from models.models import db, Product, ProductSale, UserBehavior, UserReview
+from recommendation.popularity import PopularityLeaderboard, PURCHASE_BEHAVIOR
+from recommendation.recommender import ProductRecommender
+
+
+@contextmanager
+def temporary_rows(*rows):
+    """写入测试数据，结束后按相反顺序删除"""
+    rows = list(rows)
+    try:
+        for row in rows:
+            db.session.add(row)
+            db.session.commit()
+        yield rows
+    finally:
+        db.session.rollback()
+        for row in reversed(rows):
+            if row.id is not None:
+                db.session.delete(row)
+        db.session.commit()
+
+
+def ranking(leaderboard, product_ids=None):
+    """排行榜的全部 (产品ID, 评价数量, 平均评分)，可只保留指定产品"""
+    return [(pid, count, round(rating, 6)) for pid, count, rating in leaderboard.top(10 ** 6)
+            if product_ids is None or pid in product_ids]
+
+
+def refreshed_ranking(product_ids=None):
+    """从数据库全量加载的排行榜"""
+    leaderboard = PopularityLeaderboard(refresh_interval=None)
+    leaderboard.refresh()
+    return ranking(leaderboard, product_ids)
+
+
+def test_recorded_reviews_rank_like_a_full_refresh(app):
+    """逐条记录的评价 (包括对全站平均分的影响) 与从数据库全量加载的排名相同"""
+    with app.app_context():
+        product = Product(name='评价测试产品')
+        with temporary_rows(product):
+            leaderboard = PopularityLeaderboard(refresh_interval=None, mean_tolerance=0)
+            leaderboard.refresh()
+
+            reviews = [UserReview(product_id=product.id, rating=1) for _ in range(50)]
+            with temporary_rows(*reviews):
+                for review in reviews:
+                    leaderboard.record_review(product.id, review.rating)
+                assert ranking(leaderboard) == refreshed_ranking()
+
+            # 移除产品后其评价不再计入全站平均分
+            leaderboard.remove_product(product.id)
+            expected = [row for row in refreshed_ranking() if row[0] != product.id]
+            assert ranking(leaderboard) == expected
+
+
+def test_purchase_behavior_counts_as_sale(app):
+    """在线更新轮询到的购买行为计入销量，已在全量刷新中计入的购买不重复计数"""
+    with app.app_context():
+        # 三个没有评价的产品只按销量 (其次产品ID) 排序，second 的销量与另外两个相同时
+        # 排名为 first, second, third；少计一次时落到最后，多计一次时排到最前
+        first, second, third = Product(name='销量测试一'), Product(name='销量测试二'), Product(name='销量测试三')
+        with temporary_rows(first, second, third) as products:
+            ids = {p.id for p in products}
+            expected = [first.id, second.id, third.id]
+
+            def purchase():
+                return UserBehavior(user_id=int(recommender.user_ids[0]), product_id=second.id,
+                                    behavior_type=PURCHASE_BEHAVIOR, created_at=datetime.now())
+
+            with temporary_rows(ProductSale(product_id=first.id, sales_volume=2),
+                                ProductSale(product_id=second.id, sales_volume=1),
+                                ProductSale(product_id=third.id, sales_volume=2)):
+                recommender = ProductRecommender()
+                recommender.train_model()
+                recommender.popularity.refresh()
+
+                # 刷新之后的购买由在线更新计入
+                with temporary_rows(purchase()):
+                    recommender.online.update()
+                    assert [row[0] for row in ranking(recommender.popularity, ids)] == expected
+
+                    # 全量刷新已计入的购买，之后被在线更新轮询到时不再计入
+                    with temporary_rows(ProductSale(product_id=first.id, sales_volume=1),
+                                        ProductSale(product_id=third.id, sales_volume=1), purchase()):
+                        recommender.popularity.refresh()
+                        recommender.online.update()
+                        assert [row[0] for row in ranking(recommender.popularity, ids)] == expected
+                        assert ranking(recommender.popularity, ids) == refreshed_ranking(ids)
@@ -0,0 +1,28 @@
+# 离线预计算推荐表测试
+# filename: tests/test_precomputed.py
+
+from models.models import Product
+from recommendation.recommender import ProductRecommender
+
+
+def product_ids(products):
+    return [product['id'] for product in products]
+
+
+def test_precomputed_tables_reproduce_live_recommendations(app, tmp_path):
+    """未训练的实例只加载预计算表，给出的推荐与训练好的模型实时计算的结果相同"""
+    with app.app_context():
+        trained = ProductRecommender()
+        trained.train_model()
+        user_ids = trained.user_ids.tolist()
+        sample_products = [row[0] for row in Product.query.with_entities(Product.id).order_by(Product.id).limit(50)]
+        live_users = {user_id: product_ids(trained.get_user_recommendations(user_id, 5)) for user_id in user_ids}
+        live_similar = {pid: product_ids(trained.get_similar_products(pid, 5)) for pid in sample_products}
+
+        trained.precompute(str(tmp_path), n=10)
+
+        served = ProductRecommender()
+        assert served.load_precomputed(str(tmp_path), max_age=3600)
+        assert {user_id: product_ids(served.get_user_recommendations(user_id, 5))
+                for user_id in user_ids} == live_users
+        assert {pid: product_ids(served.get_similar_products(pid, 5)) for pid in sample_products} == live_similar
@@ -0,0 +1,66 @@
+# 产品分析数据接口测试
+# filename: tests/test_product_api.py
+
+from models.models import db, Product, UserReview
+
+
+def test_review_analysis_without_reviews(app, client):
+    """没有评价的产品返回默认情感维度，而不是500"""
+    with app.app_context():
+        reviewed = db.session.query(UserReview.product_id)
+        product = Product.query.filter(~Product.id.in_(reviewed)).first()
+        assert product is not None
+        product_id = product.id
+
+    response = client.get(f'/api/product/{product_id}/review_analysis')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['review_count'] == 0
+    assert set(data['emotion_dimensions']) == {'positive_emotion', 'negative_emotion', 'objectivity', 'length_factor'}
+
+
+def test_review_analysis_etag(app, client):
+    """带 If-None-Match 的重复请求返回304"""
+    with app.app_context():
+        product_id = db.session.query(UserReview.product_id).first()[0]
+
+    first = client.get(f'/api/product/{product_id}/review_analysis')
+    assert first.status_code == 200
+    assert first.get_json()['review_count'] > 0
+    second = client.get(f'/api/product/{product_id}/review_analysis',
+                        headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 304
+
+
+def test_product_detail_loads_analysis_from_api(app, client):
+    """详情页不再内嵌分析数据，而是引用各个接口"""
+    with app.app_context():
+        product_id = Product.query.first().id
+
+    html = client.get(f'/product/{product_id}').get_data(as_text=True)
+    for endpoint in ('price_trend', 'platform_compare', 'review_analysis', 'optimal_plan'):
+        assert f'/api/product/{product_id}/{endpoint}' in html
+        assert client.get(f'/api/product/{product_id}/{endpoint}').status_code == 200
+
+
+def test_optimal_plan_includes_products_containing_name(app, client):
+    """最优购买方案包含名称中含有该产品名称的其他产品，而不只是以它开头的产品"""
+    from app import product_search
+    with app.app_context():
+        product = Product.query.first()
+        other = Product(name=f'新品 {product.name}', price=product.price, platform=product.platform,
+                        category_id=product.category_id)
+        db.session.add(other)
+        db.session.commit()
+        product_search.index_product(other)
+        db.session.commit()
+        product_id, other_id = product.id, other.id
+
+    try:
+        plans = client.get(f'/api/product/{product_id}/optimal_plan').get_json()['best_plans']
+        assert other_id in {plan['product_id'] for plan in plans}
+    finally:
+        with app.app_context():
+            product_search.remove_product(other_id)
+            Product.query.filter_by(id=other_id).delete()
+            db.session.commit()
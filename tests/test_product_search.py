@@ -0,0 +1,42 @@
+# 产品搜索索引测试
+# filename: tests/test_product_search.py
+
+import pytest
+
+from models.models import db, Product
+
+
+@pytest.fixture
+def indexed_product(app):
+    """名称中型号与后缀连写的临时产品"""
+    from app import product_search
+    with app.app_context():
+        category_id = db.session.query(Product.category_id).first()[0]
+        product = Product(name='Galaxy S24Ultra 旗舰版', price=8999, platform='京东', category_id=category_id)
+        db.session.add(product)
+        db.session.flush()
+        product_search.index_product(product)
+        db.session.commit()
+        product_id = product.id
+    yield product_search, product_id
+    with app.app_context():
+        product_search.remove_product(product_id)
+        Product.query.filter_by(id=product_id).delete()
+        db.session.commit()
+
+
+@pytest.mark.parametrize('text', ['alaxy', '4Ultra', 'Ultra', 'ultra', 'S24Ultra 旗舰', '舰版', 'Ul'])
+def test_containing_matches_substrings_inside_words(app, indexed_product, text):
+    """containing() 与 LIKE '%text%' 一致，从词中间开始的片段也能匹配"""
+    product_search, product_id = indexed_product
+    with app.app_context():
+        assert product_id in {p.id for p in product_search.containing(text)}
+        expected = {p.id for p in Product.query.filter(Product.name.like(f'%{text}%')).all()}
+        assert {p.id for p in product_search.containing(text)} == expected
+
+
+def test_containing_excludes_non_contiguous_text(app, indexed_product):
+    """文本的各部分都出现但不连续时不匹配"""
+    product_search, product_id = indexed_product
+    with app.app_context():
+        assert product_id not in {p.id for p in product_search.containing('Galaxy 旗舰版')}
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+# train_recommender.py - 重新训练推荐模型并发布新版本
+#
+# 各Web工作进程启动时会加载最新发布的版本，无需在启动时重新训练。
+# 训练完成后同时预计算所有用户和产品的推荐表，首页等页面直接按ID查表。
+
+from app import app
+from recommendation.recommender import ProductRecommender
+
+
+def train_and_publish():
+    """训练推荐模型并保存到模型目录，然后生成预计算的推荐表"""
+    with app.app_context():
+        recommender = ProductRecommender(similarity_backend=app.config['RECOMMENDER_SIMILARITY_BACKEND'],
+                                         mode=app.config['RECOMMENDER_MODE'],
+                                         n_jobs=app.config['RECOMMENDER_TRAIN_JOBS'])
+        recommender.train_model()
+        version_dir = recommender.save_model(app.config['MODEL_ARTIFACT_DIR'])
+        if version_dir is not None:
+            recommender.precompute(app.config['PRECOMPUTED_DIR'])
+        return version_dir
+
+
+if __name__ == '__main__':
+    train_and_publish()
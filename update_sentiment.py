@@ -1,17 +1,9 @@
 from app import app
 from models.models import db, UserReview
 from data_seeder import generate_sentiment_analysis
+from analysis.data_analysis import get_default_emotions
 import json
 
-def get_default_emotions():
-    """返回默认的情感维度数据"""
-    return {
-        'positive_emotion': 0.0,
-        'negative_emotion': 0.0,
-        'objectivity': 0.5,
-        'length_factor': 0.0
-    }
-
 def update_reviews_sentiment():
     """更新所有评论的情感分析数据"""
     with app.app_context():